@@ -0,0 +1,57 @@
+"""
+
+benchmarks conftest
+
+The simulated cluster size and apiserver latency are set with
+BENCH_NAMESPACES, BENCH_WORKLOADS, BENCH_CONTAINERS and BENCH_LATENCY (seconds).
+"""
+import argparse
+import os
+
+import pytest
+
+from fake_apiserver import FakeApiServer
+
+NAMESPACES = int(os.environ.get("BENCH_NAMESPACES", "50"))
+WORKLOADS = int(os.environ.get("BENCH_WORKLOADS", "20"))
+CONTAINERS = int(os.environ.get("BENCH_CONTAINERS", "3"))
+LATENCY = float(os.environ.get("BENCH_LATENCY", "0.002"))
+
+
+@pytest.fixture(scope="session")
+def apiserver():
+    """
+
+    populated fake apiserver
+    """
+    with FakeApiServer(latency=LATENCY) as _server:
+        _server.populate(NAMESPACES, WORKLOADS, CONTAINERS)
+        yield _server
+
+
+@pytest.fixture()
+def run_args():
+    """
+
+    non interactive PodDebugger.run arguments
+    """
+    return argparse.Namespace(
+        namespace="ns-0",
+        deployment="app-0",
+        daemonset=None,
+        container="container-0",
+        selector=None,
+        field_selector=None,
+        host="127.0.0.1",
+        port=5999,
+        entrypoint="main.py",
+        image_name="app-0:debug",
+        pdb_command=["c"],
+        backup=False,
+        restore=False,
+        ephemeral=False,
+        pod=None,
+        debug=False,
+        wait=False,
+        wait_timeout=1,
+    )
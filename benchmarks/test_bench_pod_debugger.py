@@ -0,0 +1,116 @@
+"""
+
+PodDebugger benchmarks against the fake apiserver
+"""
+import io
+import itertools
+from unittest.mock import patch
+
+import pytest
+
+from remote_pod_debugger.backends import ClientBackend, RawBackend
+from remote_pod_debugger.completer import Completer
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+BACKENDS = {"client": ClientBackend, "raw": RawBackend}
+
+
+def _pod_debugger(apiserver, backend: str) -> PodDebugger:
+    return PodDebugger(backend=BACKENDS[backend](configuration=apiserver.configuration()))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bench_select_namespace(benchmark, apiserver, backend):
+    """
+
+    list namespaces and prompt
+    """
+    with patch("builtins.input", lambda *args: "ns-0"), patch("builtins.print"):
+        assert (
+            benchmark(lambda: _pod_debugger(apiserver, backend).select_namespace())
+            == "ns-0"
+        )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bench_select_deployment(benchmark, apiserver, backend):
+    """
+
+    list deployments of a namespace and prompt
+    """
+    with patch("builtins.input", lambda *args: "app-0"), patch("builtins.print"):
+        assert (
+            benchmark(lambda: _pod_debugger(apiserver, backend).select_deployment("ns-0"))
+            == "app-0"
+        )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bench_select_container(benchmark, apiserver, backend):
+    """
+
+    read deployment and prompt for container
+    """
+    with patch("builtins.input", lambda *args: "container-0"), patch("builtins.print"):
+        assert (
+            benchmark(
+                lambda: _pod_debugger(apiserver, backend).select_container("app-0", "ns-0")
+            )
+            == "container-0"
+        )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bench_backup(benchmark, apiserver, backend):
+    """
+
+    read and dump deployment
+    """
+    benchmark(
+        lambda: _pod_debugger(apiserver, backend).backup("app-0", "ns-0", io.StringIO())
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bench_patch(benchmark, apiserver, backend):
+    """
+
+    patch deployment, the port changes every round so a patch is always sent
+    """
+    _ports = itertools.count(5999)
+    benchmark(
+        lambda: _pod_debugger(apiserver, backend).patch(
+            "app-1", "ns-0", "127.0.0.1", next(_ports), "main.py", "container-0", "app-1:debug"
+        )
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bench_run(benchmark, apiserver, backend, run_args):
+    """
+
+    non interactive run end-to-end
+    """
+    benchmark(lambda: _pod_debugger(apiserver, backend).run(run_args))
+
+
+@pytest.mark.parametrize("fuzzy", [False, True])
+def test_bench_completer(benchmark, fuzzy):
+    """
+
+    complete every typed prefix of a name among many options
+    """
+    _options = [f"app-{_index}-{_suffix}" for _index in range(5000) for _suffix in "abc"]
+    _completer = Completer(_options, fuzzy=fuzzy)
+    _text = "app-4242-b" if not fuzzy else "a4242b"
+
+    def _complete():
+        with patch("readline.get_line_buffer", lambda: _text), patch(
+            "readline.get_begidx", lambda: 0
+        ):
+            _state = 0
+            while _completer.complete(_text, _state) is not None:
+                _state += 1
+            return _state
+
+    assert benchmark(_complete) >= 1
@@ -2,12 +2,20 @@
 
 remote pod debugger
 
+Only light modules are imported at startup, kubernetes client is imported
+once arguments are parsed, so --help and argument errors are fast.
 """
+import time
+
+_START = time.perf_counter()
+
+# pylint: disable=wrong-import-position
 import argparse
+import sys
 
 from remote_pod_debugger.completer import activate_history
-from remote_pod_debugger.pod_debugger import PodDebugger
-from remote_pod_debugger.utils import info
+from remote_pod_debugger.kinds import WORKLOAD_KINDS
+from remote_pod_debugger.utils import debug, info
 
 
 def main():  # pragma: no cover
@@ -36,7 +44,18 @@ def main():  # pragma: no cover
         "--backup",
         action="store_true",
         default=False,
-        help="Backup deployment or daemonset before patch"
+        help="Backup deployment or daemonset, and save restore point before patch"
+    )
+    _parser.add_argument(
+        "--backup-dir",
+        default=None,
+        help="Backup and restore point directory (default: ~/.config/remote_debugger_backups)"
+    )
+    _parser.add_argument(
+        "--restore",
+        action="store_true",
+        default=False,
+        help="Restore containers patched with --backup"
     )
     _parser.add_argument(
         "--debug",
@@ -65,22 +84,325 @@ def main():  # pragma: no cover
         default=None,
         help="Set daemonset name to patch"
     )
+    _parser.add_argument(
+        "--kind",
+        choices=WORKLOAD_KINDS,
+        default=None,
+        help="Object type to patch (job and pod only with --ephemeral)"
+    )
+    _parser.add_argument(
+        "--name",
+        default=None,
+        help="Object name to patch, with --kind"
+    )
     _parser.add_argument(
         "--container",
         default=None,
         help="Container name to patch"
     )
+    _parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        default=False,
+        help="Fetch kubernetes objects in background while prompting"
+    )
+    _parser.add_argument(
+        "--target",
+        "-t",
+        action="append",
+        default=[],
+        help="Batch mode, object to patch as [namespace/]type/name (ex: default/deployment/api)"
+    )
+    _parser.add_argument(
+        "--selector",
+        "-l",
+        default=None,
+        help="Only list objects matching label selector (all namespaces if no --namespace)"
+    )
+    _parser.add_argument(
+        "--field-selector",
+        default=None,
+        help="Only list objects matching field selector (ex: metadata.name=api)"
+    )
+    _parser.add_argument(
+        "--batch",
+        action="store_true",
+        default=False,
+        help="Batch mode, patch every object matching --selector/--field-selector"
+    )
+    _parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Batch mode, max concurrent patches (default: 8)"
+    )
+    _parser.add_argument(
+        "--no-name-cache",
+        action="store_true",
+        default=False,
+        help="Don't use names cached from previous runs"
+    )
+    _parser.add_argument(
+        "--fuzzy",
+        action="store_true",
+        default=False,
+        help="Fuzzy tab completion when no name starts with input"
+    )
+    _parser.add_argument(
+        "--backend",
+        choices=["client", "raw"],
+        default="client",
+        help="Kubernetes backend, raw skips generated client models"
+    )
+    _parser.add_argument(
+        "--wait",
+        "-w",
+        action="store_true",
+        default=False,
+        help="Wait for the first patched pod to run"
+    )
+    _parser.add_argument(
+        "--wait-timeout",
+        type=int,
+        default=300,
+        help="Wait timeout in seconds"
+    )
+    _parser.add_argument(
+        "--listen",
+        action="store_true",
+        default=False,
+        help="Listen on --port for remote_pdb sessions of patched pods, console starts after patch"
+    )
+    _parser.add_argument(
+        "--remote-pdb-wheel",
+        default=None,
+        help="Local remote_pdb wheel, shipped in a ConfigMap instead of pip install at pod start"
+    )
+    _parser.add_argument(
+        "--ephemeral",
+        action="store_true",
+        default=False,
+        help="Debug one running pod with an ephemeral container, without rollout"
+    )
+    _parser.add_argument(
+        "--pod",
+        default=None,
+        help="Ephemeral mode, pod name to debug"
+    )
+    _parser.add_argument(
+        "--stats",
+        action="store_true",
+        default=False,
+        help="Print latency and size of kubernetes API calls at exit"
+    )
+    _parser.add_argument(
+        "--trace",
+        default=None,
+        help="Write kubernetes API calls to a JSON trace file"
+    )
+    _parser.add_argument(
+        "--otel",
+        action="store_true",
+        default=False,
+        help="Emit an OpenTelemetry span per kubernetes API call"
+    )
+    _parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=None,
+        help="Max kept alive connections to the API server (default: --workers or 5 per CPU)"
+    )
+    _parser.add_argument(
+        "--no-keep-alive",
+        action="store_true",
+        default=False,
+        help="Don't send TCP keep-alive probes on idle API server connections"
+    )
+    _parser.add_argument(
+        "--no-gzip",
+        action="store_true",
+        default=False,
+        help="Don't ask the API server for gzip compressed responses"
+    )
+    _parser.add_argument(
+        "--qps",
+        type=float,
+        default=None,
+        help="Max API requests per second per context, 0 disables throttling (default: 50)"
+    )
+    _parser.add_argument(
+        "--burst",
+        type=int,
+        default=None,
+        help="API requests allowed at once above --qps (default: 100)"
+    )
+    _parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=None,
+        help="Max concurrent API requests per context, halved on 429 (default: 32)"
+    )
+    _parser.add_argument(
+        "--context",
+        action="append",
+        default=[],
+        help="Kube context, glob or comma separated list (ex: prod-*), repeatable."
+        " Targets are patched or restored in every matching context",
+    )
+    _parser.add_argument(
+        "--find-image",
+        default=None,
+        help="Patch every container running this image (any tag if none), in all"
+        " namespaces if no --namespace"
+    )
+    _parser.add_argument(
+        "--find-arg",
+        default=None,
+        help="Patch every container whose command or args contain this word (ex: a module)"
+    )
+    _parser.add_argument(
+        "--plan",
+        default=None,
+        help="Write batch patches as a JSON plan to file (- for stdout), without prompt nor patch"
+    )
+    _parser.add_argument(
+        "--apply",
+        default=None,
+        help="Apply a JSON plan file (- for stdin), results are written as JSON to stdout"
+    )
     _args = _parser.parse_args()
+    if _args.listen and not _args.port:
+        _parser.error("--listen requires --port")
+    if _args.plan and not (_args.host and _args.port and _args.entrypoint):
+        _parser.error("--plan requires --host, --port and --entrypoint")
+    if _args.plan and _args.apply:
+        _parser.error("--plan and --apply are exclusive")
 
-    activate_history()
+    # JSON plans and results are the only output of stdout, messages go to stderr
+    _output = sys.stdout
+    if _args.plan or _args.apply:
+        sys.stdout = sys.stderr
+    else:
+        activate_history()
 
     info("Welcome to remote pod debugger!")
-    _pod_debugger = PodDebugger(before_script=_args.before_script, _debug=_args.debug)
+    _first_output = time.perf_counter()
+    # pylint: disable=import-outside-toplevel
+    from remote_pod_debugger.async_pod_debugger import AsyncPodDebugger
+    from remote_pod_debugger.backends import ConnectionOptions, make_backend
+    from remote_pod_debugger.backup_store import BACKUP_DIR, BackupStore
+    from remote_pod_debugger.batch import run_batch
+    from remote_pod_debugger.contexts import list_contexts, match_contexts, run_contexts
+    from remote_pod_debugger.instrumentation import CallRecorder
+    from remote_pod_debugger.name_cache import NameCache, current_context
+    from remote_pod_debugger.pod_debugger import PodDebugger
+    from remote_pod_debugger.throttle import (
+        DEFAULT_BURST,
+        DEFAULT_MAX_INFLIGHT,
+        DEFAULT_QPS,
+        AdaptiveLimiter,
+    )
+
+    if _args.debug:
+        debug(
+            f"Startup: {(_first_output - _START) * 1000:.0f} ms to first output, "
+            f"{(time.perf_counter() - _first_output) * 1000:.0f} ms to import kubernetes client"
+        )
+    if _args.context:
+        _contexts = match_contexts(_args.context, list_contexts())
+        if not _contexts:
+            _parser.error(f"No kube context matches {', '.join(_args.context)}")
+    elif not _args.no_name_cache or _args.backup or _args.restore or _args.apply:
+        # name cache, backups and restore points are stored per context
+        _contexts = [current_context()]
+    else:
+        _contexts = [""]
+    _multi_context = len(_contexts) > 1
+    if _multi_context and (
+        _args.plan
+        or _args.apply
+        or _args.ephemeral
+        or _args.listen
+        or _args.find_image
+        or _args.find_arg
+    ):
+        _parser.error(
+            "--plan, --apply, --ephemeral, --listen, --find-image and --find-arg"
+            " take a single context"
+        )
+    _recorder = (
+        CallRecorder(_args.otel) if _args.stats or _args.trace or _args.otel else None
+    )
+    _debugger_class = (
+        AsyncPodDebugger if _args.prefetch and not _multi_context else PodDebugger
+    )
+
+    def _make_pod_debugger(context: str) -> PodDebugger:
+        return _debugger_class(
+            before_script=_args.before_script,
+            _debug=_args.debug,
+            name_cache=None if _args.no_name_cache else NameCache(context),
+            fuzzy_completion=_args.fuzzy,
+            backend=make_backend(
+                _args.backend,
+                _args.debug,
+                _recorder,
+                ConnectionOptions(
+                    _args.pool_size or _args.workers,
+                    keep_alive=not _args.no_keep_alive,
+                    gzip=not _args.no_gzip,
+                ),
+                context if _args.context else None,
+                None
+                if _args.qps == 0
+                else AdaptiveLimiter(
+                    _args.qps or DEFAULT_QPS,
+                    _args.burst or DEFAULT_BURST,
+                    _args.max_inflight or DEFAULT_MAX_INFLIGHT,
+                ),
+            ),
+            remote_pdb_wheel=_args.remote_pdb_wheel,
+            backup_store=BackupStore(context, _args.backup_dir or BACKUP_DIR),
+        )
+
+    _pod_debugger = None
+
+    def _run():
+        if _multi_context:
+            run_contexts(
+                {_context: _make_pod_debugger(_context) for _context in _contexts}, _args
+            )
+        elif (
+            _args.target
+            or _args.batch
+            or _args.plan
+            or _args.apply
+            or _args.find_image
+            or _args.find_arg
+        ):
+            run_batch(_pod_debugger, _args, _output)
+        else:
+            _pod_debugger.run(_args)
+
     try:
-        _pod_debugger.run(_args)
+        if not _multi_context:
+            _pod_debugger = _make_pod_debugger(_contexts[0])
+        if _args.listen:
+            # pods patched by _run connect back as soon as they start
+            from remote_pod_debugger.listener import serve
+
+            serve("0.0.0.0", _args.port, _run)
+        else:
+            _run()
     except KeyboardInterrupt:
         info("Goodbye!")
-
+    finally:
+        if isinstance(_pod_debugger, AsyncPodDebugger):
+            _pod_debugger.close()
+        if _recorder is not None and _args.stats:
+            _recorder.print_summary()
+        if _recorder is not None and _args.trace:
+            _recorder.write_trace(_args.trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+"""
+
+Async pod debugger
+"""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from remote_pod_debugger.name_cache import NameCache
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+# lists prefetched while object type is not known yet, other kinds (pods,
+# jobs...) are listed on demand. Lists served by the name cache are skipped.
+PREFETCH_TYPES = ["deployment", "daemonset"]
+
+
+class AsyncPodDebugger(PodDebugger):
+    """
+
+    PodDebugger running kubernetes API calls on an asyncio loop, backed by
+    a thread pool. Lists and objects likely to be needed next are fetched in
+    background while the user is still typing at the prompt.
+    """
+
+    def __init__(self, *args, max_workers: int = 4, **kwargs):
+        """
+
+        AsyncPodDebugger constructor
+
+        Args:
+            max_workers (int): max concurrent API calls (default: 4)
+        Other arguments are passed to PodDebugger.
+        """
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._pending: Dict[Tuple[str, ...], Future] = {}
+        self._pending_lock = threading.Lock()
+
+    async def _call(self, fn: Callable, *args) -> Any:
+        """
+
+        run blocking API call in thread pool
+        Args:
+            fn (Callable): blocking function
+        Returns:
+            Any: function result
+        """
+        return await self._loop.run_in_executor(
+            self._executor, functools.partial(fn, *args)
+        )
+
+    def _submit(self, key: Tuple[str, ...], fn: Callable, *args):
+        """
+
+        schedule a background fetch once per key
+        Args:
+            key (Tuple[str, ...]): fetch key
+            fn (Callable): blocking function
+        """
+        with self._pending_lock:
+            if key in self._pending:
+                return
+            self._pending[key] = asyncio.run_coroutine_threadsafe(
+                self._call(fn, *args), self._loop
+            )
+
+    def _take(self, key: Tuple[str, ...], fn: Callable, *args) -> Any:
+        """
+
+        return result of a background fetch, or call fn if nothing pending
+        Args:
+            key (Tuple[str, ...]): fetch key
+            fn (Callable): blocking function
+        Returns:
+            Any: function result
+        """
+        with self._pending_lock:
+            _future = self._pending.pop(key, None)
+        if _future is None:
+            return fn(*args)
+        return _future.result()
+
+    def prefetch(self, namespace: str, object_type: str = None, name: str = None):
+        """
+
+        Start fetching in background the object if known, else the object
+        lists of namespace.
+        Args:
+            namespace (str): namespace name
+            object_type (str): object type, if known
+            name (str): object name, if known
+        """
+        if not namespace:
+            return
+        if object_type and name:
+            self._submit(
+                ("read", object_type, namespace, name),
+                super().read_object,
+                name,
+                namespace,
+                object_type,
+            )
+            return
+        _types = [object_type] if object_type else PREFETCH_TYPES
+        for _type in _types:
+            if self._name_cache is not None and self._name_cache.get(
+                NameCache.key(_type, namespace)
+            ):
+                continue
+            self._submit(("list", _type, namespace), self._collect, _type, namespace)
+
+    def _drop_lists(self, object_type: str):
+        """
+
+        cancel prefetched lists of other object types, they won't be consumed
+        Args:
+            object_type (str): selected object type
+        """
+        with self._pending_lock:
+            _keys = [
+                _key for _key in self._pending if _key[0] == "list" and _key[1] != object_type
+            ]
+            _futures = [self._pending.pop(_key) for _key in _keys]
+        for _future in _futures:
+            _future.cancel()
+
+    def _collect(self, object_type: str, namespace: str = None) -> List[str]:
+        """
+
+        fetch every page of object names
+        Args:
+            object_type (str): object type
+            namespace (str): namespace name
+        Returns:
+            List[str]: object names
+        """
+        return list(super().iter_names(object_type, namespace))
+
+    def iter_names(self, object_type: str, namespace: str = None) -> Iterable[str]:
+        return self._take(
+            ("list", object_type, namespace), super().iter_names, object_type, namespace
+        )
+
+    def select_object_type(self, ephemeral: bool = False) -> str:
+        _object_type = super().select_object_type(ephemeral)
+        self._drop_lists(_object_type)
+        return _object_type
+
+    def read_object(self, name: str, namespace: str, object_type: str = "deployment"):
+        with self._pending_lock:
+            _future = self._pending.pop(("read", object_type, namespace, name), None)
+        if _future is not None:
+            _future.result()
+        return super().read_object(name, namespace, object_type)
+
+    def close(self):
+        """
+
+        stop event loop and thread pool
+        """
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,838 @@
+"""
+
+Kubernetes backends
+
+PodDebugger talks to the cluster through a Backend. ClientBackend uses the
+generated kubernetes client models, RawBackend sends raw JSON over the
+pooled HTTP connections of the kubernetes REST client and only builds
+light objects for the fields the debugger uses.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+import json
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from kubernetes import client, config
+from kubernetes.client import rest
+from kubernetes.client.exceptions import ApiException
+from kubernetes.watch.watch import iter_resp_lines
+
+from remote_pod_debugger.instrumentation import CallRecorder
+from remote_pod_debugger.kinds import get_kind
+from remote_pod_debugger.throttle import AdaptiveLimiter
+from remote_pod_debugger.utils import debug
+
+
+BACKENDS = ["client", "raw"]
+Query = List[Tuple[str, Any]]
+KEEP_ALIVE_IDLE = 30
+
+
+def collection_path(object_type: str, namespace: str = None) -> str:
+    """
+
+    return API path of a collection, across all namespaces if not set
+    Args:
+        object_type (str): object type, or "namespace"
+        namespace (str): namespace name
+    Returns:
+        str: API path
+    """
+    _kind = get_kind(object_type)
+    if namespace and _kind.namespaced:
+        return f"{_kind.api_prefix}/namespaces/{namespace}/{_kind.plural}"
+    return f"{_kind.api_prefix}/{_kind.plural}"
+
+
+def selector_query(label_selector: str = None, field_selector: str = None) -> Query:
+    """
+
+    return list query params of the selectors which are set
+    Args:
+        label_selector (str): label selector
+        field_selector (str): field selector
+    Returns:
+        Query: query params
+    """
+    return [
+        (_key, _value)
+        for _key, _value in (
+            ("labelSelector", label_selector),
+            ("fieldSelector", field_selector),
+        )
+        if _value
+    ]
+
+
+def format_label_selector(selector: Dict[str, Any]) -> str:
+    """
+
+    return label selector query of a workload pod selector, matchLabels and
+    matchExpressions
+    Args:
+        selector (Dict[str, Any]): serialized LabelSelector
+    Returns:
+        str: label selector (ex: app=api,tier in (web,worker),!canary)
+    """
+    _requirements = [f"{_key}={_value}" for _key, _value in selector.get("matchLabels", {}).items()]
+    for _expression in selector.get("matchExpressions") or []:
+        _key, _operator = _expression["key"], _expression["operator"]
+        _values = ",".join(_expression.get("values") or [])
+        if _operator == "In":
+            _requirements.append(f"{_key} in ({_values})")
+        elif _operator == "NotIn":
+            _requirements.append(f"{_key} notin ({_values})")
+        elif _operator == "Exists":
+            _requirements.append(_key)
+        elif _operator == "DoesNotExist":
+            _requirements.append(f"!{_key}")
+        else:
+            raise Exception(f"Unknown label selector operator {_operator}")
+    return ",".join(_requirements)
+
+
+@dataclass
+class Metadata:
+    """
+
+    Object metadata
+    """
+
+    name: str
+    namespace: Optional[str] = None
+    resource_version: Optional[str] = None
+    generation: Optional[int] = None
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Metadata":
+        """
+
+        build metadata from API json
+        """
+        return cls(
+            data.get("name"),
+            data.get("namespace"),
+            data.get("resourceVersion"),
+            data.get("generation"),
+            data.get("labels") or {},
+        )
+
+
+@dataclass
+class Container:
+    """
+
+    Container fields used by the debugger
+    """
+
+    name: str
+    image: Optional[str] = None
+    command: Optional[List[str]] = None
+    args: Optional[List[str]] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Container":
+        """
+
+        build container from API json
+        """
+        return cls(data.get("name"), data.get("image"), data.get("command"), data.get("args"))
+
+
+@dataclass
+class PodSpec:
+    """
+
+    Pod spec
+    """
+
+    containers: List[Container]
+
+
+@dataclass
+class PodTemplate:
+    """
+
+    Pod template
+    """
+
+    spec: PodSpec
+
+
+@dataclass
+class WorkloadSpec:
+    """
+
+    Workload spec
+    """
+
+    template: PodTemplate
+    selector: Optional[dict] = None
+
+
+@dataclass
+class Workload:
+    """
+
+    Workload (deployment, daemonset...) with the fields used by the debugger,
+    full API json is kept in raw.
+    """
+
+    metadata: Metadata
+    spec: Optional[WorkloadSpec]
+    raw: dict = field(repr=False, default_factory=dict)
+    pod_spec: Optional[PodSpec] = None
+
+    @classmethod
+    def from_dict(cls, data: dict, object_type: str = "deployment") -> "Workload":
+        """
+
+        build workload from API json
+        """
+        _pod_spec = None
+        _kind = get_kind(object_type)
+        if _kind.workload:
+            _pod_spec = PodSpec(
+                [
+                    Container.from_dict(_item)
+                    for _item in _kind.pod_spec(data).get("containers", [])
+                ]
+            )
+        _spec = data.get("spec")
+        _workload_spec = None
+        if _spec and "template" in _spec:
+            _workload_spec = WorkloadSpec(
+                PodTemplate(
+                    PodSpec(
+                        [
+                            Container.from_dict(_item)
+                            for _item in _spec["template"]["spec"]["containers"]
+                        ]
+                    )
+                ),
+                _spec.get("selector"),
+            )
+        return cls(
+            Metadata.from_dict(data.get("metadata", {})), _workload_spec, data, _pod_spec
+        )
+
+
+@dataclass
+class ConnectionOptions:
+    """
+
+    HTTP connection options shared by every API call of a backend
+    """
+
+    pool_maxsize: Optional[int] = None
+    keep_alive: bool = True
+    gzip: bool = True
+
+    def socket_options(self) -> List[Tuple[int, int, int]]:
+        """
+
+        socket options of new connections, TCP keep-alive probes keep idle
+        pooled connections open through NAT and load balancers
+        Returns:
+            List[Tuple[int, int, int]]: socket options
+        """
+        _options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+        if self.keep_alive:
+            _options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                _options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEP_ALIVE_IDLE))
+        return _options
+
+    @property
+    def accept_encoding(self) -> str:
+        """
+
+        Accept-Encoding header of non streamed responses
+        Returns:
+            str: header value
+        """
+        return "gzip" if self.gzip else "identity"
+
+
+class Backend(ABC):
+    """
+
+    Backend interface, kube config is loaded on first API call
+    """
+
+    def __init__(
+        self,
+        _debug: bool = False,
+        configuration: client.Configuration = None,
+        recorder: CallRecorder = None,
+        connection: ConnectionOptions = None,
+        context: str = None,
+        limiter: AdaptiveLimiter = None,
+    ):  # pylint: disable=too-many-arguments
+        """
+
+        Backend constructor
+
+        Args:
+            _debug (bool): debug flag (default: False)
+            configuration (client.Configuration): kubernetes configuration,
+                loaded from kube config if not set (default: None)
+            recorder (CallRecorder): API call recorder (default: None)
+            connection (ConnectionOptions): HTTP connection options
+                (default: pooled, keep-alive and gzip)
+            context (str): kube config context (default: active context)
+            limiter (AdaptiveLimiter): client side throttling of every call
+                (default: None)
+        """
+        self._debug = _debug
+        self._lock = threading.Lock()
+        self._configuration: Optional[client.Configuration] = None
+        self._initial_configuration = configuration
+        self._recorder = recorder
+        self._connection = connection or ConnectionOptions()
+        self._context = context
+        self._limiter = limiter
+
+    @abstractmethod
+    def _load(self, configuration: client.Configuration):
+        """
+
+        build backend connection from loaded configuration
+        Args:
+            configuration (client.Configuration): kube configuration
+        """
+
+    @abstractmethod
+    def _pool_manager(self) -> Any:
+        """
+
+        return urllib3 pool manager of loaded backend
+        Returns:
+            Any: pool manager
+        """
+
+    def load(self) -> client.Configuration:
+        """
+
+        load kube config, once
+        Returns:
+            client.Configuration: configuration
+        """
+        with self._lock:
+            if self._configuration is None:
+                _start = time.perf_counter()
+                _configuration = self._initial_configuration
+                if _configuration is None:
+                    _configuration = client.Configuration()
+                    config.load_kube_config(
+                        context=self._context, client_configuration=_configuration
+                    )
+                if self._connection.pool_maxsize:
+                    _configuration.connection_pool_maxsize = self._connection.pool_maxsize
+                self._load(_configuration)
+                # pools are created per host on first request, with these options
+                self._pool_manager().connection_pool_kw[
+                    "socket_options"
+                ] = self._connection.socket_options()
+                if self._recorder is not None:
+                    self._recorder.instrument(self._pool_manager())
+                # every attempt is recorded, throttling wraps recorded requests
+                if self._limiter is not None:
+                    self._limiter.instrument(self._pool_manager())
+                self._configuration = _configuration
+                if self._debug:
+                    debug(
+                        f"Kube config loaded in {(time.perf_counter() - _start) * 1000:.0f} ms"
+                    )
+            return self._configuration
+
+    @property
+    def configuration(self) -> client.Configuration:
+        """
+
+        kubernetes configuration, loaded from kube config on first access
+        Returns:
+            client.Configuration: configuration
+        """
+        return self.load()
+
+    @abstractmethod
+    def get(self, path: str, query: Query, headers: Dict[str, str]) -> bytes:
+        """
+
+        GET raw response body
+        Args:
+            path (str): API path
+            query (Query): query params
+            headers (Dict[str, str]): headers
+        Returns:
+            bytes: response body
+        """
+
+    @abstractmethod
+    def stream(self, path: str, query: Query, headers: Dict[str, str]) -> Iterator[str]:
+        """
+
+        GET response lines as they arrive (watch)
+        Args:
+            path (str): API path
+            query (Query): query params
+            headers (Dict[str, str]): headers
+        Returns:
+            Iterator[str]: response lines
+        """
+
+    @abstractmethod
+    def read(self, object_type: str, name: str, namespace: str) -> Any:
+        """
+
+        read object
+        Args:
+            object_type (str): object type
+            name (str): object name
+            namespace (str): namespace name
+        Returns:
+            Any: object
+        """
+
+    @abstractmethod
+    def find(
+        self,
+        object_type: str,
+        namespace: str = None,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> List[Any]:
+        """
+
+        list objects, across all namespaces if namespace is not set
+        Args:
+            object_type (str): object type
+            namespace (str): namespace name
+            label_selector (str): label selector
+            field_selector (str): field selector
+        Returns:
+            List[Any]: objects
+        """
+
+    @abstractmethod
+    def patch(
+        self,
+        object_type: str,
+        name: str,
+        namespace: str,
+        body: Any,
+        subresource: str = None,
+    ) -> Any:
+        """
+
+        patch object, strategic merge patch for a dict body,
+        json patch for a list body
+        Args:
+            object_type (str): object type
+            name (str): object name
+            namespace (str): namespace name
+            body (Any): patch body
+            subresource (str): subresource (ex: ephemeralcontainers)
+        Returns:
+            Any: patched object
+        """
+
+    @abstractmethod
+    def create(self, object_type: str, namespace: str, body: dict) -> Any:
+        """
+
+        create object
+        Args:
+            object_type (str): object type
+            namespace (str): namespace name
+            body (dict): object
+        Returns:
+            Any: created object
+        """
+
+    @abstractmethod
+    def from_dict(self, object_type: str, data: dict) -> Any:
+        """
+
+        build object from API json (ex: a list item), kind and apiVersion
+        are set from the kind registry if missing
+        Args:
+            object_type (str): object type
+            data (dict): API json
+        Returns:
+            Any: object
+        """
+
+    @abstractmethod
+    def sanitize(self, _object: Any) -> dict:
+        """
+
+        return object as serializable dict
+        Args:
+            _object (Any): object
+        Returns:
+            dict: serializable object
+        """
+
+    def containers(self, _object: Any, object_type: str) -> List[Any]:
+        """
+
+        return containers of object pod spec
+        Args:
+            _object (Any): object
+            object_type (str): object type
+        Returns:
+            List[Any]: containers
+        """
+        return get_kind(object_type).containers(_object)
+
+
+class ClientBackend(Backend):
+    """
+
+    Backend using generated kubernetes client
+    """
+
+    def __init__(
+        self,
+        _debug: bool = False,
+        configuration: client.Configuration = None,
+        recorder: CallRecorder = None,
+        connection: ConnectionOptions = None,
+        context: str = None,
+        limiter: AdaptiveLimiter = None,
+    ):  # pylint: disable=too-many-arguments
+        super().__init__(_debug, configuration, recorder, connection, context, limiter)
+        self._api_client: Optional[client.ApiClient] = None
+        self._apis: Dict[str, Any] = {}
+
+    def _load(self, configuration: client.Configuration):
+        self._api_client = client.ApiClient(configuration)
+        # ApiClient default headers override call headers, Accept-Encoding is
+        # added per request so that streams keep their identity encoding
+        _rest_client = self._api_client.rest_client
+        _request = _rest_client.request
+        _accept_encoding = self._connection.accept_encoding
+
+        def _encoded_request(method: str, url: str, query_params=None, headers=None, **kwargs):
+            return _request(
+                method,
+                url,
+                query_params,
+                {"Accept-Encoding": _accept_encoding, **(headers or {})},
+                **kwargs,
+            )
+
+        _rest_client.request = _encoded_request
+
+    def _pool_manager(self) -> Any:
+        return self._api_client.rest_client.pool_manager
+
+    @property
+    def api_client(self) -> client.ApiClient:
+        """
+
+        shared api client
+        Returns:
+            client.ApiClient: api client
+        """
+        self.load()
+        return self._api_client
+
+    @property
+    def apps_v1_api(self) -> client.AppsV1Api:
+        """
+
+        apps/v1 api
+        Returns:
+            client.AppsV1Api: apps/v1 api
+        """
+        return self._api("deployment")[0]
+
+    @property
+    def core_v1_api(self) -> client.CoreV1Api:
+        """
+
+        core/v1 api
+        Returns:
+            client.CoreV1Api: core/v1 api
+        """
+        return self._api("namespace")[0]
+
+    def _call(self, path: str, query: Query, headers: Dict[str, str]):
+        return self.api_client.call_api(
+            path,
+            "GET",
+            query_params=query,
+            header_params=headers,
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
+            _preload_content=False,
+        )
+
+    def get(self, path: str, query: Query, headers: Dict[str, str]) -> bytes:
+        return self._call(path, query, headers).data
+
+    def stream(self, path: str, query: Query, headers: Dict[str, str]) -> Iterator[str]:
+        # watch lines are read undecoded, they must not be compressed
+        return iter_resp_lines(
+            self._call(path, query, {**headers, "Accept-Encoding": "identity"})
+        )
+
+    def _api(self, object_type: str) -> Tuple[Any, str]:
+        """
+
+        return generated api and function suffix of an object type
+        Args:
+            object_type (str): object type
+        Returns:
+            Tuple[Any, str]: api (ex: AppsV1Api) and suffix (ex: daemon_set)
+        """
+        _kind = get_kind(object_type)
+        _api = self._apis.get(_kind.api_class)
+        if _api is None:
+            _api = self._apis[_kind.api_class] = getattr(client, _kind.api_class)(
+                self.api_client
+            )
+        return _api, _kind.client_name
+
+    def read(self, object_type: str, name: str, namespace: str) -> Any:
+        _api, _suffix = self._api(object_type)
+        return getattr(_api, f"read_namespaced_{_suffix}")(name, namespace)
+
+    def find(
+        self,
+        object_type: str,
+        namespace: str = None,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> List[Any]:
+        _kwargs = {
+            _key: _value
+            for _key, _value in (
+                ("label_selector", label_selector),
+                ("field_selector", field_selector),
+            )
+            if _value
+        }
+        _api, _suffix = self._api(object_type)
+        if namespace:
+            _items = getattr(_api, f"list_namespaced_{_suffix}")(namespace, **_kwargs).items
+        else:
+            _items = getattr(_api, f"list_{_suffix}_for_all_namespaces")(**_kwargs).items
+        # list items come without kind and apiVersion
+        _kind = get_kind(object_type)
+        for _item in _items:
+            _item.kind = _kind.api_kind
+            _item.api_version = _kind.api_version
+        return _items
+
+    def patch(
+        self,
+        object_type: str,
+        name: str,
+        namespace: str,
+        body: Any,
+        subresource: str = None,
+    ) -> Any:
+        _api, _suffix = self._api(object_type)
+        if subresource:
+            _suffix = f"{_suffix}_{subresource}"
+        _patch = getattr(_api, f"patch_namespaced_{_suffix}", None)
+        if _patch is None:
+            raise Exception(f"Unknown subresource {object_type}/{subresource}")
+        return _patch(name, namespace, body)
+
+    def create(self, object_type: str, namespace: str, body: dict) -> Any:
+        _api, _suffix = self._api(object_type)
+        return getattr(_api, f"create_namespaced_{_suffix}")(namespace, body)
+
+    def from_dict(self, object_type: str, data: dict) -> Any:
+        _kind = get_kind(object_type)
+        return self.api_client.deserialize(
+            SimpleNamespace(
+                data=json.dumps({"apiVersion": _kind.api_version, "kind": _kind.api_kind, **data})
+            ),
+            f"V1{_kind.api_kind}",
+        )
+
+    def sanitize(self, _object: Any) -> dict:
+        return self.api_client.sanitize_for_serialization(_object)
+
+
+class RawBackend(Backend):
+    """
+
+    Backend sending raw JSON requests over pooled HTTP connections,
+    responses are parsed into light Workload objects.
+    """
+
+    def __init__(
+        self,
+        _debug: bool = False,
+        configuration: client.Configuration = None,
+        recorder: CallRecorder = None,
+        connection: ConnectionOptions = None,
+        context: str = None,
+        limiter: AdaptiveLimiter = None,
+    ):  # pylint: disable=too-many-arguments
+        super().__init__(_debug, configuration, recorder, connection, context, limiter)
+        self._pool: Any = None
+
+    def _load(self, configuration: client.Configuration):
+        self._pool = rest.RESTClientObject(configuration).pool_manager
+
+    def _pool_manager(self) -> Any:
+        return self._pool
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        query: Query = None,
+        headers: Dict[str, str] = None,
+        body: Any = None,
+        preload_content: bool = True,
+    ):
+        """
+
+        send request, raise ApiException on error status
+        Args:
+            method (str): HTTP method
+            path (str): API path
+            query (Query): query params
+            headers (Dict[str, str]): headers
+            body (Any): json body
+            preload_content (bool): read response body
+        Returns:
+            urllib3.HTTPResponse: response
+        """
+        _configuration = self.configuration
+        _headers = {
+            "Accept": "application/json",
+            # watch lines are read undecoded, they must not be compressed
+            "Accept-Encoding": (
+                self._connection.accept_encoding if preload_content else "identity"
+            ),
+        }
+        _headers.update(headers or {})
+        _token = _configuration.get_api_key_with_prefix("authorization")
+        if _token:
+            _headers["Authorization"] = _token
+        _url = _configuration.host + path
+        if query:
+            _url += "?" + urlencode(query)
+        _body = None
+        if body is not None:
+            _body = json.dumps(body).encode()
+            if method != "PATCH":
+                _headers["Content-Type"] = "application/json"
+            elif isinstance(body, list):
+                _headers["Content-Type"] = "application/json-patch+json"
+            else:
+                _headers["Content-Type"] = "application/strategic-merge-patch+json"
+        _response = self._pool.request(
+            method, _url, body=_body, headers=_headers, preload_content=preload_content
+        )
+        if _response.status >= 400:
+            if not preload_content:
+                _response.read()
+            raise ApiException(http_resp=_response)
+        return _response
+
+    def get(self, path: str, query: Query, headers: Dict[str, str]) -> bytes:
+        return self._request("GET", path, query, headers).data
+
+    def stream(self, path: str, query: Query, headers: Dict[str, str]) -> Iterator[str]:
+        _response = self._request("GET", path, query, headers, preload_content=False)
+        try:
+            yield from iter_resp_lines(_response)
+        finally:
+            _response.release_conn()
+
+    def read(self, object_type: str, name: str, namespace: str) -> Workload:
+        _data = self._request("GET", f"{collection_path(object_type, namespace)}/{name}").data
+        return Workload.from_dict(json.loads(_data), object_type)
+
+    def find(
+        self,
+        object_type: str,
+        namespace: str = None,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> List[Workload]:
+        _data = self._request(
+            "GET",
+            collection_path(object_type, namespace),
+            selector_query(label_selector, field_selector),
+        ).data
+        return [self.from_dict(object_type, _item) for _item in json.loads(_data)["items"]]
+
+    def patch(
+        self,
+        object_type: str,
+        name: str,
+        namespace: str,
+        body: Any,
+        subresource: str = None,
+    ) -> Workload:
+        _path = f"{collection_path(object_type, namespace)}/{name}"
+        if subresource:
+            _path += f"/{subresource}"
+        _data = self._request("PATCH", _path, body=body).data
+        return Workload.from_dict(json.loads(_data), object_type)
+
+    def create(self, object_type: str, namespace: str, body: dict) -> Any:
+        return json.loads(
+            self._request(
+                "POST", collection_path(object_type, namespace), body=body
+            ).data
+        )
+
+    def from_dict(self, object_type: str, data: dict) -> Workload:
+        _kind = get_kind(object_type)
+        return Workload.from_dict(
+            {"apiVersion": _kind.api_version, "kind": _kind.api_kind, **data}, object_type
+        )
+
+    def sanitize(self, _object: Workload) -> dict:
+        return _object.raw
+
+    def containers(self, _object: Workload, object_type: str) -> List[Container]:
+        return _object.pod_spec.containers
+
+
+def make_backend(
+    name: str = "client",
+    _debug: bool = False,
+    recorder: CallRecorder = None,
+    connection: ConnectionOptions = None,
+    context: str = None,
+    limiter: AdaptiveLimiter = None,
+) -> Backend:
+    """
+
+    build backend by name
+    Args:
+        name (str): backend name, one of BACKENDS (default: client)
+        _debug (bool): debug flag
+        recorder (CallRecorder): API call recorder (default: None)
+        connection (ConnectionOptions): HTTP connection options (default: None)
+        context (str): kube config context (default: active context)
+        limiter (AdaptiveLimiter): client side throttling (default: None)
+    Returns:
+        Backend: backend
+    """
+    _backends = {"raw": RawBackend, "client": ClientBackend}
+    if name not in _backends:
+        raise ValueError(f"Unknown backend {name} ({BACKENDS})")
+    return _backends[name](
+        _debug, recorder=recorder, connection=connection, context=context, limiter=limiter
+    )
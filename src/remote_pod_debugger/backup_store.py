@@ -0,0 +1,235 @@
+"""
+
+Backup store
+
+Backups are stored as gzipped compact JSON, content-addressed by the
+sha256 of the object without its volatile fields (resourceVersion,
+managedFields, status), so identical snapshots are stored once. An
+append-only JSON lines index maps context/namespace/kind/name/resourceVersion
+to object hashes, entries are written and read one at a time. Restore
+points are kept next to the backups, in one directory per context.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+
+BACKUP_DIR = os.path.join(os.path.expanduser("~"), ".config", "remote_debugger_backups")
+VOLATILE_METADATA = ("resourceVersion", "managedFields")
+
+
+def snapshot(_object: dict) -> dict:
+    """
+
+    return object without volatile fields
+    Args:
+        _object (dict): serialized object
+    Returns:
+        dict: snapshot
+    """
+    _snapshot = {_key: _value for _key, _value in _object.items() if _key != "status"}
+    _snapshot["metadata"] = {
+        _key: _value
+        for _key, _value in _object.get("metadata", {}).items()
+        if _key not in VOLATILE_METADATA
+    }
+    return _snapshot
+
+
+class BackupStore:
+    """
+
+    Compressed, content-addressed backup store
+    """
+
+    def __init__(self, context: str = "", path: str = BACKUP_DIR):
+        """
+
+        BackupStore constructor
+
+        Args:
+            context (str): kube context name
+            path (str): store directory (default: BACKUP_DIR)
+        """
+        self._context = context
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self) -> str:
+        """
+
+        index file path
+        Returns:
+            str: index path
+        """
+        return os.path.join(self._path, "index.jsonl")
+
+    def object_path(self, digest: str) -> str:
+        """
+
+        return path of stored object
+        Args:
+            digest (str): object hash
+        Returns:
+            str: object path
+        """
+        return os.path.join(self._path, "objects", digest[:2], f"{digest}.json.gz")
+
+    def put(self, namespace: str, kind: str, _object: dict) -> str:
+        """
+
+        store object, write it only if this snapshot is not stored yet
+        Args:
+            namespace (str): namespace name
+            kind (str): object type
+            _object (dict): serialized object
+        Returns:
+            str: object hash
+        """
+        _data = json.dumps(snapshot(_object), sort_keys=True, separators=(",", ":")).encode()
+        _digest = hashlib.sha256(_data).hexdigest()
+        _path = self.object_path(_digest)
+        if not os.path.exists(_path):
+            os.makedirs(os.path.dirname(_path), exist_ok=True)
+            _fd, _tmp_path = tempfile.mkstemp(dir=os.path.dirname(_path))
+            with os.fdopen(_fd, "wb") as _file, gzip.GzipFile(
+                fileobj=_file, mode="wb", mtime=0
+            ) as _gzip:
+                _gzip.write(_data)
+            os.replace(_tmp_path, _path)
+        _entry = {
+            "context": self._context,
+            "namespace": namespace,
+            "kind": kind,
+            "name": _object["metadata"]["name"],
+            "resourceVersion": _object["metadata"].get("resourceVersion"),
+            "hash": _digest,
+            "time": time.time(),
+        }
+        with self._lock, open(self.index_path, "a", encoding="utf-8") as _file:
+            _file.write(json.dumps(_entry) + "\n")
+        return _digest
+
+    def get(self, digest: str) -> dict:
+        """
+
+        read stored object
+        Args:
+            digest (str): object hash
+        Returns:
+            dict: object snapshot
+        """
+        with gzip.open(self.object_path(digest), "rb") as _file:
+            return json.load(_file)
+
+    def entries(
+        self, namespace: str = None, kind: str = None, name: str = None
+    ) -> Iterator[dict]:
+        """
+
+        iterate index entries of current context, oldest first
+        Args:
+            namespace (str): namespace filter
+            kind (str): object type filter
+            name (str): object name filter
+        Returns:
+            Iterator[dict]: index entries
+        """
+        try:
+            _file = open(self.index_path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with _file:
+            for _line in _file:
+                _entry = json.loads(_line)
+                if (
+                    _entry["context"] == self._context
+                    and namespace in (None, _entry["namespace"])
+                    and kind in (None, _entry["kind"])
+                    and name in (None, _entry["name"])
+                ):
+                    yield _entry
+
+    def latest(self, namespace: str, kind: str, name: str) -> Optional[dict]:
+        """
+
+        return latest index entry of an object
+        Args:
+            namespace (str): namespace name
+            kind (str): object type
+            name (str): object name
+        Returns:
+            Optional[dict]: index entry, None if never backed up
+        """
+        _latest = None
+        for _latest in self.entries(namespace, kind, name):
+            pass
+        return _latest
+
+    def restore_point_path(self, namespace: str, kind: str, name: str) -> str:
+        """
+
+        return restore point path of an object in current context
+        Args:
+            namespace (str): namespace name
+            kind (str): object type
+            name (str): object name
+        Returns:
+            str: restore point path
+        """
+        return os.path.join(
+            self._path,
+            "restore",
+            quote(self._context, safe="") or "default",
+            f"{namespace}.{kind}.{name}.json",
+        )
+
+    def save_restore_point(self, point: dict):
+        """
+
+        write restore point of an object, replace previous one
+        Args:
+            point (dict): restore point (see restore.restore_point)
+        """
+        _path = self.restore_point_path(point["namespace"], point["object_type"], point["name"])
+        os.makedirs(os.path.dirname(_path), exist_ok=True)
+        _fd, _tmp_path = tempfile.mkstemp(dir=os.path.dirname(_path))
+        with os.fdopen(_fd, "w", encoding="utf-8") as _file:
+            json.dump(point, _file)
+        os.replace(_tmp_path, _path)
+
+    def load_restore_point(self, namespace: str, kind: str, name: str) -> Optional[dict]:
+        """
+
+        read restore point of an object
+        Args:
+            namespace (str): namespace name
+            kind (str): object type
+            name (str): object name
+        Returns:
+            Optional[dict]: restore point, None if missing
+        """
+        try:
+            _file = open(self.restore_point_path(namespace, kind, name), encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        with _file:
+            return json.load(_file)
+
+    def remove_restore_point(self, namespace: str, kind: str, name: str):
+        """
+
+        remove restore point of an object, once restored
+        Args:
+            namespace (str): namespace name
+            kind (str): object type
+            name (str): object name
+        """
+        os.remove(self.restore_point_path(namespace, kind, name))
@@ -0,0 +1,714 @@
+"""
+
+Batch patch
+
+Besides patching directly, a batch can be planned and applied later: the
+plan resolves targets and computes their patches without prompt nor write
+call, and is saved as JSON. Applying a plan sends the planned patches
+concurrently and reports results as JSON.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import json
+import sys
+import time
+from typing import IO, Any, Callable, Iterable, List, Optional
+
+from kubernetes.client.exceptions import ApiException
+
+from remote_pod_debugger.container_index import ContainerRef
+from remote_pod_debugger.pod_debugger import OBJECT_TYPES, PATCHABLE_TYPES, PodDebugger
+from remote_pod_debugger.utils import info, warning
+from remote_pod_debugger.wheel import wheel_config_map
+
+
+RETRY_STATUSES = (409, 429)
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+PLAN_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Target:
+    """
+
+    Workload to patch
+    """
+
+    namespace: str
+    object_type: str
+    name: str
+
+    @classmethod
+    def parse(cls, value: str, namespace: str = None, ephemeral: bool = False) -> "Target":
+        """
+
+        parse target from "[namespace/]object_type/name"
+        Args:
+            value (str): target string
+            namespace (str): default namespace
+            ephemeral (bool): target is debugged with an ephemeral container,
+                kinds with immutable containers (job, pod) are allowed
+        Returns:
+            Target: target
+        """
+        _parts = value.split("/")
+        if len(_parts) == 2 and namespace:
+            _parts.insert(0, namespace)
+        if len(_parts) != 3 or not all(_parts):
+            raise ValueError(f"Invalid target {value}, expected namespace/type/name")
+        _types = OBJECT_TYPES if ephemeral else PATCHABLE_TYPES
+        if _parts[1] not in _types:
+            raise ValueError(f"Invalid object type {_parts[1]} ({_types})")
+        return cls(*_parts)
+
+    def __str__(self) -> str:
+        return f"{self.namespace}/{self.object_type}/{self.name}"
+
+
+@dataclass
+class BatchResult:
+    """
+
+    Result of one target patch
+    """
+
+    target: Target
+    success: bool
+    elapsed: float
+    attempts: int
+    error: Optional[str] = None
+
+
+@dataclass
+class PlanStep:
+    """
+
+    Planned patch of one target, body is None if target is already patched
+    """
+
+    target: Target
+    container: Optional[str] = None
+    body: Optional[dict] = None
+    generation: Optional[int] = None
+    backup: bool = False
+    wheel_config_map: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        """
+
+        return step as json
+        Returns:
+            dict: step
+        """
+        return {
+            "namespace": self.target.namespace,
+            "object_type": self.target.object_type,
+            "name": self.target.name,
+            "container": self.container,
+            "body": self.body,
+            "generation": self.generation,
+            "backup": self.backup,
+            "wheel_config_map": self.wheel_config_map,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlanStep":
+        """
+
+        build step from json
+        Args:
+            data (dict): step
+        Returns:
+            PlanStep: step
+        """
+        return cls(
+            Target(data["namespace"], data["object_type"], data["name"]),
+            data.get("container"),
+            data.get("body"),
+            data.get("generation"),
+            data.get("backup", False),
+            data.get("wheel_config_map"),
+            data.get("error"),
+        )
+
+
+def retry_delay(error: ApiException, attempt: int, backoff: float) -> float:
+    """
+
+    return delay before retrying, honor Retry-After header on 429
+    Args:
+        error (ApiException): api error
+        attempt (int): attempt number, starting at 1
+        backoff (float): base backoff in seconds
+    Returns:
+        float: delay in seconds
+    """
+    _retry_after = (error.headers or {}).get("Retry-After")
+    if _retry_after:
+        try:
+            return float(_retry_after)
+        except ValueError:
+            pass
+    return backoff * 2 ** (attempt - 1)
+
+
+def error_message(error: Exception) -> str:
+    """
+
+    return short error message, status and reason for API errors
+    Args:
+        error (Exception): error
+    Returns:
+        str: message
+    """
+    if isinstance(error, ApiException):
+        return f"{error.status} {error.reason}"
+    return str(error)
+
+
+class BatchPatcher:
+    """
+
+    Patch several workloads concurrently with a bounded worker pool
+    """
+
+    def __init__(
+        self,
+        pod_debugger: PodDebugger,
+        max_workers: int = DEFAULT_WORKERS,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+    ):
+        """
+
+        BatchPatcher constructor
+
+        Args:
+            pod_debugger (PodDebugger): pod debugger used for API calls
+            max_workers (int): max concurrent patches (default: DEFAULT_WORKERS)
+            retries (int): max retries on 409/429 (default: DEFAULT_RETRIES)
+            backoff (float): base backoff in seconds (default: DEFAULT_BACKOFF)
+        """
+        self._pod_debugger = pod_debugger
+        self._max_workers = max_workers
+        self._retries = retries
+        self._backoff = backoff
+
+    def resolve(
+        self,
+        namespace: str = None,
+        label_selector: str = None,
+        object_types: Iterable[str] = PATCHABLE_TYPES,
+        field_selector: str = None,
+    ) -> List[Target]:
+        """
+
+        resolve targets from label and field selectors, one list request
+        per object type
+        Args:
+            namespace (str): namespace name (default: all namespaces)
+            label_selector (str): label selector
+            object_types (Iterable[str]): object types to look for
+                (default: PATCHABLE_TYPES)
+            field_selector (str): field selector
+        Returns:
+            List[Target]: targets
+        """
+        return [
+            Target(_namespace, _type, _name)
+            for _type in object_types
+            for _namespace, _name in self._pod_debugger.find_objects(
+                _type, namespace, label_selector, field_selector
+            )
+        ]
+
+    def _patch_one(
+        self, target: Target, container_name: str = None, backup: bool = False, **kwargs
+    ) -> BatchResult:
+        """
+
+        patch one target, retry on conflict and throttling
+        Args:
+            target (Target): target to patch
+            container_name (str): container name, first container if not set
+            backup (bool): backup object and save restore point before patch
+            kwargs: PodDebugger.patch arguments
+        Returns:
+            BatchResult: patch result
+        """
+
+        def _patch():
+            if backup:
+                self._pod_debugger.store_backup(
+                    target.name, target.namespace, target.object_type
+                )
+            self._pod_debugger.patch(
+                target.name,
+                target.namespace,
+                container_name=container_name or self._first_container(target),
+                object_name=target.object_type,
+                save_restore=backup,
+                **kwargs,
+            )
+
+        return self._retry(target, _patch)
+
+    def _restore_one(self, target: Target) -> BatchResult:
+        """
+
+        restore one target, retry on throttling
+        Args:
+            target (Target): target to restore
+        Returns:
+            BatchResult: restore result
+        """
+        return self._retry(
+            target,
+            lambda: self._pod_debugger.restore(
+                target.name, target.namespace, target.object_type
+            ),
+        )
+
+    def _retry(self, target: Target, call: Callable[[], Any]) -> BatchResult:
+        """
+
+        run call for target, retry on conflict and throttling
+        Args:
+            target (Target): target
+            call (Callable[[], Any]): API call
+        Returns:
+            BatchResult: call result
+        """
+        _start = time.perf_counter()
+        _attempt = 0
+        while True:
+            _attempt += 1
+            try:
+                call()
+                return BatchResult(
+                    target, True, time.perf_counter() - _start, _attempt
+                )
+            except ApiException as error:
+                if error.status not in RETRY_STATUSES or _attempt > self._retries:
+                    return BatchResult(
+                        target,
+                        False,
+                        time.perf_counter() - _start,
+                        _attempt,
+                        error_message(error),
+                    )
+                if error.status == 409:
+                    self._pod_debugger.invalidate(
+                        target.name, target.namespace, target.object_type
+                    )
+                time.sleep(retry_delay(error, _attempt, self._backoff))
+            except Exception as error:  # pylint: disable=broad-except
+                return BatchResult(
+                    target, False, time.perf_counter() - _start, _attempt, str(error)
+                )
+
+    def _first_container(self, target: Target) -> str:
+        """
+
+        return first container name of target
+        Args:
+            target (Target): target
+        Returns:
+            str: container name
+        """
+        return self._pod_debugger.get_container_names(
+            target.name, target.namespace, target.object_type
+        )[0]
+
+    def patch(self, targets: List[Target], **kwargs) -> List[BatchResult]:
+        """
+
+        patch targets concurrently
+        Args:
+            targets (List[Target]): targets to patch
+            kwargs: PodDebugger.patch arguments, container_name and backup
+        Returns:
+            List[BatchResult]: results, in targets order
+        """
+        with ThreadPoolExecutor(max_workers=self._max_workers) as _executor:
+            return list(
+                _executor.map(lambda _target: self._patch_one(_target, **kwargs), targets)
+            )
+
+    def _plan_one(
+        self,
+        target: Target,
+        container_name: str = None,
+        backup: bool = False,
+        wheel_config_map_name: str = None,
+        **kwargs,
+    ) -> PlanStep:
+        """
+
+        compute patch of one target, errors are recorded in the step
+        Args:
+            target (Target): target to plan
+            container_name (str): container name, first container if not set
+            backup (bool): backup object and save restore point at apply
+            wheel_config_map_name (str): remote_pdb wheel ConfigMap to mount
+            kwargs: PodDebugger.patch_body arguments
+        Returns:
+            PlanStep: planned step
+        """
+        _step = PlanStep(target, backup=backup, wheel_config_map=wheel_config_map_name)
+        try:
+            _step.container = container_name or self._first_container(target)
+            _step.body = self._pod_debugger.patch_body(
+                target.name,
+                target.namespace,
+                container_name=_step.container,
+                object_name=target.object_type,
+                wheel_config_map_name=wheel_config_map_name,
+                **kwargs,
+            )
+            _step.generation = self._pod_debugger.generation(
+                target.name, target.namespace, target.object_type
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            _step.error = error_message(error)
+        return _step
+
+    def plan(self, targets: List[Target], **kwargs) -> List[PlanStep]:
+        """
+
+        compute patches of targets concurrently, only read calls are made
+        Args:
+            targets (List[Target]): targets to plan
+            kwargs: PodDebugger.patch_body arguments, container_name and backup
+        Returns:
+            List[PlanStep]: steps, in targets order
+        """
+        _wheel = self._pod_debugger.remote_pdb_wheel
+        _wheel_config_map = wheel_config_map(_wheel)[0] if _wheel else None
+        with ThreadPoolExecutor(max_workers=self._max_workers) as _executor:
+            return list(
+                _executor.map(
+                    lambda _target: self._plan_one(
+                        _target, wheel_config_map_name=_wheel_config_map, **kwargs
+                    ),
+                    targets,
+                )
+            )
+
+    def _apply_one(self, step: PlanStep) -> BatchResult:
+        """
+
+        send planned patch of one target, refused if the object spec changed
+        since the plan
+        Args:
+            step (PlanStep): planned step
+        Returns:
+            BatchResult: patch result, no attempt if already patched
+        """
+        _target = step.target
+        if step.error:
+            return BatchResult(_target, False, 0.0, 0, step.error)
+        if step.body is None:
+            return BatchResult(_target, True, 0.0, 0)
+
+        def _apply():
+            _generation = self._pod_debugger.generation(
+                _target.name, _target.namespace, _target.object_type
+            )
+            if _generation != step.generation:
+                raise Exception(
+                    f"{_target} changed since plan (generation {step.generation}"
+                    f" -> {_generation})"
+                )
+            if step.wheel_config_map:
+                if not self._pod_debugger.remote_pdb_wheel:
+                    raise Exception(f"Plan mounts {step.wheel_config_map}, wheel is missing")
+                _name = self._pod_debugger.ensure_wheel(_target.namespace)
+                if _name != step.wheel_config_map:
+                    raise Exception(f"Plan mounts {step.wheel_config_map}, wheel is {_name}")
+            if step.backup:
+                self._pod_debugger.store_backup(
+                    _target.name, _target.namespace, _target.object_type
+                )
+            self._pod_debugger.apply_patch(
+                _target.name,
+                _target.namespace,
+                step.body,
+                _target.object_type,
+                step.container,
+                step.backup,
+            )
+
+        return self._retry(_target, _apply)
+
+    def apply(self, steps: List[PlanStep]) -> List[BatchResult]:
+        """
+
+        send planned patches concurrently
+        Args:
+            steps (List[PlanStep]): planned steps
+        Returns:
+            List[BatchResult]: results, in steps order
+        """
+        with ThreadPoolExecutor(max_workers=self._max_workers) as _executor:
+            return list(_executor.map(self._apply_one, steps))
+
+    def patch_matches(self, containers: Iterable[ContainerRef], **kwargs) -> List[BatchResult]:
+        """
+
+        patch matching containers as they are found, the first match of
+        an object is patched
+        Args:
+            containers (Iterable[ContainerRef]): matching containers, ex: from
+                PodDebugger.search
+            kwargs: PodDebugger.patch arguments and backup
+        Returns:
+            List[BatchResult]: results, in match order
+        """
+        _futures = []
+        _seen = set()
+        with ThreadPoolExecutor(max_workers=self._max_workers) as _executor:
+            for _container in containers:
+                _target = Target(_container.namespace, _container.object_type, _container.name)
+                if _target in _seen:
+                    continue
+                _seen.add(_target)
+                info(f"Found {_target} container {_container.container} ({_container.image})")
+                _futures.append(
+                    _executor.submit(
+                        self._patch_one, _target, container_name=_container.container, **kwargs
+                    )
+                )
+            return [_future.result() for _future in _futures]
+
+    def restore(self, targets: List[Target]) -> List[BatchResult]:
+        """
+
+        restore targets concurrently from their restore points
+        Args:
+            targets (List[Target]): targets to restore
+        Returns:
+            List[BatchResult]: results, in targets order
+        """
+        with ThreadPoolExecutor(max_workers=self._max_workers) as _executor:
+            return list(_executor.map(self._restore_one, targets))
+
+
+def print_summary(results: List[BatchResult], elapsed: float, action: str = "Patched"):
+    """
+
+    print per target results and aggregate timing
+    Args:
+        results (List[BatchResult]): batch results
+        elapsed (float): total elapsed time in seconds
+        action (str): summary action (default: Patched)
+    """
+    for _result in results:
+        _line = (
+            f"{_result.target}: {_result.elapsed:.2f}s, {_result.attempts} attempt(s)"
+        )
+        if _result.success:
+            info(f"OK {_line}")
+        else:
+            warning(f"FAILED {_line}: {_result.error}")
+    _succeeded = sum(1 for _result in results if _result.success)
+    _elapsed = [_result.elapsed for _result in results]
+    info(
+        f"{action} {_succeeded}/{len(results)} objects in {elapsed:.2f}s"
+        + (
+            f" (min {min(_elapsed):.2f}s, max {max(_elapsed):.2f}s,"
+            f" avg {sum(_elapsed) / len(_elapsed):.2f}s)"
+            if _elapsed
+            else ""
+        )
+    )
+
+
+def write_plan(steps: List[PlanStep], output: IO):
+    """
+
+    write plan as json
+    Args:
+        steps (List[PlanStep]): planned steps
+        output (IO): output file
+    """
+    json.dump(
+        {"version": PLAN_VERSION, "steps": [_step.to_dict() for _step in steps]},
+        output,
+        indent=2,
+    )
+    output.write("\n")
+
+
+def read_plan(_input: IO) -> List[PlanStep]:
+    """
+
+    read plan written by write_plan
+    Args:
+        _input (IO): input file
+    Returns:
+        List[PlanStep]: planned steps
+    """
+    _plan = json.load(_input)
+    if _plan.get("version") != PLAN_VERSION:
+        raise Exception(f"Unsupported plan version {_plan.get('version')}")
+    return [PlanStep.from_dict(_step) for _step in _plan["steps"]]
+
+
+def write_results(results: List[BatchResult], elapsed: float, output: IO):
+    """
+
+    write batch results as json
+    Args:
+        results (List[BatchResult]): batch results
+        elapsed (float): total elapsed time in seconds
+        output (IO): output file
+    """
+    json.dump(
+        {
+            "elapsed": elapsed,
+            "succeeded": sum(1 for _result in results if _result.success),
+            "results": [
+                {
+                    "target": str(_result.target),
+                    "success": _result.success,
+                    "elapsed": _result.elapsed,
+                    "attempts": _result.attempts,
+                    "error": _result.error,
+                }
+                for _result in results
+            ],
+        },
+        output,
+        indent=2,
+    )
+    output.write("\n")
+
+
+def batch_targets(patcher: BatchPatcher, args: argparse.Namespace) -> List[Target]:
+    """
+
+    return targets of --target args, and objects matching selectors
+    Args:
+        patcher (BatchPatcher): batch patcher
+        args (argparse.Namespace): args namespace
+    Returns:
+        List[Target]: targets
+    """
+    _targets = [Target.parse(_item, args.namespace) for _item in args.target]
+    if args.selector or args.field_selector:
+        _targets += patcher.resolve(
+            args.namespace, args.selector, field_selector=args.field_selector
+        )
+    return _targets
+
+
+def patch_arguments(args: argparse.Namespace) -> dict:
+    """
+
+    return BatchPatcher.patch arguments, prompt missing host, port and
+    entrypoint
+    Args:
+        args (argparse.Namespace): args namespace
+    Returns:
+        dict: patch arguments
+    """
+    _host = input("Host of debugger?\n> ") if not args.host else args.host
+    _port = input("Port of debugger?\n> ") if not args.port else args.port
+    _entrypoint = (
+        input("Python entrypoint?\n> ") if not args.entrypoint else args.entrypoint
+    )
+    return {
+        "host": _host,
+        "port": int(_port),
+        "entrypoint": _entrypoint,
+        "container_name": args.container,
+        "image_name": args.image_name,
+        "pdb_commands": args.pdb_command,
+        "backup": args.backup,
+    }
+
+
+def run_batch(pod_debugger: PodDebugger, args: argparse.Namespace, output: IO = None):
+    """
+
+    Run batch patch from command line args
+    Args:
+        pod_debugger (PodDebugger): pod debugger
+        args (argparse.Namespace): args namespace
+        output (IO): output of json plans and results (default: stdout)
+    """
+    _output = output or sys.stdout
+    _workers = args.workers or DEFAULT_WORKERS
+    _patcher = BatchPatcher(pod_debugger, max_workers=_workers)
+    if args.find_image or args.find_arg:
+        _kwargs = patch_arguments(args)
+        del _kwargs["container_name"]
+        info(
+            f"Searching containers of {args.namespace or 'all namespaces'},"
+            f" patching matches with {_workers} workers"
+        )
+        _start = time.perf_counter()
+        _results = _patcher.patch_matches(
+            pod_debugger.search(
+                args.find_image, args.find_arg, args.namespace, args.selector
+            ),
+            **_kwargs,
+        )
+        if not _results:
+            raise Exception("Can't find container to patch")
+        print_summary(_results, time.perf_counter() - _start)
+        return
+    if args.apply:
+        if args.apply == "-":
+            _steps = read_plan(sys.stdin)
+        else:
+            with open(args.apply, encoding="utf-8") as _file:
+                _steps = read_plan(_file)
+        info(f"Applying {len(_steps)} planned patches with {_workers} workers")
+        _start = time.perf_counter()
+        _results = _patcher.apply(_steps)
+        _elapsed = time.perf_counter() - _start
+        print_summary(_results, _elapsed)
+        write_results(_results, _elapsed, _output)
+        return
+    _targets = batch_targets(_patcher, args)
+    if not _targets:
+        raise Exception("Can't find object to patch")
+    if args.restore:
+        info(f"Restoring {len(_targets)} objects with {_workers} workers")
+        _start = time.perf_counter()
+        _results = _patcher.restore(_targets)
+        print_summary(_results, time.perf_counter() - _start, "Restored")
+        return
+    if args.plan:
+        info(f"Planning {len(_targets)} objects with {_workers} workers")
+        _steps = _patcher.plan(
+            _targets,
+            host=args.host,
+            port=args.port,
+            entrypoint=args.entrypoint,
+            container_name=args.container,
+            image_name=args.image_name,
+            pdb_commands=args.pdb_command,
+            backup=args.backup,
+        )
+        for _step in _steps:
+            if _step.error:
+                warning(f"FAILED {_step.target}: {_step.error}")
+        if args.plan == "-":
+            write_plan(_steps, _output)
+        else:
+            with open(args.plan, "w", encoding="utf-8") as _file:
+                write_plan(_steps, _file)
+        return
+    _kwargs = patch_arguments(args)
+    info(f"Patching {len(_targets)} objects with {_workers} workers")
+    _start = time.perf_counter()
+    _results = _patcher.patch(_targets, **_kwargs)
+    print_summary(_results, time.perf_counter() - _start)
@@ -0,0 +1,93 @@
+"""
+
+Object cache
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+CacheKey = Tuple[str, str, str]
+
+
+def resource_version(_object: Any) -> Optional[str]:
+    """
+
+    return resourceVersion of a kubernetes object, None if unknown
+    Args:
+        _object (Any): kubernetes object (model or dict)
+    Returns:
+        Optional[str]: resource version
+    """
+    _metadata = getattr(_object, "metadata", None)
+    return getattr(_metadata, "resource_version", None)
+
+
+class ObjectCache:
+    """
+
+    Per session cache of kubernetes objects keyed by
+    (object type, namespace, name). An object is considered stale
+    once a newer resourceVersion has been observed for its key.
+    """
+
+    def __init__(self):
+        self._objects: Dict[CacheKey, Any] = {}
+        self._versions: Dict[CacheKey, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Any:
+        """
+
+        return cached object, None if missing or stale
+        Args:
+            key (CacheKey): object key
+        Returns:
+            Any: cached object
+        """
+        with self._lock:
+            _object = self._objects.get(key)
+            if _object is None:
+                return None
+            _latest = self._versions.get(key)
+            if _latest and resource_version(_object) != _latest:
+                del self._objects[key]
+                return None
+            return _object
+
+    def put(self, key: CacheKey, _object: Any):
+        """
+
+        store object in cache
+        Args:
+            key (CacheKey): object key
+            _object (Any): kubernetes object
+        """
+        with self._lock:
+            self._objects[key] = _object
+            _version = resource_version(_object)
+            if _version:
+                self._versions[key] = _version
+
+    def observe(self, key: CacheKey, version: Optional[str]):
+        """
+
+        record latest resourceVersion seen for a key (ex: from a list call)
+        Args:
+            key (CacheKey): object key
+            version (Optional[str]): resource version
+        """
+        if not version:
+            return
+        with self._lock:
+            self._versions[key] = version
+
+    def invalidate(self, key: CacheKey):
+        """
+
+        drop cached object
+        Args:
+            key (CacheKey): object key
+        """
+        with self._lock:
+            self._objects.pop(key, None)
+            self._versions.pop(key, None)
@@ -2,7 +2,8 @@
 
 Completer
 """
-from typing import List
+from bisect import bisect_left
+from typing import Dict, List, Set
 import atexit
 import readline
 import os
@@ -10,40 +11,110 @@ import os
 
 HISTFILE = os.path.join(os.path.expanduser("~"), ".config", ".remote_debugger")
 MAX_HISTORY_LENGTH = 1000
+MAX_CHAR = chr(0x10FFFF)
+
+
+def fuzzy_score(option: str, text: str) -> int:
+    """
+
+    score option against text, matching text chars as a subsequence
+    Args:
+        option (str): option
+        text (str): text typed
+    Returns:
+        int: span length of the match (lower is better), -1 if no match
+    """
+    _start = option.find(text[0])
+    if _start < 0:
+        return -1
+    _position = _start
+    for _char in text[1:]:
+        _position = option.find(_char, _position + 1)
+        if _position < 0:
+            return -1
+    return _position - _start + 1
 
 
 class Completer:  # pylint: disable=too-few-public-methods
     """
 
-    Completer class
+    Completer class, prefix matches are found by bisect on sorted
+    options, fuzzy matches (optional) by subsequence scoring of options
+    containing every typed chars. Fuzzy scoring is linear in candidates,
+    up to tens of ms per tab press on 100k options.
     """
 
-    def __init__(self, options: List[str]):
-        self._options = sorted(options)
+    def __init__(self, options: List[str], fuzzy: bool = False):
+        self._options = sorted(_option for _option in options if _option)
+        self._fuzzy = fuzzy
+        self._chars: Dict[str, Set[int]] = {}
         self._matches: List[str] = []
+        self._begin = 0
+        self._start = 0
+        self._end = 0
+
+    def _prefix_range(self, prefix: str):
+        """
+
+        set range of options starting with prefix
+        Args:
+            prefix (str): prefix
+        """
+        self._matches = []
+        self._start = bisect_left(self._options, prefix)
+        self._end = bisect_left(self._options, prefix + MAX_CHAR, self._start)
+
+    def _fuzzy_matches(self, prefix: str, text: str) -> List[str]:
+        """
+
+        return options starting with prefix and matching text as a
+        subsequence after it, best first
+        Args:
+            prefix (str): line before the completed word, kept as is
+            text (str): completed word
+        Returns:
+            List[str]: matching options
+        """
+        if not self._chars:
+            for _index, _option in enumerate(self._options):
+                for _char in set(_option):
+                    self._chars.setdefault(_char, set()).add(_index)
+        _start = bisect_left(self._options, prefix)
+        _end = bisect_left(self._options, prefix + MAX_CHAR, _start)
+        _candidates = set.intersection(
+            *[self._chars.get(_char, set()) for _char in set(text)]
+        )
+        _scored = []
+        for _index in _candidates:
+            if not _start <= _index < _end:
+                continue
+            _option = self._options[_index]
+            _score = fuzzy_score(_option[len(prefix):], text)
+            if _score >= 0:
+                _scored.append((_score, len(_option), _option))
+        return [_option for _, _, _option in sorted(_scored)]
 
     def complete(self, text: str, state: int):
         """
 
-        complete function, return response if an option match input
+        complete function, return response if an option match input. As
+        readline replaces the word being completed only, matches are
+        returned from the word beginning.
         """
-        response = None
         if state == 0:
             origline = readline.get_line_buffer()
-            begin = readline.get_begidx()
-            if text:
-                if begin == 0:
-                    self._matches = [s for s in self._options if s and s.startswith(origline)]
-                else:
-                    self._matches = [s[begin:]
-                                     for s in self._options if s and s.startswith(origline)]
-            else:
-                self._matches = self._options[:]
-        try:
-            response = self._matches[state]
-        except IndexError:
-            response = None
-        return response
+            self._begin = readline.get_begidx()
+            self._prefix_range(origline if text else "")
+            if text and self._fuzzy and self._start == self._end:
+                self._matches = self._fuzzy_matches(
+                    origline[:self._begin], origline[self._begin:]
+                )
+        if self._matches:
+            return self._matches[state][self._begin:] if state < len(self._matches) else None
+        if self._start + state >= self._end:
+            return None
+        _option = self._options[self._start + state]
+        return _option[self._begin:] if text else _option
 
 
 def save_history(prev_h_len: int):
@@ -69,5 +140,7 @@ def activate_history():
         h_len = 0
 
     atexit.register(save_history, h_len)
+    # names contain "-", "/" and ".", the whole input is completed
+    readline.set_completer_delims(" \t\n")
     readline.parse_and_bind("tab: complete")
     readline.parse_and_bind("set show-all-if-ambiguous on")
@@ -0,0 +1,201 @@
+"""
+
+Container index
+
+Containers of every workload listed in a namespace (or the whole cluster),
+indexed by object, image and command/args token, so that questions such as
+"which containers run image X" or "which args contain module Y" are
+answered without reading objects one by one.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from remote_pod_debugger.kinds import get_kind
+
+
+@dataclass(frozen=True)
+class ContainerRef:
+    """
+
+    Container of a workload
+    """
+
+    namespace: str
+    object_type: str
+    name: str
+    container: str
+    image: Optional[str] = None
+    command: Tuple[str, ...] = ()
+    args: Tuple[str, ...] = ()
+
+    @property
+    def tokens(self) -> List[str]:
+        """
+
+        whitespace separated words of command and args, shell scripts
+        passed as one arg included (ex: ["sh", "-c", "python", "-m", "api"])
+        Returns:
+            List[str]: tokens
+        """
+        return [_token for _item in self.command + self.args for _token in _item.split()]
+
+    def matches(self, image: str = None, token: str = None) -> bool:
+        """
+
+        check container runs image and has token in its command or args,
+        unset criteria match any container
+        Args:
+            image (str): image, or image repository for any tag
+            token (str): command or args word
+        Returns:
+            bool: True if container matches
+        """
+        if image and not (
+            self.image and image in (self.image, image_repository(self.image))
+        ):
+            return False
+        return not token or token in self.tokens
+
+
+def container_refs(_object: dict, object_type: str, namespace: str = None) -> List[ContainerRef]:
+    """
+
+    return containers of a serialized object
+    Args:
+        _object (dict): serialized object
+        object_type (str): object type
+        namespace (str): namespace name, if missing from object metadata
+    Returns:
+        List[ContainerRef]: containers, in pod spec order
+    """
+    _metadata = _object["metadata"]
+    return [
+        ContainerRef(
+            _metadata.get("namespace", namespace),
+            object_type,
+            _metadata["name"],
+            _container["name"],
+            _container.get("image"),
+            tuple(_container.get("command") or ()),
+            tuple(_container.get("args") or ()),
+        )
+        for _container in get_kind(object_type).pod_spec(_object)["containers"]
+    ]
+
+
+def image_repository(image: str) -> str:
+    """
+
+    return image without tag nor digest
+    Args:
+        image (str): image (ex: registry:5000/app:1.2)
+    Returns:
+        str: repository (ex: registry:5000/app)
+    """
+    _image = image.split("@", 1)[0]
+    _name, _, _tag = _image.rpartition(":")
+    if _name and "/" not in _tag:
+        return _name
+    return _image
+
+
+class ContainerIndex:
+    """
+
+    In memory index of workload containers
+    """
+
+    def __init__(self, containers: Iterable[ContainerRef] = ()):
+        """
+
+        ContainerIndex constructor
+
+        Args:
+            containers (Iterable[ContainerRef]): indexed containers
+        """
+        self._containers: List[ContainerRef] = []
+        self._by_object: Dict[Tuple[str, str, str], List[ContainerRef]] = defaultdict(list)
+        self._by_image: Dict[str, List[ContainerRef]] = defaultdict(list)
+        self._by_token: Dict[str, List[ContainerRef]] = defaultdict(list)
+        for _container in containers:
+            self.add(_container)
+
+    def __len__(self) -> int:
+        return len(self._containers)
+
+    def __iter__(self):
+        return iter(self._containers)
+
+    def add(self, container: ContainerRef):
+        """
+
+        index container
+        Args:
+            container (ContainerRef): container
+        """
+        self._containers.append(container)
+        self._by_object[
+            (container.object_type, container.namespace, container.name)
+        ].append(container)
+        if container.image:
+            self._by_image[container.image].append(container)
+            _repository = image_repository(container.image)
+            if _repository != container.image:
+                self._by_image[_repository].append(container)
+        for _token in set(container.tokens):
+            self._by_token[_token].append(container)
+
+    def containers(self, name: str, namespace: str, object_type: str) -> List[ContainerRef]:
+        """
+
+        return containers of an object
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+            List[ContainerRef]: containers, in pod spec order
+        """
+        return list(self._by_object.get((object_type, namespace, name), []))
+
+    def by_image(self, image: str) -> List[ContainerRef]:
+        """
+
+        return containers running an image, any tag if image has none
+        Args:
+            image (str): image or image repository
+        Returns:
+            List[ContainerRef]: containers
+        """
+        return list(self._by_image.get(image, []))
+
+    def search(self, image: str = None, token: str = None) -> List[ContainerRef]:
+        """
+
+        return containers running an image and/or whose command or args
+        contain a word, unset criteria match any container
+        Args:
+            image (str): image, or image repository for any tag
+            token (str): command or args word
+        Returns:
+            List[ContainerRef]: containers, in index order
+        """
+        if image:
+            _candidates = self._by_image.get(image, [])
+        elif token:
+            _candidates = self._by_token.get(token, [])
+        else:
+            _candidates = self._containers
+        return [_container for _container in _candidates if _container.matches(image, token)]
+
+    def by_token(self, token: str) -> List[ContainerRef]:
+        """
+
+        return containers whose command or args contain a word
+        Args:
+            token (str): word (ex: a module name or a script path)
+        Returns:
+            List[ContainerRef]: containers
+        """
+        return list(self._by_token.get(token, []))
@@ -0,0 +1,204 @@
+"""
+
+Multi-context fan-out
+
+The same targets are resolved and patched, or restored, in several kube
+contexts concurrently, with one backend per context. Results are shown side
+by side, one column per context.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+import time
+from typing import Callable, Dict, List, Optional
+
+from remote_pod_debugger.batch import (
+    DEFAULT_WORKERS,
+    BatchPatcher,
+    BatchResult,
+    Target,
+    batch_targets,
+    error_message,
+    patch_arguments,
+)
+from remote_pod_debugger.pod_debugger import PodDebugger
+from remote_pod_debugger.utils import info, warning
+
+
+@dataclass
+class ContextResult:
+    """
+
+    Results of one context
+    """
+
+    context: str
+    elapsed: float
+    results: List[BatchResult] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def list_contexts() -> List[str]:
+    """
+
+    return kube config context names
+    Returns:
+        List[str]: context names
+    """
+    from kubernetes import config  # pylint: disable=import-outside-toplevel
+
+    _contexts, _ = config.list_kube_config_contexts()
+    return [_context["name"] for _context in _contexts]
+
+
+def match_contexts(patterns: List[str], contexts: List[str]) -> List[str]:
+    """
+
+    return contexts matching any pattern, in kube config order
+    Args:
+        patterns (List[str]): context names or globs, comma separated
+            values are split (ex: ["prod-*", "staging,dev"])
+        contexts (List[str]): kube config context names
+    Returns:
+        List[str]: matching contexts
+    """
+    _patterns = [_item for _pattern in patterns for _item in _pattern.split(",") if _item]
+    return [
+        _context
+        for _context in contexts
+        if any(fnmatchcase(_context, _pattern) for _pattern in _patterns)
+    ]
+
+
+def named_targets(args: argparse.Namespace) -> List[Target]:
+    """
+
+    return target named by --deployment, --daemonset or --kind and --name
+    Args:
+        args (argparse.Namespace): args namespace
+    Returns:
+        List[Target]: targets
+    """
+    _names = [
+        ("deployment", args.deployment),
+        ("daemonset", args.daemonset),
+        (args.kind, args.name),
+    ]
+    _targets = [Target(args.namespace, _type, _name) for _type, _name in _names if _name]
+    if _targets and not args.namespace:
+        raise Exception("--namespace is required to patch a named object in several contexts")
+    return _targets
+
+
+def fan_out(
+    pod_debuggers: Dict[str, PodDebugger],
+    call: Callable[[PodDebugger], List[BatchResult]],
+) -> List[ContextResult]:
+    """
+
+    run call concurrently in every context
+    Args:
+        pod_debuggers (Dict[str, PodDebugger]): pod debugger per context
+        call (Callable[[PodDebugger], List[BatchResult]]): batch call
+    Returns:
+        List[ContextResult]: results, in contexts order
+    """
+
+    def _run(context: str) -> ContextResult:
+        _start = time.perf_counter()
+        try:
+            _results = call(pod_debuggers[context])
+        except Exception as error:  # pylint: disable=broad-except
+            return ContextResult(
+                context, time.perf_counter() - _start, error=error_message(error)
+            )
+        return ContextResult(context, time.perf_counter() - _start, _results)
+
+    with ThreadPoolExecutor(max_workers=len(pod_debuggers) or 1) as _executor:
+        return list(_executor.map(_run, pod_debuggers))
+
+
+def print_contexts_summary(results: List[ContextResult], action: str = "Patched"):
+    """
+
+    print per target latency, one column per context
+    Args:
+        results (List[ContextResult]): context results
+        action (str): summary action (default: Patched)
+    """
+    _targets: List[str] = []
+    _cells: Dict[str, Dict[str, str]] = {}
+    for _context in results:
+        for _result in _context.results:
+            _target = str(_result.target)
+            if _target not in _cells:
+                _targets.append(_target)
+                _cells[_target] = {}
+            _cells[_target][_context.context] = (
+                f"{_result.elapsed:.2f}s" if _result.success else "FAILED"
+            )
+    _width = max([len(_target) for _target in _targets] + [len("TARGET")])
+    _widths = [max(len(_context.context), 8) for _context in results]
+    info(
+        f"{'TARGET':<{_width}} "
+        + " ".join(
+            f"{_context.context:>{_column}}" for _context, _column in zip(results, _widths)
+        )
+    )
+    for _target in _targets:
+        info(
+            f"{_target:<{_width}} "
+            + " ".join(
+                f"{_cells[_target].get(_context.context, '-'):>{_column}}"
+                for _context, _column in zip(results, _widths)
+            )
+        )
+    info(
+        f"{'TOTAL':<{_width}} "
+        + " ".join(
+            f"{f'{_context.elapsed:.2f}s':>{_column}}"
+            for _context, _column in zip(results, _widths)
+        )
+    )
+    for _context in results:
+        if _context.error:
+            warning(f"FAILED {_context.context}: {_context.error}")
+        for _result in _context.results:
+            if not _result.success:
+                warning(f"FAILED {_context.context} {_result.target}: {_result.error}")
+    _succeeded = sum(
+        1 for _context in results for _result in _context.results if _result.success
+    )
+    _total = sum(len(_context.results) for _context in results)
+    info(f"{action} {_succeeded}/{_total} objects in {len(results)} contexts")
+
+
+def run_contexts(pod_debuggers: Dict[str, PodDebugger], args: argparse.Namespace):
+    """
+
+    Patch or restore the same targets in several contexts from command line args
+    Args:
+        pod_debuggers (Dict[str, PodDebugger]): pod debugger per context
+        args (argparse.Namespace): args namespace
+    """
+    _workers = args.workers or DEFAULT_WORKERS
+    _kwargs = None if args.restore else patch_arguments(args)
+    _names = named_targets(args)
+
+    def _run(pod_debugger: PodDebugger) -> List[BatchResult]:
+        _patcher = BatchPatcher(pod_debugger, max_workers=_workers)
+        _targets = _names + batch_targets(_patcher, args)
+        if not _targets:
+            raise Exception("Can't find object to patch")
+        if args.restore:
+            return _patcher.restore(_targets)
+        return _patcher.patch(_targets, **_kwargs)
+
+    info(
+        f"{'Restoring' if args.restore else 'Patching'} in {len(pod_debuggers)} contexts:"
+        f" {', '.join(pod_debuggers)}"
+    )
+    print_contexts_summary(
+        fan_out(pod_debuggers, _run), "Restored" if args.restore else "Patched"
+    )
@@ -0,0 +1,270 @@
+"""
+
+API call instrumentation
+
+CallRecorder wraps the HTTP pool of a backend and records method, resource,
+latency, response bytes, status and retries of every kube call. Calls are
+reported as a summary table, a JSON trace file, and optionally as
+OpenTelemetry spans.
+"""
+from dataclasses import dataclass, field, fields
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from remote_pod_debugger.utils import info, warning
+
+
+# urllib3 encodes fields of these methods in the url
+URL_FIELDS_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS")
+RESOURCE_RE = re.compile(
+    r"^/(?:api/v1|apis/[^/]+/[^/]+)"
+    r"(?:/namespaces/(?P<namespace>[^/]+)(?=/))?"
+    r"/(?P<plural>[a-z]+)"
+    r"(?:/(?P<name>[^/]+))?"
+    r"(?:/(?P<subresource>[a-z]+))?$"
+)
+
+
+def request_url(method: str, url: str, _fields: Any = None) -> str:
+    """
+
+    return url of a urllib3 request, with query fields passed apart
+    Args:
+        method (str): HTTP method
+        url (str): request url
+        _fields (Any): urllib3 fields (dict or list of pairs)
+    Returns:
+        str: url with query string
+    """
+    if not _fields or method not in URL_FIELDS_METHODS:
+        return url
+    return url + ("&" if "?" in url else "?") + urlencode(_fields)
+
+
+def resource(method: str, url: str) -> Tuple[str, str]:
+    """
+
+    return call verb and resource of a request
+    Args:
+        method (str): HTTP method
+        url (str): request url
+    Returns:
+        Tuple[str, str]: verb (GET, LIST, WATCH, PATCH...) and resource
+            (ex: deployments, pods/ephemeralcontainers)
+    """
+    _url = urlparse(url)
+    _match = RESOURCE_RE.match(_url.path)
+    if not _match:
+        return method, _url.path
+    _plural, _name, _subresource = _match.group("plural", "name", "subresource")
+    _resource = f"{_plural}/{_subresource}" if _subresource else _plural
+    if method == "GET" and _name is None:
+        _watch = parse_qs(_url.query).get("watch", [""])[0] == "true"
+        return ("WATCH" if _watch else "LIST"), _resource
+    return method, _resource
+
+
+@dataclass
+class Call:  # pylint: disable=too-many-instance-attributes
+    """
+
+    One API call
+    """
+
+    verb: str
+    resource: str
+    url: str
+    status: int
+    latency: float
+    bytes: Optional[int] = None
+    retries: int = 0
+    start: float = 0.0
+    _response: Any = field(default=None, repr=False)
+
+
+class CallRecorder:
+    """
+
+    Record API calls of backends
+    """
+
+    def __init__(self, opentelemetry: bool = False):
+        """
+
+        CallRecorder constructor
+
+        Args:
+            opentelemetry (bool): emit an OpenTelemetry span per call, if
+                opentelemetry-api is installed (default: False)
+        """
+        self.calls: List[Call] = []
+        self._streamed: List[Call] = []
+        self._lock = threading.Lock()
+        self._tracer = None
+        if opentelemetry:
+            try:
+                # pylint: disable=import-outside-toplevel
+                from opentelemetry import trace
+
+                self._tracer = trace.get_tracer("remote_pod_debugger")
+            except ImportError:
+                warning("opentelemetry-api is not installed, spans are disabled")
+
+    def instrument(self, pool_manager: Any):
+        """
+
+        wrap request method of a urllib3 pool manager
+        Args:
+            pool_manager (Any): urllib3 pool manager
+        """
+        _request = pool_manager.request
+
+        def _recorded_request(method: str, url: str, *args, **kwargs):
+            _start = time.time()
+            _counter = time.perf_counter()
+            _response = _request(method, url, *args, **kwargs)
+            self.record(
+                method,
+                request_url(method, url, args[0] if args else kwargs.get("fields")),
+                _response,
+                time.perf_counter() - _counter,
+                _start,
+            )
+            return _response
+
+        pool_manager.request = _recorded_request
+
+    def record(self, method: str, url: str, response: Any, latency: float, start: float):
+        """
+
+        record one call, response size is counted as received (compressed),
+        size of streamed responses is read once consumed
+        Args:
+            method (str): HTTP method
+            url (str): request url
+            response (Any): urllib3 response
+            latency (float): latency in seconds, until response headers or
+                body for preloaded responses
+            start (float): call start timestamp
+        """
+        _verb, _resource = resource(method, url)
+        _retries = getattr(response, "retries", None)
+        _call = Call(
+            _verb,
+            _resource,
+            url,
+            response.status,
+            latency,
+            retries=len(_retries.history) if _retries is not None else 0,
+            start=start,
+        )
+        with self._lock:
+            self._resolve()
+            if getattr(response, "_body", None) is not None:
+                _call.bytes = response.tell()
+            else:
+                _call._response = response  # pylint: disable=protected-access
+                self._streamed.append(_call)
+            self.calls.append(_call)
+        if self._tracer is not None:
+            self._span(_call)
+
+    def _resolve(self, force: bool = False):
+        """
+
+        read size of consumed streamed responses, and drop them, only calls
+        still streamed are scanned
+        Args:
+            force (bool): resolve responses still open
+        """
+        _open = []
+        for _call in self._streamed:
+            _response = _call._response  # pylint: disable=protected-access
+            if force or _response.isclosed():
+                _call.bytes = _response.tell()
+                _call._response = None  # pylint: disable=protected-access
+            else:
+                _open.append(_call)
+        self._streamed = _open
+
+    def _span(self, call: Call):
+        _start = int(call.start * 1e9)
+        _span = self._tracer.start_span(f"{call.verb} {call.resource}", start_time=_start)
+        _span.set_attribute("http.url", call.url)
+        _span.set_attribute("http.status_code", call.status)
+        _span.set_attribute("k8s.verb", call.verb)
+        _span.set_attribute("k8s.resource", call.resource)
+        if call.bytes is not None:
+            _span.set_attribute("http.response_content_length", call.bytes)
+        _span.end(end_time=_start + int(call.latency * 1e9))
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+
+        aggregate calls by verb and resource, slowest first
+        Returns:
+            List[Dict[str, Any]]: summary rows
+        """
+        with self._lock:
+            self._resolve(force=True)
+            _rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            for _call in self.calls:
+                _row = _rows.setdefault(
+                    (_call.verb, _call.resource),
+                    {
+                        "verb": _call.verb,
+                        "resource": _call.resource,
+                        "calls": 0,
+                        "total": 0.0,
+                        "max": 0.0,
+                        "bytes": 0,
+                        "retries": 0,
+                    },
+                )
+                _row["calls"] += 1
+                _row["total"] += _call.latency
+                _row["max"] = max(_row["max"], _call.latency)
+                _row["bytes"] += _call.bytes or 0
+                _row["retries"] += _call.retries
+        return sorted(_rows.values(), key=lambda _row: _row["total"], reverse=True)
+
+    def print_summary(self):
+        """
+
+        print summary table
+        """
+        _rows = self.summary()
+        info(
+            f"{'VERB':<8} {'RESOURCE':<32} {'CALLS':>6} {'TOTAL MS':>9}"
+            f" {'MAX MS':>8} {'BYTES':>10} {'RETRIES':>7}"
+        )
+        for _row in _rows:
+            info(
+                f"{_row['verb']:<8} {_row['resource']:<32} {_row['calls']:>6}"
+                f" {_row['total'] * 1000:>9.1f} {_row['max'] * 1000:>8.1f}"
+                f" {_row['bytes']:>10} {_row['retries']:>7}"
+            )
+
+    def write_trace(self, path: str):
+        """
+
+        write calls as a JSON trace
+        Args:
+            path (str): trace file path
+        """
+        with self._lock:
+            self._resolve(force=True)
+            _calls = [
+                {
+                    _field.name: getattr(_call, _field.name)
+                    for _field in fields(Call)
+                    if _field.name != "_response"
+                }
+                for _call in self.calls
+            ]
+        with open(path, "w", encoding="utf-8") as _file:
+            json.dump(_calls, _file, indent=2)
@@ -0,0 +1,152 @@
+"""
+
+Kind registry
+
+Each kind maps to its API path, its generated client functions and the
+path of its pod spec, so backends and PodDebugger dispatch by table lookup.
+"""
+from dataclasses import dataclass
+import re
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class Kind:  # pylint: disable=too-many-instance-attributes
+    """
+
+    Kubernetes kind
+    """
+
+    name: str
+    api_prefix: str
+    plural: str
+    api_class: str
+    client_name: str
+    pod_spec_path: Tuple[str, ...] = ("spec", "template", "spec")
+    workload: bool = True
+    namespaced: bool = True
+    mutable_command: bool = True
+
+    @property
+    def pod_spec_attributes(self) -> Tuple[str, ...]:
+        """
+
+        pod spec path in generated client models
+        Returns:
+            Tuple[str, ...]: attribute names
+        """
+        return tuple(
+            re.sub(r"([A-Z])", lambda _match: "_" + _match.group(1).lower(), _key)
+            for _key in self.pod_spec_path
+        )
+
+    @property
+    def api_version(self) -> str:
+        """
+
+        apiVersion of objects
+        Returns:
+            str: apiVersion (ex: apps/v1)
+        """
+        return self.api_prefix.split("/", 2)[-1]
+
+    @property
+    def api_kind(self) -> str:
+        """
+
+        kind of objects
+        Returns:
+            str: kind (ex: DaemonSet)
+        """
+        return "".join(_part.capitalize() for _part in self.client_name.split("_"))
+
+    @property
+    def pod_spec_pointer(self) -> str:
+        """
+
+        pod spec JSON pointer
+        Returns:
+            str: JSON pointer (ex: /spec/template/spec)
+        """
+        return "/" + "/".join(self.pod_spec_path)
+
+    def pod_spec(self, data: dict) -> dict:
+        """
+
+        return pod spec of a serialized object
+        Args:
+            data (dict): serialized object
+        Returns:
+            dict: pod spec
+        """
+        for _key in self.pod_spec_path:
+            data = data[_key]
+        return data
+
+    def containers(self, _object: Any) -> List[Any]:
+        """
+
+        return containers of a generated client model
+        Args:
+            _object (Any): client model
+        Returns:
+            List[Any]: containers
+        """
+        for _attribute in self.pod_spec_attributes:
+            _object = getattr(_object, _attribute)
+        return _object.containers
+
+    def patch_body(self, pod_spec: dict) -> dict:
+        """
+
+        nest a pod spec patch at the pod spec path
+        Args:
+            pod_spec (dict): pod spec patch
+        Returns:
+            dict: object patch
+        """
+        _body = pod_spec
+        for _key in reversed(self.pod_spec_path):
+            _body = {_key: _body}
+        return _body
+
+
+KINDS: Dict[str, Kind] = {
+    _kind.name: _kind
+    for _kind in [
+        Kind("deployment", "/apis/apps/v1", "deployments", "AppsV1Api", "deployment"),
+        Kind("daemonset", "/apis/apps/v1", "daemonsets", "AppsV1Api", "daemon_set"),
+        Kind("statefulset", "/apis/apps/v1", "statefulsets", "AppsV1Api", "stateful_set"),
+        # Job pod template and Pod containers are immutable, they can only
+        # be debugged with an ephemeral container.
+        Kind("job", "/apis/batch/v1", "jobs", "BatchV1Api", "job", mutable_command=False),
+        Kind(
+            "cronjob",
+            "/apis/batch/v1",
+            "cronjobs",
+            "BatchV1Api",
+            "cron_job",
+            ("spec", "jobTemplate", "spec", "template", "spec"),
+        ),
+        Kind("pod", "/api/v1", "pods", "CoreV1Api", "pod", ("spec",), mutable_command=False),
+        Kind("namespace", "/api/v1", "namespaces", "CoreV1Api", "namespace", (), False, False),
+        Kind("configmap", "/api/v1", "configmaps", "CoreV1Api", "config_map", (), False),
+    ]
+}
+WORKLOAD_KINDS = [_name for _name, _kind in KINDS.items() if _kind.workload]
+PATCHABLE_KINDS = [_name for _name in WORKLOAD_KINDS if KINDS[_name].mutable_command]
+
+
+def get_kind(name: str) -> Kind:
+    """
+
+    return registered kind
+    Args:
+        name (str): kind name (ex: deployment)
+    Returns:
+        Kind: kind
+    """
+    try:
+        return KINDS[name]
+    except KeyError:
+        raise Exception(f"Unknown object type {name}") from None
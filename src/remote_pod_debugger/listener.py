@@ -0,0 +1,315 @@
+"""
+
+Reverse connection listener for remote_pdb sessions
+
+Patched containers run remote_pdb with --reverse, connecting back to the
+debugger host. SessionServer accepts every incoming connection, buffers
+each session output independently, and lets the console attach to one
+session at a time without stalling the others.
+"""
+import asyncio
+import sys
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from remote_pod_debugger.utils import info, warning
+
+
+SESSION_BUFFER_SIZE = 64 * 1024
+READ_CHUNK_SIZE = 4096
+CONSOLE_HELP = (
+    ":list list sessions, :attach N attach session N, :detach, :quit\n"
+)
+
+
+class Session:
+    """
+
+    One remote_pdb connection
+    """
+
+    def __init__(
+        self,
+        session_id: int,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        buffer_size: int = SESSION_BUFFER_SIZE,
+    ):
+        """
+
+        Session constructor
+
+        Args:
+            session_id (int): session id
+            reader (asyncio.StreamReader): connection reader
+            writer (asyncio.StreamWriter): connection writer
+            buffer_size (int): max buffered bytes while detached, oldest
+                bytes are dropped (default: SESSION_BUFFER_SIZE)
+        """
+        self.session_id = session_id
+        self.peer = writer.get_extra_info("peername")
+        self.closed = False
+        self._reader = reader
+        self._writer = writer
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def buffered(self) -> bytes:
+        """
+
+        output buffered while detached
+        Returns:
+            bytes: buffered output
+        """
+        return bytes(self._buffer)
+
+    def feed(self, data: bytes):
+        """
+
+        handle output of remote_pdb, forward it if attached, else buffer it
+        Args:
+            data (bytes): output, empty when connection is closed
+        """
+        if self._queue is not None:
+            self._queue.put_nowait(data)
+            return
+        self._buffer += data
+        if len(self._buffer) > self._buffer_size:
+            del self._buffer[: len(self._buffer) - self._buffer_size]
+
+    def attach(self) -> asyncio.Queue:
+        """
+
+        attach session, buffered output is replayed first
+        Returns:
+            asyncio.Queue: session output, b"" once closed
+        """
+        self._queue = asyncio.Queue()
+        if self._buffer:
+            self._queue.put_nowait(bytes(self._buffer))
+            self._buffer.clear()
+        if self.closed:
+            self._queue.put_nowait(b"")
+        return self._queue
+
+    def detach(self):
+        """
+
+        detach session, output is buffered again
+        """
+        self._queue = None
+
+    async def write(self, data: bytes):
+        """
+
+        send input to remote_pdb
+        Args:
+            data (bytes): input
+        """
+        self._writer.write(data)
+        await self._writer.drain()
+
+    def close(self):
+        """
+
+        close connection
+        """
+        self._writer.close()
+
+    async def read_loop(self):
+        """
+
+        read remote_pdb output until connection is closed
+        """
+        try:
+            while True:
+                _data = await self._reader.read(READ_CHUNK_SIZE)
+                if not _data:
+                    break
+                self.feed(_data)
+        finally:
+            self.closed = True
+            self.feed(b"")
+            self.close()
+
+    def __str__(self) -> str:
+        _state = "closed" if self.closed else "open"
+        return f"[{self.session_id}] {self.peer} ({_state}, {len(self._buffer)} bytes buffered)"
+
+
+class SessionServer:
+    """
+
+    asyncio TCP server multiplexing remote_pdb sessions
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 0,
+        buffer_size: int = SESSION_BUFFER_SIZE,
+        notify: Callable[[str], None] = info,
+    ):
+        """
+
+        SessionServer constructor
+
+        Args:
+            host (str): listen host (default: 0.0.0.0)
+            port (int): listen port, 0 for a random one (default: 0)
+            buffer_size (int): per session buffer size (default: SESSION_BUFFER_SIZE)
+            notify (Callable[[str], None]): session events callback (default: info)
+        """
+        self._host = host
+        self._port = port
+        self._buffer_size = buffer_size
+        self._notify = notify
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._next_id = 1
+        self.sessions: Dict[int, Session] = {}
+
+    @property
+    def port(self) -> int:
+        """
+
+        listening port
+        Returns:
+            int: port
+        """
+        if self._server is None:
+            return self._port
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        """
+
+        start listening
+        """
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        self._notify(f"Listening for remote_pdb sessions on {self._host}:{self.port}")
+
+    async def close(self):
+        """
+
+        stop listening, and close sessions
+        """
+        for _session in self.sessions.values():
+            _session.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        _session = Session(self._next_id, reader, writer, self._buffer_size)
+        self._next_id += 1
+        self.sessions[_session.session_id] = _session
+        self._notify(f"New session {_session}")
+        await _session.read_loop()
+        self._notify(f"Session {_session.session_id} closed")
+
+    @staticmethod
+    async def _pump(queue: asyncio.Queue, output: Callable[[bytes], None]):
+        while True:
+            _data = await queue.get()
+            if not _data:
+                output(b"session closed\n")
+                return
+            output(_data)
+
+    async def console(
+        self, stdin: asyncio.StreamReader, output: Callable[[bytes], None]
+    ):
+        """
+
+        interactive console, lines are sent to the attached session,
+        lines starting with ":" are console commands (see CONSOLE_HELP)
+        Args:
+            stdin (asyncio.StreamReader): console input
+            output (Callable[[bytes], None]): console output
+        """
+        _attached: Optional[Session] = None
+        _pump: Optional[asyncio.Task] = None
+        output(CONSOLE_HELP.encode())
+        while True:
+            _line = await stdin.readline()
+            if not _line:
+                break
+            _text = _line.decode(errors="replace").strip()
+            if not _text.startswith(":"):
+                if _attached is None or _attached.closed:
+                    output(b"no session attached\n")
+                else:
+                    await _attached.write(_line)
+                continue
+            _command, _, _arg = _text[1:].partition(" ")
+            if _command == "quit":
+                break
+            if _command == "list":
+                output("".join(f"{_item}\n" for _item in self.sessions.values()).encode())
+            elif _command in ("attach", "detach"):
+                if _attached is not None:
+                    _attached.detach()
+                    _pump.cancel()
+                    _attached = None
+                if _command == "attach":
+                    _attached = self.sessions.get(int(_arg)) if _arg.isdigit() else None
+                    if _attached is None:
+                        output(f"unknown session {_arg}\n".encode())
+                    else:
+                        _pump = asyncio.ensure_future(self._pump(_attached.attach(), output))
+            else:
+                output(CONSOLE_HELP.encode())
+        if _attached is not None:
+            _attached.detach()
+            _pump.cancel()
+
+
+def write_stdout(data: bytes):
+    """
+
+    write to stdout without buffering
+    Args:
+        data (bytes): data
+    """
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+def serve(host: str, port: int, run: Callable[[], Any] = None):
+    """
+
+    listen for remote_pdb sessions, and run console on stdin/stdout. The
+    server runs in a background event loop, started before run, so pods
+    connecting while they are patched or waited for are not refused.
+    Args:
+        host (str): listen host
+        port (int): listen port
+        run (Callable[[], Any]): patch (and wait), called once listening
+    """
+    _loop = asyncio.new_event_loop()
+    _thread = threading.Thread(target=_loop.run_forever, daemon=True)
+    _thread.start()
+
+    def _call(coroutine: Awaitable) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
+
+    async def _console():
+        _stdin = asyncio.StreamReader()
+        await _loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(_stdin), sys.stdin)
+        await _server.console(_stdin, write_stdout)
+
+    _server = SessionServer(host, port)
+    _call(_server.start())
+    try:
+        if run is not None:
+            run()
+        _call(_console())
+    finally:
+        if any(not _session.closed for _session in _server.sessions.values()):
+            warning("Closing open sessions")
+        _call(_server.close())
+        _loop.call_soon_threadsafe(_loop.stop)
+        _thread.join()
+        _loop.close()
@@ -0,0 +1,368 @@
+"""
+
+Object listing
+
+Names and metadata are listed page by page with only object metadata
+requested, names are cached in the name cache and refreshed with a watch.
+"""
+import json
+import threading
+from typing import Iterable, Iterator, List, Tuple
+
+from kubernetes.client.exceptions import ApiException
+
+from remote_pod_debugger.backends import collection_path, selector_query
+from remote_pod_debugger.cache import resource_version
+from remote_pod_debugger.container_index import ContainerRef, container_refs
+from remote_pod_debugger.kinds import PATCHABLE_KINDS
+from remote_pod_debugger.name_cache import NameCache
+from remote_pod_debugger.utils import debug
+
+
+LIST_PAGE_SIZE = 500
+METADATA_ACCEPT = (
+    "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io,application/json"
+)
+METADATA_WATCH_ACCEPT = (
+    "application/json;as=PartialObjectMetadata;v=v1;g=meta.k8s.io,application/json"
+)
+NAME_WATCH_TIMEOUT = 10
+
+
+class ListingMixin:
+    """
+
+    PodDebugger object listing, relies on its backend, object cache, name
+    cache and list versions
+    """
+
+    def iter_metadata(
+        self,
+        object_type: str,
+        namespace: str = None,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> Iterator[dict]:
+        """
+
+        Stream object metadata page by page, only object metadata are
+        requested to keep payload small, selectors are applied server side.
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name (default: all namespaces)
+            label_selector (str): label selector
+            field_selector (str): field selector
+        Returns:
+            Iterator[dict]: object metadata
+        """
+        _filters = selector_query(label_selector, field_selector)
+        _first = True
+        for _page in self._pages(object_type, namespace, _filters, METADATA_ACCEPT):
+            if _first and not _filters:
+                self._list_versions[(object_type, namespace)] = _page.get(
+                    "metadata", {}
+                ).get("resourceVersion")
+            _first = False
+            for _item in _page.get("items", []):
+                _metadata = _item["metadata"]
+                if object_type != "namespace":
+                    self._cache.observe(
+                        (object_type, _metadata.get("namespace", namespace), _metadata["name"]),
+                        _metadata.get("resourceVersion"),
+                    )
+                yield _metadata
+
+    def _pages(
+        self, object_type: str, namespace: str, filters: list, accept: str
+    ) -> Iterator[dict]:
+        """
+
+        Stream list pages of LIST_PAGE_SIZE objects
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name (default: all namespaces)
+            filters (list): selector query params
+            accept (str): Accept header
+        Returns:
+            Iterator[dict]: list pages
+        """
+        _path = collection_path(object_type, namespace)
+        _continue = None
+        while True:
+            _query = [("limit", LIST_PAGE_SIZE)] + filters
+            if _continue:
+                _query.append(("continue", _continue))
+            _page = json.loads(self._backend.get(_path, _query, {"Accept": accept}))
+            yield _page
+            _continue = _page.get("metadata", {}).get("continue")
+            if not _continue:
+                return
+
+    def iter_objects(
+        self, object_type: str, namespace: str = None, label_selector: str = None
+    ) -> Iterator[dict]:
+        """
+
+        Stream objects page by page, as raw JSON without building client
+        models.
+        Args:
+            object_type (str): object type
+            namespace (str): namespace name (default: all namespaces)
+            label_selector (str): label selector
+        Returns:
+            Iterator[dict]: serialized objects
+        """
+        _filters = selector_query(label_selector)
+        for _page in self._pages(object_type, namespace, _filters, "application/json"):
+            yield from _page.get("items", [])
+
+    def search(
+        self,
+        image: str = None,
+        token: str = None,
+        namespace: str = None,
+        label_selector: str = None,
+        object_types: Iterable[str] = None,
+    ) -> Iterator[ContainerRef]:
+        """
+
+        Stream containers running an image and/or whose command or args
+        contain a word, with one list per object type. A namespace is
+        searched with container_index, the whole cluster is streamed page by
+        page. Matching objects are cached, so they are patched without being
+        read again.
+        Args:
+            image (str): image, or image repository for any tag
+            token (str): command or args word (ex: a module name)
+            namespace (str): namespace name (default: all namespaces)
+            label_selector (str): label selector
+            object_types (Iterable[str]): object types (default: patchable
+                workload types)
+        Returns:
+            Iterator[ContainerRef]: matching containers
+        """
+        if namespace:
+            yield from self.container_index(namespace, object_types, label_selector).search(
+                image, token
+            )
+            return
+        if object_types is None:
+            object_types = PATCHABLE_KINDS
+        for _type in object_types:
+            for _item in self.iter_objects(_type, namespace, label_selector):
+                _matches = [
+                    _container
+                    for _container in container_refs(_item, _type, namespace)
+                    if _container.matches(image, token)
+                ]
+                if _matches:
+                    self._cache.put(
+                        (_type, _matches[0].namespace, _matches[0].name),
+                        self._backend.from_dict(_type, _item),
+                    )
+                    yield from _matches
+
+    def iter_names(self, object_type: str, namespace: str = None) -> Iterator[str]:
+        """
+
+        Stream object names page by page (see iter_metadata)
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name
+        Returns:
+            Iterator[str]: object names
+        """
+        for _metadata in self.iter_metadata(object_type, namespace):
+            yield _metadata["name"]
+
+    def watch_names(
+        self, object_type: str, namespace: str, version: str
+    ) -> Iterator[Tuple[str, str, str]]:
+        """
+
+        Watch object names from a list resourceVersion, until server
+        timeout (NAME_WATCH_TIMEOUT).
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name
+            version (str): resource version to watch from
+        Returns:
+            Iterator[Tuple[str, str, str]]: event type, name and resource version
+        """
+        _lines = self._backend.stream(
+            collection_path(object_type, namespace),
+            [
+                ("watch", "true"),
+                ("resourceVersion", version),
+                ("allowWatchBookmarks", "true"),
+                ("timeoutSeconds", NAME_WATCH_TIMEOUT),
+            ],
+            {"Accept": METADATA_WATCH_ACCEPT},
+        )
+        for _line in _lines:
+            _event = json.loads(_line)
+            _object = _event.get("object", {})
+            if _event["type"] == "ERROR":
+                raise ApiException(status=_object.get("code"), reason=_object.get("reason"))
+            _metadata = _object.get("metadata", {})
+            yield _event["type"], _metadata.get("name"), _metadata.get("resourceVersion")
+
+    def _names(
+        self,
+        object_type: str,
+        namespace: str = None,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> Iterable[str]:
+        """
+
+        Return object names, from name cache if any, then refreshed in
+        background with a watch, else streamed from the API and cached.
+        Filtered names are always streamed from the API.
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name
+            label_selector (str): label selector
+            field_selector (str): field selector
+        Returns:
+            Iterable[str]: object names
+        """
+        if label_selector or field_selector:
+            return (
+                _metadata["name"]
+                for _metadata in self.iter_metadata(
+                    object_type, namespace, label_selector, field_selector
+                )
+            )
+        if self._name_cache is None:
+            return self.iter_names(object_type, namespace)
+        _key = NameCache.key(object_type, namespace)
+        _cached = self._name_cache.get(_key)
+        if _cached is None:
+            return self._stream_to_cache(object_type, namespace)
+        _names, _version = _cached
+        threading.Thread(
+            target=self._refresh_names,
+            args=(object_type, namespace, _names, _version),
+            daemon=True,
+        ).start()
+        return _names
+
+    def _stream_to_cache(self, object_type: str, namespace: str = None) -> Iterator[str]:
+        """
+
+        Stream object names from the API and store them in name cache
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name
+        Returns:
+            Iterator[str]: object names
+        """
+        _names = []
+        for _name in self.iter_names(object_type, namespace):
+            _names.append(_name)
+            yield _name
+        self._name_cache.put(
+            NameCache.key(object_type, namespace),
+            _names,
+            self._list_versions.get((object_type, namespace)),
+        )
+
+    def _refresh_names(
+        self, object_type: str, namespace: str, names: List[str], version: str
+    ):
+        """
+
+        Apply changes since cached resourceVersion to names in place, relist
+        if the watch can't resume from it (expired or unknown version). Each
+        event or bookmark is stored in name cache, written at exit if the
+        watch is still running.
+        Args:
+            object_type (str): object type, or "namespace"
+            namespace (str): namespace name
+            names (List[str]): cached names, updated in place
+            version (str): cached resource version
+        """
+        _key = NameCache.key(object_type, namespace)
+        try:
+            try:
+                if not version:
+                    raise ApiException(status=410, reason="Gone")
+                for _type, _name, _version in self.watch_names(object_type, namespace, version):
+                    if _type == "ADDED" and _name not in names:
+                        names.append(_name)
+                    elif _type == "DELETED" and _name in names:
+                        names.remove(_name)
+                    version = _version or version
+                    self._name_cache.put(_key, names, version, persist=False)
+            except ApiException as error:
+                if error.status != 410:
+                    raise
+                names[:] = list(self.iter_names(object_type, namespace))
+                version = self._list_versions.get((object_type, namespace))
+        # runs in background, errors must not print over the prompt
+        except Exception as error:  # pylint: disable=broad-except
+            if self.debug:
+                debug(f"Refresh of {_key} names failed: {error}")
+            self._name_cache.flush()
+            return
+        self._name_cache.put(_key, names, version)
+
+    def list_namespaces(self) -> List[str]:
+        """
+
+        List namespace names
+        Returns:
+            List[str]: namespace names
+        """
+        return list(self.iter_names("namespace"))
+
+    def list_daemonsets(self, namespace: str) -> List[str]:
+        """
+
+        List daemonset names of namespace
+        Args:
+            namespace (str): namespace name
+        Returns:
+            List[str]: daemonset names
+        """
+        return list(self.iter_names("daemonset", namespace))
+
+    def list_deployments(self, namespace: str) -> List[str]:
+        """
+
+        List deployment names of namespace
+        Args:
+            namespace (str): namespace name
+        Returns:
+            List[str]: deployment names
+        """
+        return list(self.iter_names("deployment", namespace))
+
+    def find_objects(
+        self,
+        object_type: str,
+        namespace: str = None,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> List[Tuple[str, str]]:
+        """
+
+        List objects matching a label selector, across all namespaces
+        when namespace is not set.
+        Args:
+            object_type (str): object type
+            namespace (str): namespace name (default: all namespaces)
+            label_selector (str): label selector
+            field_selector (str): field selector
+        Returns:
+            List[Tuple[str, str]]: (namespace, name) of each object
+        """
+        _objects = []
+        for _item in self._backend.find(object_type, namespace, label_selector, field_selector):
+            self._cache.observe(
+                (object_type, _item.metadata.namespace, _item.metadata.name),
+                resource_version(_item),
+            )
+            _objects.append((_item.metadata.namespace, _item.metadata.name))
+        return _objects
@@ -0,0 +1,127 @@
+"""
+
+Name cache
+"""
+import atexit
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+NAME_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".config", ".remote_debugger_names.json"
+)
+
+
+class NameCache:
+    """
+
+    Persistent cache of namespace, object and container names, keyed
+    by kube context. Each entry keeps the resourceVersion of the list it
+    comes from, in order to be refreshed incrementally with a watch.
+    Entries stored without persist are written at exit (see flush).
+    """
+
+    def __init__(self, context: str, path: str = NAME_CACHE_FILE):
+        """
+
+        NameCache constructor
+
+        Args:
+            context (str): kube context name
+            path (str): cache file path (default: NAME_CACHE_FILE)
+        """
+        self._context = context
+        self._path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._data: Dict[str, Dict[str, dict]] = {}
+        try:
+            with open(path, encoding="utf-8") as _file:
+                self._data = json.load(_file)
+        except (FileNotFoundError, ValueError):
+            self._data = {}
+        atexit.register(self.flush)
+
+    @staticmethod
+    def key(kind: str, *parts: Optional[str]) -> str:
+        """
+
+        return cache key
+        Args:
+            kind (str): "namespace", object type or "container"
+            parts (Optional[str]): namespace, object type, object name...
+        Returns:
+            str: cache key
+        """
+        return "/".join([kind] + [_part or "" for _part in parts])
+
+    def get(self, key: str) -> Optional[Tuple[List[str], Optional[str]]]:
+        """
+
+        return cached names and list resourceVersion
+        Args:
+            key (str): cache key
+        Returns:
+            Optional[Tuple[List[str], Optional[str]]]: names and resource version
+        """
+        with self._lock:
+            _entry = self._data.get(self._context, {}).get(key)
+        if _entry is None:
+            return None
+        return list(_entry["names"]), _entry.get("resource_version")
+
+    def put(
+        self, key: str, names: List[str], resource_version: str = None, persist: bool = True
+    ):
+        """
+
+        store names and write cache file
+        Args:
+            key (str): cache key
+            names (List[str]): names
+            resource_version (str): list resource version
+            persist (bool): write cache file now, else at flush (default: True)
+        """
+        with self._lock:
+            self._data.setdefault(self._context, {})[key] = {
+                "names": list(names),
+                "resource_version": resource_version,
+            }
+            self._dirty = True
+            if persist:
+                self._write()
+
+    def flush(self):
+        """
+
+        write cache file if entries were stored without persist
+        """
+        with self._lock:
+            if self._dirty:
+                self._write()
+
+    def _write(self):
+        """
+
+        write cache file, the lock must be held
+        """
+        _tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(_tmp_path, "w", encoding="utf-8") as _file:
+            json.dump(self._data, _file)
+        os.replace(_tmp_path, self._path)
+        self._dirty = False
+
+
+def current_context() -> str:
+    """
+
+    return active kube context name
+    Returns:
+        str: context name
+    """
+    from kubernetes import config  # pylint: disable=import-outside-toplevel
+
+    _, _active = config.list_kube_config_contexts()
+    return _active["name"]
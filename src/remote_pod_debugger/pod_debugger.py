@@ -3,22 +3,65 @@
 Pod debugger
 """
 import argparse
+from concurrent.futures import Future
 from io import IOBase
 import readline
-from typing import Union
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-from kubernetes import client, config
+from kubernetes import client
+from kubernetes.client.exceptions import ApiException
 import yaml
 
+try:
+    from yaml import CSafeDumper as Dumper
+except ImportError:  # pragma: no cover
+    from yaml import SafeDumper as Dumper
+
+from remote_pod_debugger.backends import Backend, ClientBackend
+from remote_pod_debugger.backup_store import BackupStore
+from remote_pod_debugger.cache import ObjectCache, resource_version
+from remote_pod_debugger.container_index import ContainerIndex, container_refs
+from remote_pod_debugger.kinds import PATCHABLE_KINDS, WORKLOAD_KINDS, get_kind
+from remote_pod_debugger.listing import ListingMixin
+from remote_pod_debugger.name_cache import NameCache
+from remote_pod_debugger.pods import PodsMixin
+from remote_pod_debugger.restore import restore_body, restore_point
 from remote_pod_debugger.utils import info, debug, warning
+from remote_pod_debugger.wheel import (
+    wheel_config_map,
+    wheel_pythonpath,
+    wheel_volume,
+    wheel_volume_mount,
+)
 from remote_pod_debugger.completer import Completer
 
 
 REMOTE_PDB_PACKAGE = "git+https://github.com/manslaughter03/python-remote-pdb"
-OBJECT_TYPES = ["deployment", "daemonset"]
+OBJECT_TYPES = WORKLOAD_KINDS
+PATCHABLE_TYPES = PATCHABLE_KINDS
 
 
-class PodDebugger:
+def _contains(current: Any, desired: Any) -> bool:
+    """
+
+    check a serialized value contains desired fields, fields defaulted by
+    the API server are ignored
+    Args:
+        current (Any): current value
+        desired (Any): desired value
+    Returns:
+        bool: True if every desired field has the same value
+    """
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(
+            _contains(current.get(_key), _value) for _key, _value in desired.items()
+        )
+    return current == desired
+
+
+class PodDebugger(ListingMixin, PodsMixin):
     """
 
     PodDebugger class
@@ -30,6 +73,11 @@ class PodDebugger:
         pip_extra_args: str = None,
         before_script: str = None,
         _debug: bool = False,
+        name_cache: NameCache = None,
+        fuzzy_completion: bool = False,
+        backend: Backend = None,
+        remote_pdb_wheel: str = None,
+        backup_store: BackupStore = None,
     ):
         """
 
@@ -39,14 +87,28 @@ class PodDebugger:
             remote_pdb_package (str): Remote pdb package (default: REMOTE_PDB_PACKAGE)
             before_script (str): script to append in container args (default: None)
             _debug (bool): debug flag (default: False)
-        """
-        config.load_kube_config()
-        self._apps_v1_api = client.AppsV1Api()
-        self._core_v1_api = client.CoreV1Api()
+            name_cache (NameCache): persistent name cache (default: None)
+            fuzzy_completion (bool): fuzzy tab completion (default: False)
+            backend (Backend): kubernetes backend (default: ClientBackend)
+            remote_pdb_wheel (str): local remote_pdb wheel, shipped in a ConfigMap
+                instead of pip installing remote_pdb package (default: None)
+            backup_store (BackupStore): backup store (default: BackupStore())
+        """
+        self._backend = backend or ClientBackend(_debug)
         self._debug = _debug
         self._remote_pdb_package = remote_pdb_package
         self._before_script = before_script
         self._pip_extra_args = pip_extra_args
+        self._cache = ObjectCache()
+        self._reads: Dict[Tuple[str, str, str], Future] = {}
+        self._reads_lock = threading.Lock()
+        self._name_cache = name_cache
+        self._fuzzy_completion = fuzzy_completion
+        self._list_versions: Dict[Tuple[str, Optional[str]], str] = {}
+        self._remote_pdb_wheel = remote_pdb_wheel
+        self._wheel_config_maps: Dict[str, Future] = {}
+        self._wheel_lock = threading.Lock()
+        self._backup_store = backup_store or BackupStore()
 
     @property
     def remote_pdb_package(self) -> str:
@@ -58,6 +120,16 @@ class PodDebugger:
         """
         return self._remote_pdb_package
 
+    @property
+    def remote_pdb_wheel(self) -> Optional[str]:
+        """
+
+        remote_pdb_wheel property
+        Returns:
+            Optional[str]: local remote_pdb wheel path
+        """
+        return self._remote_pdb_wheel
+
     @property
     def pip_extra_args(self) -> str:
         """
@@ -87,12 +159,18 @@ class PodDebugger:
         Returns:
             str: before_script property
         """
+        _install = (
+            wheel_pythonpath(self._remote_pdb_wheel)
+            if self._remote_pdb_wheel
+            else None
+        )
         if self._before_script:
-            return f"{self._before_script} && pip install {self.pip_extra_args} {self.remote_pdb_package}"
-        return f"pip install {self.remote_pdb_package}"
+            return f"{self._before_script} && " + (
+                _install or f"pip install {self.pip_extra_args} {self.remote_pdb_package}"
+            )
+        return _install or f"pip install {self.remote_pdb_package}"
 
-    @staticmethod
-    def _select(msg: str, options: list) -> str:
+    def _select(self, msg: str, options: list) -> str:
         """
 
         Args:
@@ -102,7 +180,7 @@ class PodDebugger:
             str: Option selected
         """
         _selected = False
-        readline.set_completer(Completer(options).complete)
+        readline.set_completer(Completer(options, self._fuzzy_completion).complete)
         while not _selected:
             _option = input(f"{msg}?\n> ")
             if _option not in options:
@@ -111,17 +189,21 @@ class PodDebugger:
             break
         return _option
 
-    def select_object_type(self) -> str:
+    def select_object_type(self, ephemeral: bool = False) -> str:
         """
 
         List object type, and prompt in order to select one
         object type.
+        Args:
+            ephemeral (bool): offer types debugged with an ephemeral container
+                only, like job and pod (default: False)
         Returns:
             str: object type
         """
-        for _item in OBJECT_TYPES:
+        _types = OBJECT_TYPES if ephemeral else PATCHABLE_TYPES
+        for _item in _types:
             print(_item)
-        return self._select("Select object type", OBJECT_TYPES)
+        return self._select("Select object type", _types)
 
     def select_namespace(self) -> str:
         """
@@ -131,46 +213,194 @@ class PodDebugger:
         Returns:
             str: namespace name
         """
-        _results = self._core_v1_api.list_namespace()
         info("# List of existing namespaces")
-        _namespaces = [item.metadata.name for item in _results.items]
-        for _item in _namespaces:
-            print(_item)
+        _namespaces = self._print_names(self._names("namespace"))
         return self._select("Select one namespace", _namespaces)
 
-    def select_daemonset(self, namespace: str) -> str:
+    def select_name(
+        self,
+        object_type: str,
+        namespace: str,
+        label_selector: str = None,
+        field_selector: str = None,
+    ) -> str:
+        """
+
+        List objects of namespace, and prompt in order to select one
+        object, return object name.
+        Args:
+            object_type (str): object type
+            namespace (str): namespace name
+            label_selector (str): label selector
+            field_selector (str): field selector
+        Returns:
+            str: object name
+        """
+        info(f"# List of existing {object_type} of namespace {namespace}")
+        _names = self._print_names(
+            self._names(object_type, namespace, label_selector, field_selector)
+        )
+        return self._select(f"Wich {object_type} you want to patch", _names)
+
+    def select_daemonset(
+        self, namespace: str, label_selector: str = None, field_selector: str = None
+    ) -> str:
         """
 
         List daemonset of namespace, and prompt in order to select one
         daemonset, return daemonset name.
         Args:
             namespace (str): namespace name
+            label_selector (str): label selector
+            field_selector (str): field selector
         Returns:
             str: daemonset name
         """
-        _results = self._apps_v1_api.list_namespaced_daemon_set(namespace=namespace)
-        _daemonsets = [item.metadata.name for item in _results.items]
-        info(f"# List of existing daemonset of namespace {namespace}")
-        for _item in _daemonsets:
-            print(_item)
-        return self._select("Wich daemonset you want to patch", _daemonsets)
+        return self.select_name("daemonset", namespace, label_selector, field_selector)
 
-    def select_deployment(self, namespace: str) -> str:
+    def select_deployment(
+        self, namespace: str, label_selector: str = None, field_selector: str = None
+    ) -> str:
         """
 
         List deployment of namespace, and prompt in order to select one
         deployment, return deployment name.
         Args:
             namespace (str): Namespace name
+            label_selector (str): label selector
+            field_selector (str): field selector
         Returns:
             str: deployment name
         """
-        _results = self._apps_v1_api.list_namespaced_deployment(namespace=namespace)
-        _deployments = [item.metadata.name for item in _results.items]
-        info(f"# List of existing deployments of namespace {namespace}")
-        for _item in _deployments:
-            print(_item)
-        return self._select("Wich deployment you want to patch", _deployments)
+        return self.select_name("deployment", namespace, label_selector, field_selector)
+
+    def select_object(
+        self, object_type: str, label_selector: str = None, field_selector: str = None
+    ) -> Tuple[str, str]:
+        """
+
+        List objects matching selectors across all namespaces with a single
+        request, and prompt in order to select one of them.
+        Args:
+            object_type (str): object type
+            label_selector (str): label selector
+            field_selector (str): field selector
+        Returns:
+            Tuple[str, str]: namespace and object name
+        """
+        info(f"# List of {object_type} of all namespaces")
+        _objects = self._print_names(
+            f"{_metadata['namespace']}/{_metadata['name']}"
+            for _metadata in self.iter_metadata(
+                object_type, None, label_selector, field_selector
+            )
+        )
+        _namespace, _name = self._select(
+            f"Wich {object_type} you want to patch", _objects
+        ).split("/", 1)
+        return _namespace, _name
+
+    def prefetch(
+        self, namespace: str, object_type: str = None, name: str = None
+    ):  # pylint: disable=unused-argument
+        """
+
+        Hint about the next API calls of the prompt, called as soon as
+        namespace or object are known. No-op for the synchronous debugger.
+        Args:
+            namespace (str): namespace name
+            object_type (str): object type, if known
+            name (str): object name, if known
+        """
+
+    @staticmethod
+    def _print_names(names: Iterable[str]) -> List[str]:
+        """
+
+        Print names as they arrive
+        Args:
+            names (Iterable[str]): names
+        Returns:
+            List[str]: names printed
+        """
+        if isinstance(names, list):
+            for _item in names:
+                print(_item)
+            return names
+        _names = []
+        for _item in names:
+            print(_item, flush=True)
+            _names.append(_item)
+        return _names
+
+    def read_object(
+        self, name: str, namespace: str, object_type: str = "deployment"
+    ) -> Union[client.models.V1Deployment, client.models.V1DaemonSet]:
+        """
+
+        Read deployment or daemonset, the object is read once per session
+        and served from cache until a newer resourceVersion is observed.
+        Concurrent reads of the same object share one API call.
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+           Union[client.models.V1Deployment, client.models.V1DaemonSet]:
+             deployment or daemonset
+        """
+        _key = (object_type, namespace, name)
+        with self._reads_lock:
+            _result = self._cache.get(_key)
+            if _result is not None:
+                return _result
+            _future = self._reads.get(_key)
+            _reader = _future is None
+            if _reader:
+                _future = self._reads[_key] = Future()
+        if not _reader:
+            return _future.result()
+        try:
+            _result = self._backend.read(object_type, name, namespace)
+            if not _result:
+                raise Exception(f"Can't find {name} {object_type}")
+            self._cache.put(_key, _result)
+            _future.set_result(_result)
+        except Exception as error:
+            _future.set_exception(error)
+            raise
+        finally:
+            with self._reads_lock:
+                del self._reads[_key]
+        return _result
+
+    def generation(
+        self, name: str, namespace: str, object_type: str = "deployment"
+    ) -> Optional[int]:
+        """
+
+        Return spec generation of an object, read with read_object
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+            Optional[int]: metadata.generation
+        """
+        return self._backend.sanitize(self.read_object(name, namespace, object_type))[
+            "metadata"
+        ].get("generation")
+
+    def invalidate(self, name: str, namespace: str, object_type: str = "deployment"):
+        """
+
+        Drop cached copy of an object, next read_object hits the API
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        """
+        self._cache.invalidate((object_type, namespace, name))
 
     def get_container_args(
         self, name: str, namespace: str, object_type: str, container_name: str
@@ -185,18 +415,111 @@ class PodDebugger:
         Return:
             list: list of container args
         """
-        _fn = (
-            self._apps_v1_api.read_namespaced_deployment
-            if object_type == "deployment"
-            else self._apps_v1_api.read_namespaced_daemon_set
-        )
-        _result = _fn(name, namespace)
-        for _item in _result.spec.template.spec.containers:
+        _result = self.read_object(name, namespace, object_type)
+        for _item in self._backend.containers(_result, object_type):
             if _item.name == container_name:
                 return _item.args
 
         return []
 
+    def get_container_names(self, name: str, namespace: str, object_type: str) -> List[str]:
+        """
+
+        get container names
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Return:
+            List[str]: container names
+        """
+        return [
+            _item.name
+            for _item in self._backend.containers(
+                self.read_object(name, namespace, object_type), object_type
+            )
+        ]
+
+    def container_index(
+        self,
+        namespace: str = None,
+        object_types: Iterable[str] = None,
+        label_selector: str = None,
+    ) -> ContainerIndex:
+        """
+
+        Index containers of every workload with one list call per object
+        type, listed objects are cached for later reads.
+        Args:
+            namespace (str): namespace name (default: all namespaces)
+            object_types (Iterable[str]): object types (default: patchable
+                workload types)
+            label_selector (str): label selector
+        Returns:
+            ContainerIndex: container index
+        """
+        if object_types is None:
+            object_types = PATCHABLE_TYPES
+        _index = ContainerIndex()
+        for _type in object_types:
+            for _item in self._backend.find(_type, namespace, label_selector):
+                _metadata = _item.metadata
+                self._cache.put((_type, _metadata.namespace, _metadata.name), _item)
+                for _container in container_refs(self._backend.sanitize(_item), _type):
+                    _index.add(_container)
+        return _index
+
+    def _container_names(self, name: str, namespace: str, object_type: str) -> List[str]:
+        """
+
+        Return container names of object, from name cache if any, then
+        refreshed in background from the object
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+            List[str]: container names
+        """
+        _cached = (
+            self._name_cache.get(NameCache.key("container", object_type, namespace, name))
+            if self._name_cache
+            else None
+        )
+        if _cached is None:
+            return self._read_container_names(name, namespace, object_type)
+        threading.Thread(
+            target=self._read_container_names,
+            args=(name, namespace, object_type, _cached[0]),
+            daemon=True,
+        ).start()
+        return _cached[0]
+
+    def _read_container_names(
+        self, name: str, namespace: str, object_type: str, names: List[str] = None
+    ) -> List[str]:
+        """
+
+        Read container names of object, and store them in name cache
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+            names (List[str]): cached names, updated in place
+        Returns:
+            List[str]: container names
+        """
+        _containers = self.get_container_names(name, namespace, object_type)
+        if names is not None:
+            names[:] = _containers
+        if self._name_cache is not None:
+            self._name_cache.put(
+                NameCache.key("container", object_type, namespace, name),
+                _containers,
+                resource_version(self.read_object(name, namespace, object_type)),
+            )
+        return _containers
+
     def select_container(
         self, name: str, namespace: str, _object: str = "deployment"
     ) -> str:
@@ -209,18 +532,7 @@ class PodDebugger:
         Returns:
             str: container name
         """
-        _results = None
-        if _object == "deployment":
-            _results = self._apps_v1_api.read_namespaced_deployment(
-                name=name, namespace=namespace
-            )
-        elif _object == "daemonset":
-            _results = self._apps_v1_api.read_namespaced_daemon_set(
-                name=name, namespace=namespace
-            )
-        if not _results:
-            raise Exception("Can't find container")
-        _containers = [item.name for item in _results.spec.template.spec.containers]
+        _containers = self._container_names(name, namespace, _object)
         info(f"# List of containers of deployment {name} of namespace {namespace}")
         for _item in _containers:
             print(_item)
@@ -237,19 +549,34 @@ class PodDebugger:
             namespace (str): namespace name
             filepath (str): filepath
         """
-        _data = None
-        if object_type == "deployment":
-            _data = self._apps_v1_api.read_namespaced_deployment(name, namespace)
-        if object_type == "daemonset":
-            _data = self._apps_v1_api.read_namespaced_daemon_set(name, namespace)
-        if not _data:
-            raise Exception(f"Can't find {name} {object_type}")
+        _data = self.read_object(name, namespace, object_type)
         yaml.dump(
-            client.ApiClient().sanitize_for_serialization(_data),
+            self._backend.sanitize(_data),
             file,
+            Dumper=Dumper,
             default_flow_style=False,
         )
 
+    def store_backup(self, name: str, namespace: str, object_type: str = "deployment") -> str:
+        """
+
+        backup deployment to backup store
+        Args:
+            name (str): deployment name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+            str: backup hash
+        """
+        _hash = self._backup_store.put(
+            namespace,
+            object_type,
+            self._backend.sanitize(self.read_object(name, namespace, object_type)),
+        )
+        # batches back up thousands of objects, don't keep them all in memory
+        self._cache.invalidate((object_type, namespace, name))
+        return _hash
+
     def container_args(
         self, host: str, port: int, pdb_extra: str, entrypoint: str
     ) -> str:
@@ -265,10 +592,179 @@ class PodDebugger:
             str: container args
         """
         return (
-            self.before_script + f" && python -m remote_pdb --host {host} --port {port}"
+            "_start=$(date +%s) && "
+            + self.before_script
+            + ' && echo "remote_pdb setup took $(($(date +%s) - _start))s"'
+            + f" && python -m remote_pdb --host {host} --port {port}"
             f" {pdb_extra} --reverse {entrypoint}"
         )
 
+    def ensure_wheel(self, namespace: str) -> str:
+        """
+
+        Upload remote_pdb wheel ConfigMap to namespace, once. Concurrent
+        patches of the namespace wait for the same upload.
+        Args:
+            namespace (str): namespace name
+        Returns:
+            str: ConfigMap name
+        """
+        with self._wheel_lock:
+            _future = self._wheel_config_maps.get(namespace)
+            _uploader = _future is None
+            if _uploader:
+                _future = self._wheel_config_maps[namespace] = Future()
+        if not _uploader:
+            return _future.result()
+        try:
+            _start = time.perf_counter()
+            _name, _body = wheel_config_map(self._remote_pdb_wheel)
+            try:
+                self._backend.create("configmap", namespace, _body)
+            except ApiException as error:
+                if error.status != 409:
+                    raise
+            info(
+                f"remote_pdb wheel ConfigMap {_name} ready in {namespace}"
+                f" ({(time.perf_counter() - _start) * 1000:.0f} ms)"
+            )
+            _future.set_result(_name)
+        except Exception as error:
+            # upload is tried again by the next patch of namespace
+            with self._wheel_lock:
+                del self._wheel_config_maps[namespace]
+            _future.set_exception(error)
+            raise
+        return _name
+
+    def debug_args(
+        self, host: str, port: int, entrypoint: str, pdb_commands: list = None
+    ) -> List[str]:
+        """
+
+        return args of patched container (command is sh)
+        Args:
+            host (str): remote host debugger
+            port (int): remote port debugger
+            entrypoint (str): python file or module entrypoint
+            pdb_commands (list): pdb command list
+        Returns:
+            List[str]: container args
+        """
+        _pdb_extra = (
+            " ".join([f"-c {_item}" for _item in pdb_commands]) if pdb_commands else ""
+        )
+        return ["-c", self.container_args(host, port, _pdb_extra, entrypoint)]
+
+    def patch_body(
+        self,
+        name: str,
+        namespace: str,
+        host: str,
+        port: int,
+        entrypoint: str,
+        container_name: str,
+        image_name: str = None,
+        pdb_commands: list = None,
+        object_name: str = "deployment",
+        wheel_config_map_name: str = None,
+    ) -> Optional[dict]:
+        """
+
+        Compute debug patch of a container, only fields differing from the
+        cached object are kept. No API call is made except reading the object.
+        Args:
+            name (str): deployment name
+            namespace (str): namespace name
+            host (str): remote host debugger
+            port (int): remote port debugger
+            entrypoint (str): python file or module entrypoint
+            container_name (str): container name
+            image_name (str): docker image name
+            pdb_commands (list): pdb command list
+            object_name (str): object type
+            wheel_config_map_name (str): remote_pdb wheel ConfigMap to mount
+        Returns:
+            Optional[dict]: strategic merge patch, None if already patched
+        """
+        _kind = get_kind(object_name)
+        if not _kind.mutable_command:
+            raise Exception(
+                f"{object_name} containers can't be patched, use an ephemeral container"
+            )
+        _current_spec = _kind.pod_spec(
+            self._backend.sanitize(self.read_object(name, namespace, object_name))
+        )
+        _container = self._find_container(_current_spec, container_name)
+        _desired = {
+            "command": ["sh"],
+            "args": self.debug_args(host, port, entrypoint, pdb_commands),
+        }
+        if image_name:
+            _desired["image"] = image_name
+        _changes = {
+            _field: _value
+            for _field, _value in _desired.items()
+            if _container.get(_field) != _value
+        }
+        _pod_spec = {}
+        if wheel_config_map_name:
+            _volume = wheel_volume(wheel_config_map_name)
+            if not any(_contains(_item, _volume) for _item in _current_spec.get("volumes") or []):
+                _pod_spec["volumes"] = [_volume]
+            _mount = wheel_volume_mount()
+            if not any(_contains(_item, _mount) for _item in _container.get("volumeMounts") or []):
+                _changes["volumeMounts"] = [_mount]
+        if not _changes and not _pod_spec:
+            return None
+        _pod_spec["containers"] = [{"name": container_name, **_changes}]
+        return _kind.patch_body(_pod_spec)
+
+    def apply_patch(
+        self,
+        name: str,
+        namespace: str,
+        body: dict,
+        object_name: str = "deployment",
+        container_name: str = None,
+        save_restore: bool = False,
+    ) -> Union[client.models.V1Deployment, client.models.V1DaemonSet]:
+        """
+
+        Send a patch computed by patch_body
+        Args:
+            name (str): deployment name
+            namespace (str): namespace name
+            body (dict): strategic merge patch
+            object_name (str): object type
+            container_name (str): patched container, needed by save_restore
+            save_restore (bool): save restore point of container (see restore),
+                values recorded by a previous patch are kept
+        Returns:
+           Union[client.models.V1Deployment, client.models.V1DaemonSet]:
+             return deployment or daemonset patched
+        """
+        _restore_point = None
+        if save_restore:
+            _restore_point = restore_point(
+                self._backend.sanitize(self.read_object(name, namespace, object_name)),
+                object_name,
+                container_name,
+                body,
+                self._backup_store.load_restore_point(namespace, object_name, name),
+            )
+        if self.debug:
+            debug(f"Patch {object_name} {name} of {namespace} with {body}")
+        _result = self._backend.patch(object_name, name, namespace, body)
+        if _result:
+            self._cache.put((object_name, namespace, name), _result)
+        if _restore_point:
+            _metadata = self._backend.sanitize(_result)["metadata"]
+            _restore_point["generation"] = _metadata.get("generation")
+            _restore_point["resourceVersion"] = _metadata.get("resourceVersion")
+            self._backup_store.save_restore_point(_restore_point)
+        return _result
+
     def patch(
         self,
         name: str,
@@ -280,11 +776,13 @@ class PodDebugger:
         image_name: str = None,
         pdb_commands: list = None,
         object_name: str = "deployment",
+        save_restore: bool = False,
     ) -> Union[client.models.V1Deployment, client.models.V1DaemonSet]:
         """
 
         Patch container of a deployment, replace cmd and args container,
-        you can update image name too.
+        you can update image name too. Only fields differing from the cached
+        object are sent, nothing is sent if the container is already patched.
         Args:
             name (str): deployment name
             namespace (str): namespace name
@@ -294,42 +792,72 @@ class PodDebugger:
             container_name (str): container name
             image_name (str): docker image name
             pdb_commands (list): pdb command list
+            object_name (str): object type
+            save_restore (bool): save restore point of container (see restore)
         Returns:
            Union[client.models.V1Deployment, client.models.V1DaemonSet]:
              return deployment or daemonset patched
         """
-        _pdb_extra = (
-            " ".join([f"-c {_item}" for _item in pdb_commands]) if pdb_commands else ""
+        _body = self.patch_body(
+            name,
+            namespace,
+            host,
+            port,
+            entrypoint,
+            container_name,
+            image_name,
+            pdb_commands,
+            object_name,
+            self.ensure_wheel(namespace) if self._remote_pdb_wheel else None,
         )
-        _container_args = self.container_args(host, port, _pdb_extra, entrypoint)
-        _body = {
-            "spec": {
-                "template": {
-                    "spec": {
-                        "containers": [
-                            {
-                                "name": container_name,
-                                "image": image_name,
-                                "command": ["sh"],
-                                "args": ["-c", _container_args],
-                            }
-                        ]
-                    }
-                }
-            }
-        }
-        if self.debug:
-            debug(f"Patch deployment {name} of {namespace} with {_body}")
-        _result = None
-        if object_name == "deployment":
-            _result = self._apps_v1_api.patch_namespaced_deployment(
-                name, namespace, _body
-            )
-        elif object_name == "daemonset":
-            _result = self._apps_v1_api.patch_namespaced_daemon_set(
-                name, namespace, _body
-            )
+        if _body is None:
+            info(f"{object_name} {name} of {namespace} is already patched")
+            return self.read_object(name, namespace, object_name)
+        return self.apply_patch(
+            name, namespace, _body, object_name, container_name, save_restore
+        )
+
+    @staticmethod
+    def _find_container(pod_spec: dict, container_name: str) -> dict:
+        """
+
+        return container of a serialized pod spec
+        Args:
+            pod_spec (dict): serialized pod spec
+            container_name (str): container name
+        Returns:
+            dict: container
+        """
+        for _container in pod_spec["containers"]:
+            if _container["name"] == container_name:
+                return _container
+        raise Exception(f"Can't find container {container_name}")
 
+    def restore(
+        self, name: str, namespace: str, object_type: str = "deployment"
+    ) -> Union[client.models.V1Deployment, client.models.V1DaemonSet]:
+        """
+
+        Restore containers patched with save_restore, and the wheel volume,
+        with one JSON patch guarded by the generation observed after the
+        last debug patch.
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+           Union[client.models.V1Deployment, client.models.V1DaemonSet]:
+             return deployment or daemonset restored
+        """
+        _point = self._backup_store.load_restore_point(namespace, object_type, name)
+        if _point is None:
+            raise Exception(f"Can't find restore point of {name} {object_type}")
+        _body = restore_body(_point)
+        if self.debug:
+            debug(f"Restore {object_type} {name} of {namespace} with {_body}")
+        _result = self._backend.patch(object_type, name, namespace, _body)
+        self._cache.put((object_type, namespace, name), _result)
+        self._backup_store.remove_restore_point(namespace, object_type, name)
         return _result
 
     def run(self, args: argparse.Namespace):
@@ -339,9 +867,6 @@ class PodDebugger:
         Args:
             args (argparse.Namespace): args namespace
         """
-        _namespace = args.namespace
-        if not _namespace:
-            _namespace = self.select_namespace()
         _object_name = None
         _object_type = None
         if args.deployment:
@@ -350,22 +875,36 @@ class PodDebugger:
         elif args.daemonset:
             _object_name = args.daemonset
             _object_type = "daemonset"
+        elif args.kind:
+            _object_name = args.name
+            _object_type = args.kind
+
+        _namespace = args.namespace
+        _selectors = (args.selector, args.field_selector)
+        if not _namespace and not _object_name and any(_selectors):
+            if not _object_type:
+                _object_type = self.select_object_type(args.ephemeral)
+            _namespace, _object_name = self.select_object(_object_type, *_selectors)
+        if not _namespace:
+            _namespace = self.select_namespace()
+        self.prefetch(_namespace, _object_type, _object_name)
 
         if not _object_type:
-            _object_type = self.select_object_type()
-        if not _object_name and _object_type == "deployment":
-            _object_name = self.select_deployment(_namespace)
-        elif not _object_name and _object_type == "daemonset":
-            _object_name = self.select_daemonset(_namespace)
+            _object_type = self.select_object_type(args.ephemeral)
+        if not _object_name:
+            _object_name = self.select_name(_object_type, _namespace, *_selectors)
 
         if not _object_name:
             raise Exception("Can't find object to patch")
 
+        if args.restore:
+            self.restore(_object_name, _namespace, _object_type)
+            info(f"Success restore {_object_name} {_object_type} on {_namespace} namespace.")
+            return
+
         if args.backup:
-            _backup_filepath = f"/tmp/{_object_name}.yaml"
-            with open(_backup_filepath, "w", encoding="utf-8") as _file:
-                self.backup(_object_name, _namespace, _file, _object_type)
-            info(f"Backup deployment {_object_name} to {_backup_filepath}")
+            _hash = self.store_backup(_object_name, _namespace, _object_type)
+            info(f"Backup {_object_type} {_object_name} as {_hash}")
 
         _container_name = (
             self.select_container(_object_name, _namespace, _object_type)
@@ -401,6 +940,20 @@ class PodDebugger:
                 if _pdb_cmd_tmp == "stop":
                     break
                 _pdb_commands.append(_pdb_cmd_tmp)
+        if args.ephemeral:
+            self._run_ephemeral(
+                args,
+                _object_name,
+                _namespace,
+                _object_type,
+                _host,
+                int(_port),
+                _entrypoint,
+                _container_name,
+                _image_name,
+                _pdb_commands,
+            )
+            return
         _patch_result = self.patch(
             _object_name,
             _namespace,
@@ -411,7 +964,16 @@ class PodDebugger:
             _image_name,
             args.pdb_command,
             _object_type,
+            save_restore=args.backup,
         )
         if args.debug:
             debug(f"Patch result: {_patch_result}")
         info(f"Success patch {_object_name} {_object_type} on {_namespace} namespace.")
+        if args.wait:
+            self.wait_for_debug_pod(
+                _patch_result,
+                _namespace,
+                _container_name,
+                self.debug_args(_host, int(_port), _entrypoint, _pdb_commands),
+                args.wait_timeout,
+            )
@@ -0,0 +1,225 @@
+"""
+
+Pods of workloads
+
+Running pods of a workload are found from its pod selector, one of them can
+be debugged with an ephemeral container instead of patching the pod
+template, and pods are watched until the debug container runs.
+"""
+import argparse
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from remote_pod_debugger.backends import (
+    collection_path,
+    format_label_selector,
+    selector_query,
+)
+from remote_pod_debugger.utils import info, debug, warning
+from remote_pod_debugger.wait import POD_WATCH_TIMEOUT, wait_for_debug_pod
+
+
+EPHEMERAL_CONTAINER_PREFIX = "remote-pdb"
+EPHEMERAL_INHERITED_FIELDS = ["env", "envFrom", "volumeMounts", "workingDir"]
+
+
+class PodsMixin:
+    """
+
+    PodDebugger pods and ephemeral containers, relies on its backend and
+    object reads
+    """
+
+    def running_pods(self, name: str, namespace: str, object_type: str) -> Dict[str, dict]:
+        """
+
+        List running pods of a workload, or the pod itself
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+            Dict[str, dict]: pod json by pod name
+        """
+        _object = self._backend.sanitize(self.read_object(name, namespace, object_type))
+        if object_type == "pod":
+            _items = [_object]
+        else:
+            _label_selector = format_label_selector(_object["spec"].get("selector") or {})
+            if not _label_selector:
+                raise Exception(f"Can't find pods of {object_type} {name}")
+            _items = json.loads(
+                self._backend.get(
+                    collection_path("pod", namespace), selector_query(_label_selector), {}
+                )
+            ).get("items", [])
+        return {
+            _pod["metadata"]["name"]: _pod
+            for _pod in _items
+            if _pod.get("status", {}).get("phase") == "Running"
+        }
+
+    def select_pod(self, name: str, namespace: str, object_type: str) -> str:
+        """
+
+        List running pods of object and prompt in order to select one of them
+        Args:
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+        Returns:
+            str: pod name
+        """
+        _pods = list(self.running_pods(name, namespace, object_type))
+        info(f"# List of running pods of {object_type} {name} of namespace {namespace}")
+        return self._select("Wich pod you want to debug", self._print_names(_pods))
+
+    def debug_ephemeral(  # pylint: disable=too-many-arguments
+        self,
+        pod_name: str,
+        namespace: str,
+        host: str,
+        port: int,
+        entrypoint: str,
+        container_name: str,
+        image_name: str = None,
+        pdb_commands: list = None,
+    ) -> Tuple[Any, dict]:
+        """
+
+        Attach an ephemeral debug container to one running pod, instead of
+        patching the pod template (no rollout). The debug container shares
+        the process namespace of the target container and inherits its
+        environment, volume mounts and working directory.
+        Args:
+            pod_name (str): pod name
+            namespace (str): namespace name
+            host (str): remote host debugger
+            port (int): remote port debugger
+            entrypoint (str): python file or module entrypoint
+            container_name (str): target container name
+            image_name (str): debug container image (default: target image)
+            pdb_commands (list): pdb command list
+        Returns:
+            Tuple[Any, dict]: patched pod and ephemeral container
+        """
+        if self._remote_pdb_wheel:
+            raise Exception("remote_pdb wheel can't be mounted in an ephemeral container")
+        _pod = json.loads(
+            self._backend.get(f"{collection_path('pod', namespace)}/{pod_name}", [], {})
+        )
+        _target = next(
+            (
+                _container
+                for _container in _pod["spec"]["containers"]
+                if _container["name"] == container_name
+            ),
+            None,
+        )
+        if _target is None:
+            raise Exception(f"Can't find container {container_name} in pod {pod_name}")
+        _container = {
+            "name": f"{EPHEMERAL_CONTAINER_PREFIX}-{int(time.time())}-{uuid.uuid4().hex[:6]}",
+            "image": image_name or _target["image"],
+            "command": ["sh"],
+            "args": self.debug_args(host, port, entrypoint, pdb_commands),
+            "targetContainerName": container_name,
+        }
+        for _field in EPHEMERAL_INHERITED_FIELDS:
+            if _field in _target:
+                _container[_field] = _target[_field]
+        _body = {"spec": {"ephemeralContainers": [_container]}}
+        if self.debug:
+            debug(f"Patch pod {pod_name} of {namespace} with {_body}")
+        _result = self._backend.patch(
+            "pod", pod_name, namespace, _body, "ephemeralcontainers"
+        )
+        return _result, _container
+
+    def wait_for_debug_pod(
+        self,
+        patched: Any,
+        namespace: str,
+        container_name: str,
+        container_args: List[str],
+        timeout: int = POD_WATCH_TIMEOUT,
+    ) -> Optional[str]:
+        """
+
+        Watch pods of patched object until the first patched pod runs
+        Args:
+            patched (Any): patched object
+            namespace (str): namespace name
+            container_name (str): patched container name
+            container_args (List[str]): patched container args
+            timeout (int): timeout in seconds
+        Returns:
+            Optional[str]: pod name, None on timeout
+        """
+        _selector = self._backend.sanitize(patched)["spec"].get("selector")
+        if not _selector:
+            warning("Patched object has no pod selector, can't wait for its pods")
+            return None
+        return wait_for_debug_pod(
+            self._backend,
+            namespace,
+            _selector,
+            container_name,
+            container_args,
+            timeout,
+        )
+
+    def _run_ephemeral(  # pylint: disable=too-many-arguments
+        self,
+        args: argparse.Namespace,
+        name: str,
+        namespace: str,
+        object_type: str,
+        host: str,
+        port: int,
+        entrypoint: str,
+        container_name: str,
+        image_name: str,
+        pdb_commands: list,
+    ):
+        """
+
+        Debug one pod of object with an ephemeral container
+        Args:
+            args (argparse.Namespace): args namespace
+            name (str): object name
+            namespace (str): namespace name
+            object_type (str): object type
+            host (str): remote host debugger
+            port (int): remote port debugger
+            entrypoint (str): python file or module entrypoint
+            container_name (str): target container name
+            image_name (str): debug container image
+            pdb_commands (list): pdb command list
+        """
+        _pod_name = args.pod or self.select_pod(name, namespace, object_type)
+        _result, _container = self.debug_ephemeral(
+            _pod_name,
+            namespace,
+            host=host,
+            port=port,
+            entrypoint=entrypoint,
+            container_name=container_name,
+            image_name=image_name or None,
+            pdb_commands=pdb_commands,
+        )
+        if args.debug:
+            debug(f"Patch result: {_result}")
+        info(f"Success attach {_container['name']} to pod {_pod_name} on {namespace} namespace.")
+        if args.wait:
+            wait_for_debug_pod(
+                self._backend,
+                namespace,
+                {},
+                _container["name"],
+                _container["args"],
+                args.wait_timeout,
+                field_selector=f"metadata.name={_pod_name}",
+            )
@@ -0,0 +1,116 @@
+"""
+
+Restore patched workloads
+
+Before a patch, only the fields the debugger changes (container command,
+args, image, wheel volume and mount) are recorded with the object
+generation, once per container: patching again keeps the original values.
+Restore sends them back as a small JSON patch, guarded by test operations,
+instead of re-applying a full backup. Restore points are saved in the
+backup store of the kube context.
+"""
+from typing import Any, List
+
+from remote_pod_debugger.kinds import get_kind
+
+
+RESTORE_FIELDS = ("command", "args", "image")
+
+
+def restore_point(
+    _object: dict,
+    object_type: str,
+    container_name: str,
+    body: dict = None,
+    point: dict = None,
+) -> dict:
+    """
+
+    build restore point of a container from a serialized object, before
+    the debug patch. Fields already recorded in point are kept: they hold
+    the spec before the first debug patch, other containers included.
+    Args:
+        _object (dict): serialized deployment or daemonset
+        object_type (str): object type
+        container_name (str): container name
+        body (dict): debug patch, its volumes and volumeMounts are recorded too
+        point (dict): previous restore point of the object
+    Returns:
+        dict: restore point
+    """
+    _kind = get_kind(object_type)
+    _pod_spec = _kind.pod_spec(_object)
+    for _index, _container in enumerate(_pod_spec["containers"]):
+        if _container["name"] == container_name:
+            break
+    else:
+        raise Exception(f"Can't find container {container_name}")
+    _patch = _kind.pod_spec(body) if body else {}
+    _fields = list(RESTORE_FIELDS)
+    for _item in _patch.get("containers", []):
+        if _item["name"] == container_name:
+            _fields += [_field for _field in _item if _field not in RESTORE_FIELDS + ("name",)]
+    _metadata = _object["metadata"]
+    _point = point or {
+        "namespace": _metadata.get("namespace"),
+        "object_type": object_type,
+        "name": _metadata["name"],
+        "containers": {},
+    }
+    _point.update(
+        {
+            "generation": _metadata.get("generation"),
+            "resourceVersion": _metadata.get("resourceVersion"),
+        }
+    )
+    if "volumes" in _patch:
+        _point.setdefault("volumes", _pod_spec.get("volumes"))
+    _recorded = _point["containers"].setdefault(
+        container_name, {"path": f"{_kind.pod_spec_pointer}/containers/{_index}"}
+    )
+    for _field in _fields:
+        _recorded.setdefault(_field, _container.get(_field))
+    return _point
+
+
+def _restore_operation(path: str, value: Any) -> dict:
+    """
+
+    return JSON patch operation setting back a recorded field
+    Args:
+        path (str): field JSON pointer
+        value (Any): recorded value, None if the field was missing
+    Returns:
+        dict: JSON patch operation
+    """
+    if value is None:
+        return {"op": "remove", "path": path}
+    return {"op": "add", "path": path, "value": value}
+
+
+def restore_body(point: dict) -> List[dict]:
+    """
+
+    build JSON patch restoring containers and pod volumes. It fails (422)
+    if the spec changed since the debug patch, or if a container moved.
+    Args:
+        point (dict): restore point
+    Returns:
+        List[dict]: JSON patch
+    """
+    _body = [{"op": "test", "path": "/metadata/generation", "value": point["generation"]}]
+    for _name, _container in point["containers"].items():
+        _prefix = _container["path"]
+        _body.append({"op": "test", "path": f"{_prefix}/name", "value": _name})
+        _body.extend(
+            _restore_operation(f"{_prefix}/{_field}", _value)
+            for _field, _value in _container.items()
+            if _field != "path"
+        )
+    if "volumes" in point:
+        _body.append(
+            _restore_operation(
+                f"{get_kind(point['object_type']).pod_spec_pointer}/volumes", point["volumes"]
+            )
+        )
+    return _body
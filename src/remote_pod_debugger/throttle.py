@@ -0,0 +1,201 @@
+"""
+
+Client side throttling
+
+Every request of a backend takes a token from a token bucket (qps and
+burst) and an in-flight slot. The in-flight limit is adapted with AIMD: it
+grows by one after a full window of successful calls and is halved on 429.
+A 429 also pauses every caller until its Retry-After delay, then the
+request is retried.
+"""
+import threading
+import time
+from typing import Any, Optional
+
+from urllib3.util.retry import Retry
+
+from remote_pod_debugger.utils import warning
+
+
+DEFAULT_QPS = 50.0
+DEFAULT_BURST = 100
+DEFAULT_MAX_INFLIGHT = 32
+DEFAULT_THROTTLE_RETRIES = 5
+DEFAULT_RETRY_AFTER = 1.0
+
+
+def retry_after(response: Any) -> Optional[float]:
+    """
+
+    return Retry-After delay of a response
+    Args:
+        response (Any): urllib3 response
+    Returns:
+        Optional[float]: delay in seconds, None if missing or not a number
+    """
+    _value = response.headers.get("Retry-After")
+    try:
+        return float(_value) if _value else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+
+    Token bucket, refilled at rate tokens per second up to burst tokens
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+
+        TokenBucket constructor
+
+        Args:
+            rate (float): tokens per second
+            burst (int): bucket size
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+
+        take one token, wait for it if the bucket is empty
+        """
+        while True:
+            with self._lock:
+                _now = time.monotonic()
+                self._tokens = min(
+                    self._burst, self._tokens + (_now - self._last) * self._rate
+                )
+                self._last = _now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                _wait = (1 - self._tokens) / self._rate
+            time.sleep(_wait)
+
+
+class AdaptiveLimiter:
+    """
+
+    Token bucket rate limiter with an AIMD in-flight limit
+    """
+
+    def __init__(
+        self,
+        qps: float = DEFAULT_QPS,
+        burst: int = DEFAULT_BURST,
+        max_inflight: int = DEFAULT_MAX_INFLIGHT,
+        retries: int = DEFAULT_THROTTLE_RETRIES,
+    ):
+        """
+
+        AdaptiveLimiter constructor
+
+        Args:
+            qps (float): sustained requests per second (default: DEFAULT_QPS)
+            burst (int): requests allowed at once above qps (default: DEFAULT_BURST)
+            max_inflight (int): max concurrent requests (default: DEFAULT_MAX_INFLIGHT)
+            retries (int): max retries of a throttled request
+                (default: DEFAULT_THROTTLE_RETRIES)
+        """
+        self._bucket = TokenBucket(qps, burst)
+        self._max_inflight = max_inflight
+        self._retries = retries
+        self._limit = float(max_inflight)
+        self._inflight = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """
+
+        current in-flight limit
+        Returns:
+            int: limit
+        """
+        return max(1, int(self._limit))
+
+    def acquire(self):
+        """
+
+        wait for the end of a 429 pause, a token and an in-flight slot
+        """
+        with self._condition:
+            while True:
+                _pause = self._paused_until - time.monotonic()
+                if _pause > 0:
+                    self._condition.wait(_pause)
+                elif self._inflight >= self.limit:
+                    self._condition.wait()
+                else:
+                    self._inflight += 1
+                    break
+        self._bucket.acquire()
+
+    def release(self, throttled: bool = False, delay: Optional[float] = None):
+        """
+
+        release in-flight slot and adapt limit, the limit is halved once
+        per pause when several requests are throttled together
+        Args:
+            throttled (bool): request was rejected with 429
+            delay (Optional[float]): Retry-After delay in seconds
+        """
+        with self._condition:
+            self._inflight -= 1
+            if throttled:
+                _now = time.monotonic()
+                if _now >= self._paused_until:
+                    self._limit = max(1.0, self._limit / 2)
+                self._paused_until = max(
+                    self._paused_until,
+                    _now + (DEFAULT_RETRY_AFTER if delay is None else delay),
+                )
+            else:
+                self._limit = min(self._max_inflight, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def instrument(self, pool_manager: Any):
+        """
+
+        wrap request method of a urllib3 pool manager, throttled requests
+        are retried
+        Args:
+            pool_manager (Any): urllib3 pool manager
+        """
+        _request = pool_manager.request
+        # urllib3 would sleep and retry 429 by itself, behind the limiter
+        _retries = Retry.from_int(
+            pool_manager.connection_pool_kw.get("retries", Retry.DEFAULT)
+        ).new(respect_retry_after_header=False)
+
+        def _limited_request(method: str, url: str, *args, **kwargs):
+            kwargs.setdefault("retries", _retries)
+            _attempt = 0
+            while True:
+                self.acquire()
+                try:
+                    _response = _request(method, url, *args, **kwargs)
+                except BaseException:
+                    self.release()
+                    raise
+                if _response.status != 429 or _attempt >= self._retries:
+                    self.release()
+                    return _response
+                _attempt += 1
+                self.release(True, retry_after(_response))
+                warning(
+                    f"Throttled by API server, in-flight limit {self.limit},"
+                    f" retry {_attempt}/{self._retries}"
+                )
+                _response.drain_conn()
+                _response.release_conn()
+
+        pool_manager.request = _limited_request
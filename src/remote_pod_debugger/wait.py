@@ -0,0 +1,116 @@
+"""
+
+Wait for patched pods
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from kubernetes.client.exceptions import ApiException
+
+from remote_pod_debugger.backends import (
+    Backend,
+    collection_path,
+    format_label_selector,
+    selector_query,
+)
+from remote_pod_debugger.utils import info, warning
+
+
+POD_WATCH_TIMEOUT = 300
+
+
+def is_patched(pod: dict, container_name: str, container_args: List[str]) -> bool:
+    """
+
+    return True if pod runs the patched container
+    Args:
+        pod (dict): pod json
+        container_name (str): patched container name
+        container_args (List[str]): patched container args
+    Returns:
+        bool: pod is patched
+    """
+    _spec = pod.get("spec", {})
+    return any(
+        _container["name"] == container_name and _container.get("args") == container_args
+        for _container in _spec.get("containers", []) + _spec.get("ephemeralContainers", [])
+    )
+
+
+def pod_state(pod: dict, container_name: str) -> str:
+    """
+
+    return container state (Running, waiting reason...), pod phase if unknown
+    Args:
+        pod (dict): pod json
+        container_name (str): container name
+    Returns:
+        str: container state
+    """
+    _status = pod.get("status", {})
+    for _container in (_status.get("containerStatuses") or []) + (
+        _status.get("ephemeralContainerStatuses") or []
+    ):
+        if _container["name"] != container_name:
+            continue
+        _state = _container.get("state") or {}
+        if "running" in _state:
+            return "Running"
+        for _key in ("waiting", "terminated"):
+            if _key in _state:
+                return _state[_key].get("reason") or _key.capitalize()
+    return _status.get("phase", "Unknown")
+
+
+def wait_for_debug_pod(  # pylint: disable=too-many-arguments
+    backend: Backend,
+    namespace: str,
+    selector: Dict[str, Any],
+    container_name: str,
+    container_args: List[str],
+    timeout: int = POD_WATCH_TIMEOUT,
+    field_selector: str = None,
+) -> Optional[str]:
+    """
+
+    Watch pods selected by selector with a single watch stream, report
+    state changes of patched pods and return as soon as one runs the
+    patched container.
+    Args:
+        backend (Backend): kubernetes backend
+        namespace (str): namespace name
+        selector (Dict[str, Any]): workload pod selector
+        container_name (str): patched container name
+        container_args (List[str]): patched container args
+        timeout (int): timeout in seconds (default: POD_WATCH_TIMEOUT)
+        field_selector (str): pod field selector (ex: metadata.name=pod-1)
+    Returns:
+        Optional[str]: pod name, None on timeout
+    """
+    _start = time.perf_counter()
+    _states: Dict[str, str] = {}
+    _query = [("watch", "true"), ("timeoutSeconds", timeout)] + selector_query(
+        format_label_selector(selector), field_selector
+    )
+    _lines = backend.stream(collection_path("pod", namespace), _query, {})
+    for _line in _lines:
+        _event = json.loads(_line)
+        _pod = _event.get("object", {})
+        if _event["type"] == "ERROR":
+            raise ApiException(status=_pod.get("code"), reason=_pod.get("reason"))
+        if _event["type"] == "DELETED" or not is_patched(
+            _pod, container_name, container_args
+        ):
+            continue
+        _name = _pod["metadata"]["name"]
+        _state = pod_state(_pod, container_name)
+        _elapsed = time.perf_counter() - _start
+        if _states.get(_name) != _state:
+            _states[_name] = _state
+            info(f"Pod {_name}: {_state} ({_elapsed:.1f}s)")
+        if _state == "Running":
+            info(f"Debug pod {_name} ready in {_elapsed:.1f}s")
+            return _name
+    warning(f"No patched pod running after {timeout}s")
+    return None
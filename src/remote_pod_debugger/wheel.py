@@ -0,0 +1,78 @@
+"""
+
+Prebuilt remote_pdb wheel delivery
+
+The wheel is shipped in a ConfigMap mounted in the patched container and
+imported straight from the mounted file (zipimport), so pods start
+without cloning or building remote_pdb.
+"""
+import base64
+import hashlib
+import os
+from typing import Tuple
+
+
+WHEEL_VOLUME_NAME = "remote-pdb-wheel"
+WHEEL_MOUNT_PATH = "/opt/remote-pdb"
+MAX_CONFIG_MAP_SIZE = 1024 * 1024
+
+
+def wheel_config_map(path: str) -> Tuple[str, dict]:
+    """
+
+    build ConfigMap holding wheel, named after the wheel content hash so
+    that an existing ConfigMap can be reused as is
+    Args:
+        path (str): local wheel path
+    Returns:
+        Tuple[str, dict]: ConfigMap name and body
+    """
+    with open(path, "rb") as _file:
+        _content = _file.read()
+    _encoded = base64.b64encode(_content).decode()
+    if len(_encoded) > MAX_CONFIG_MAP_SIZE:
+        raise Exception(f"Wheel {path} is too large for a ConfigMap ({len(_content)} bytes)")
+    _name = f"{WHEEL_VOLUME_NAME}-{hashlib.sha256(_content).hexdigest()[:10]}"
+    return _name, {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": _name, "labels": {"app.kubernetes.io/name": WHEEL_VOLUME_NAME}},
+        "binaryData": {os.path.basename(path): _encoded},
+    }
+
+
+def wheel_pythonpath(path: str) -> str:
+    """
+
+    return shell command adding mounted wheel to PYTHONPATH
+    Args:
+        path (str): local wheel path
+    Returns:
+        str: shell command
+    """
+    return (
+        f"export PYTHONPATH={WHEEL_MOUNT_PATH}/{os.path.basename(path)}"
+        "${PYTHONPATH:+:$PYTHONPATH}"
+    )
+
+
+def wheel_volume(config_map_name: str) -> dict:
+    """
+
+    return pod volume of wheel ConfigMap
+    Args:
+        config_map_name (str): ConfigMap name
+    Returns:
+        dict: volume
+    """
+    return {"name": WHEEL_VOLUME_NAME, "configMap": {"name": config_map_name}}
+
+
+def wheel_volume_mount() -> dict:
+    """
+
+    return container volume mount of wheel
+    Returns:
+        dict: volume mount
+    """
+    return {"name": WHEEL_VOLUME_NAME, "mountPath": WHEEL_MOUNT_PATH, "readOnly": True}
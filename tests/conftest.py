@@ -3,6 +3,7 @@
 conftest
 """
 import datetime
+import json
 
 from dateutil.tz import tzutc
 import pytest
@@ -48,3 +49,33 @@ def daemonset():
               'labels': {'app': 'debbuger'},
         }
  }
+
+
+@pytest.fixture()
+def metadata_pages():
+    """
+
+    build fake PartialObjectMetadataList responses, one per page of names
+    """
+
+    class FakeResponse:
+        def __init__(self, data: bytes):
+            self.data = data
+
+    def _build(*pages, resource_version="1"):
+        _responses = []
+        for _index, _names in enumerate(pages):
+            _page = {
+                "kind": "PartialObjectMetadataList",
+                "metadata": {},
+                "items": [
+                    {"metadata": {"name": _name, "resourceVersion": resource_version}}
+                    for _name in _names
+                ],
+            }
+            if _index < len(pages) - 1:
+                _page["metadata"]["continue"] = f"page-{_index + 1}"
+            _responses.append(FakeResponse(json.dumps(_page).encode()))
+        return _responses
+
+    yield _build
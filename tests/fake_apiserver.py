@@ -0,0 +1,339 @@
+"""
+
+Fake kubernetes apiserver
+
+In memory apiserver serving the few endpoints used by the debugger, with
+pagination, label selectors, metadata only lists, strategic merge patch of
+containers, JSON patch, gzip responses, watches (one ADDED event per
+listed object), and optional injected latency and 429 throttling. Field
+selectors only support metadata.name and metadata.namespace equality.
+"""
+import copy
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from kubernetes import client
+
+from remote_pod_debugger.kinds import KINDS as KIND_REGISTRY
+
+PATH_RE = re.compile(
+    r"^/(?:api/v1|apis/(?:apps|batch)/v1)"
+    r"(?:/namespaces/(?P<namespace>[^/]+))?"
+    r"/(?P<plural>[a-z]+)"
+    r"(?:/(?P<name>[^/]+))?"
+    r"(?:/(?P<subresource>[a-z]+))?$"
+)
+KINDS = {
+    "namespaces": "Namespace",
+    "deployments": "Deployment",
+    "daemonsets": "DaemonSet",
+    "statefulsets": "StatefulSet",
+    "jobs": "Job",
+    "cronjobs": "CronJob",
+    "pods": "Pod",
+    "configmaps": "ConfigMap",
+}
+
+
+def workload(kind: str, name: str, namespace: str, containers: int = 1) -> dict:
+    """
+
+    build a deployment or daemonset json
+    """
+    return {
+        "apiVersion": "apps/v1",
+        "kind": kind,
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "labels": {"app": name},
+            "generation": 1,
+        },
+        "spec": {
+            "selector": {"matchLabels": {"app": name}},
+            "template": {
+                "metadata": {"labels": {"app": name}},
+                "spec": {
+                    "containers": [
+                        {
+                            "name": f"container-{_index}",
+                            "image": f"{name}:1",
+                            "args": ["-m", f"{name.replace('-', '_')}.main"],
+                        }
+                        for _index in range(containers)
+                    ]
+                },
+            },
+        },
+    }
+
+
+def pod(name: str, namespace: str, app: str, phase: str = "Running") -> dict:
+    """
+
+    build a pod json
+    """
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {"name": name, "namespace": namespace, "labels": {"app": app}},
+        "spec": {"containers": [{"name": "container-0", "image": f"{app}:1"}]},
+        "status": {"phase": phase},
+    }
+
+
+class FakeApiServer:
+    """
+
+    Fake apiserver running in a background thread
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.objects: Dict[Tuple[str, Optional[str], str], dict] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = 0
+        self.compressed = 0
+        self.throttle = 0
+        self.retry_after = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeApiServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def host(self) -> str:
+        """
+
+        server url
+        """
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def configuration(self) -> client.Configuration:
+        """
+
+        kubernetes configuration targeting fake server
+        """
+        _configuration = client.Configuration()
+        _configuration.host = self.host
+        return _configuration
+
+    def add(self, plural: str, _object: dict):
+        """
+
+        store object
+        """
+        with self._lock:
+            self._version += 1
+            _object["metadata"]["resourceVersion"] = str(self._version)
+            self.objects[
+                (plural, _object["metadata"].get("namespace"), _object["metadata"]["name"])
+            ] = _object
+
+    def populate(self, namespaces: int = 1, workloads: int = 1, containers: int = 1):
+        """
+
+        store namespaces ns-<i>, each with deployments and daemonsets app-<j>
+        of containers container-<k>
+        """
+        for _index in range(namespaces):
+            _namespace = f"ns-{_index}"
+            self.add("namespaces", {"metadata": {"name": _namespace}})
+            for _workload in range(workloads):
+                for _plural, _kind in (("deployments", "Deployment"), ("daemonsets", "DaemonSet")):
+                    self.add(
+                        _plural, workload(_kind, f"app-{_workload}", _namespace, containers)
+                    )
+
+    def _list(self, plural: str, namespace: Optional[str], query: dict) -> dict:
+        _selector = dict(
+            _item.split("=", 1)
+            for _item in query.get("labelSelector", [""])[0].split(",")
+            if _item
+        )
+        _fields = dict(
+            _item.split("=", 1)
+            for _item in query.get("fieldSelector", [""])[0].split(",")
+            if _item
+        )
+        _items = [
+            _object
+            for (_plural, _namespace, _), _object in sorted(self.objects.items())
+            if _plural == plural
+            and (namespace is None or _namespace == namespace)
+            and all(
+                _object["metadata"].get("labels", {}).get(_key) == _value
+                for _key, _value in _selector.items()
+            )
+            and all(
+                _object["metadata"].get(_key.split(".", 1)[1]) == _value
+                for _key, _value in _fields.items()
+            )
+        ]
+        _start = int(query.get("continue", ["0"])[0])
+        _limit = int(query.get("limit", [len(_items) or 1])[0])
+        # like the apiserver, list items have no kind nor apiVersion
+        _page = [
+            {_key: _value for _key, _value in _item.items() if _key not in ("kind", "apiVersion")}
+            for _item in _items[_start : _start + _limit]
+        ]
+        _metadata = {"resourceVersion": str(self._version)}
+        if _start + _limit < len(_items):
+            _metadata["continue"] = str(_start + _limit)
+        return {"kind": f"{KINDS[plural]}List", "metadata": _metadata, "items": _page}
+
+    @staticmethod
+    def _json_patch(_object: dict, body: List[dict]) -> bool:
+        for _operation in body:
+            *_parents, _key = _operation["path"].lstrip("/").split("/")
+            _target = _object
+            for _part in _parents:
+                _target = _target[int(_part)] if isinstance(_target, list) else _target[_part]
+            if isinstance(_target, list):
+                _key = int(_key)
+            if _operation["op"] == "test":
+                if _target[_key] != _operation["value"]:
+                    return False
+            elif _operation["op"] == "remove":
+                del _target[_key]
+            else:
+                _target[_key] = _operation["value"]
+        return True
+
+    def _patch(self, plural: str, _object: dict, body: dict, subresource: Optional[str]):
+        if subresource == "ephemeralcontainers":
+            _object["spec"].setdefault("ephemeralContainers", []).extend(
+                body["spec"]["ephemeralContainers"]
+            )
+            return
+        _kind = next(_kind for _kind in KIND_REGISTRY.values() if _kind.plural == plural)
+        _spec = body
+        for _key in _kind.pod_spec_path:
+            _spec = _spec.get(_key, {})
+        _pod_spec = _kind.pod_spec(_object)
+        for _container in _spec.get("containers", []):
+            for _existing in _pod_spec["containers"]:
+                if _existing["name"] == _container["name"]:
+                    _existing.update(_container)
+        if "volumes" in _spec:
+            _pod_spec["volumes"] = _spec["volumes"]
+
+    def handle(self, method: str, url: str, headers: dict, body: Optional[dict]):
+        """
+
+        handle one request
+        Returns:
+            Tuple[int, dict]: status and json response
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        _url = urlparse(url)
+        self.requests.append((method, _url.path))
+        with self._lock:
+            if self.throttle:
+                self.throttle -= 1
+                return 429, {"kind": "Status", "code": 429, "reason": "TooManyRequests"}
+        _match = PATH_RE.match(_url.path)
+        if not _match:
+            return 404, {"kind": "Status", "code": 404}
+        _plural, _namespace, _name, _subresource = _match.group(
+            "plural", "namespace", "name", "subresource"
+        )
+        _query = parse_qs(_url.query)
+        with self._lock:
+            if method == "POST":
+                _key = (_plural, _namespace, body["metadata"]["name"])
+                if _key in self.objects:
+                    return 409, {"kind": "Status", "code": 409, "reason": "AlreadyExists"}
+                body["metadata"]["namespace"] = _namespace
+                self.objects[_key] = body
+                return 201, body
+            if _name is None and _query.get("watch") == ["true"]:
+                return 200, [
+                    {"type": "ADDED", "object": _item}
+                    for _item in self._list(_plural, _namespace, {})["items"]
+                ]
+            if _name is None:
+                _list = self._list(_plural, _namespace, _query)
+                if "as=PartialObjectMetadataList" in headers.get("Accept", ""):
+                    _list["kind"] = "PartialObjectMetadataList"
+                    _list["items"] = [
+                        {"metadata": _item["metadata"]} for _item in _list["items"]
+                    ]
+                return 200, _list
+            _object = self.objects.get((_plural, _namespace, _name))
+            if _object is None:
+                return 404, {"kind": "Status", "code": 404, "reason": "NotFound"}
+            if method == "PATCH":
+                if isinstance(body, list):
+                    _patched = copy.deepcopy(_object)
+                    if not self._json_patch(_patched, body):
+                        return 422, {"kind": "Status", "code": 422, "reason": "Invalid"}
+                    _object.clear()
+                    _object.update(_patched)
+                else:
+                    self._patch(_plural, _object, body, _subresource)
+                self._version += 1
+                _object["metadata"]["resourceVersion"] = str(self._version)
+                if _subresource is None and "generation" in _object["metadata"]:
+                    _object["metadata"]["generation"] += 1
+            return 200, copy.deepcopy(_object)
+
+    def _handler(self):
+        _server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+
+            request handler
+            """
+
+            def _respond(self):
+                _length = int(self.headers.get("Content-Length") or 0)
+                _body = json.loads(self.rfile.read(_length)) if _length else None
+                _status, _data = _server.handle(
+                    self.command, self.path, dict(self.headers), _body
+                )
+                if isinstance(_data, list):
+                    _payload = "".join(json.dumps(_event) + "\n" for _event in _data).encode()
+                else:
+                    _payload = json.dumps(_data).encode()
+                _gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+                if _gzip:
+                    _payload = gzip.compress(_payload)
+                    _server.compressed += 1
+                self.send_response(_status)
+                self.send_header("Content-Type", "application/json")
+                if _gzip:
+                    self.send_header("Content-Encoding", "gzip")
+                if _status == 429:
+                    self.send_header("Retry-After", str(_server.retry_after))
+                self.send_header("Content-Length", str(len(_payload)))
+                self.end_headers()
+                self.wfile.write(_payload)
+
+            def setup(self):
+                super().setup()
+                _server.connections += 1
+
+            protocol_version = "HTTP/1.1"
+            do_GET = do_POST = do_PATCH = _respond
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
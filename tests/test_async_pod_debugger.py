@@ -0,0 +1,94 @@
+"""
+
+test AsyncPodDebugger
+"""
+from unittest.mock import patch, MagicMock
+
+from remote_pod_debugger.async_pod_debugger import AsyncPodDebugger
+from remote_pod_debugger.name_cache import NameCache
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+@patch("builtins.input", lambda *args: "test1")
+def test_async_pod_debugger_prefetch_lists(call_api, load_kube_config, metadata_pages):
+    """
+
+    test lists are fetched in background and reused by select
+    """
+    _pages = {
+        "/apis/apps/v1/namespaces/waa/deployments": metadata_pages(["test1", "test2"]),
+        "/apis/apps/v1/namespaces/waa/daemonsets": metadata_pages(["test1"]),
+    }
+    call_api.side_effect = lambda path, *args, **kwargs: _pages[path].pop(0)
+    _pod_debugger = AsyncPodDebugger()
+    try:
+        _pod_debugger.prefetch("waa")
+        assert _pod_debugger.select_deployment("waa") == "test1"
+        assert _pod_debugger.select_daemonset("waa") == "test1"
+    finally:
+        _pod_debugger.close()
+    assert call_api.call_count == 2
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
+def test_async_pod_debugger_prefetch_object(
+    read_namespaced_deployment, load_kube_config
+):
+    """
+
+    test object is read once in background and then served from cache
+    """
+    _deployment = MagicMock()
+    read_namespaced_deployment.return_value = _deployment
+    _pod_debugger = AsyncPodDebugger()
+    try:
+        _pod_debugger.prefetch("waa", "deployment", "test")
+        assert _pod_debugger.read_object("test", "waa") is _deployment
+        assert _pod_debugger.read_object("test", "waa") is _deployment
+    finally:
+        _pod_debugger.close()
+    assert read_namespaced_deployment.call_count == 1
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+@patch("remote_pod_debugger.pod_debugger.PodDebugger._refresh_names")
+@patch("builtins.input", lambda *args: "test1")
+def test_async_pod_debugger_prefetch_name_cache(
+    _refresh_names, call_api, load_kube_config, tmp_path
+):
+    """
+
+    test lists served by the name cache are not prefetched
+    """
+    _name_cache = NameCache("ctx", str(tmp_path / "names.json"))
+    for _type in ["deployment", "daemonset"]:
+        _name_cache.put(NameCache.key(_type, "waa"), ["test1"], "1")
+    _pod_debugger = AsyncPodDebugger(name_cache=_name_cache)
+    try:
+        _pod_debugger.prefetch("waa")
+        assert _pod_debugger.select_deployment("waa") == "test1"
+    finally:
+        _pod_debugger.close()
+    assert call_api.call_count == 0
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+@patch("builtins.input", lambda *args: "deployment")
+def test_async_pod_debugger_prefetch_dropped(call_api, load_kube_config, metadata_pages):
+    """
+
+    test lists of other object types are dropped once object type is selected
+    """
+    call_api.side_effect = lambda path, *args, **kwargs: metadata_pages(["test1"])[0]
+    _pod_debugger = AsyncPodDebugger()
+    try:
+        _pod_debugger.prefetch("waa")
+        assert _pod_debugger.select_object_type() == "deployment"
+        assert list(_pod_debugger._pending) == [("list", "deployment", "waa")]
+        assert _pod_debugger.iter_names("deployment", "waa") == ["test1"]
+    finally:
+        _pod_debugger.close()
@@ -0,0 +1,213 @@
+"""
+
+test backends
+"""
+import json
+import socket
+from unittest.mock import MagicMock
+
+from kubernetes import client
+from kubernetes.client.exceptions import ApiException
+import pytest
+
+from remote_pod_debugger.backends import (
+    Backend,
+    ClientBackend,
+    ConnectionOptions,
+    RawBackend,
+    Workload,
+    collection_path,
+    format_label_selector,
+)
+
+from fake_apiserver import FakeApiServer
+
+
+@pytest.mark.parametrize("object_type, namespace, expected", [
+    ("namespace", None, "/api/v1/namespaces"),
+    ("deployment", "waa", "/apis/apps/v1/namespaces/waa/deployments"),
+    ("daemonset", None, "/apis/apps/v1/daemonsets"),
+])
+def test_collection_path(object_type, namespace, expected):
+    """
+
+    test collection_path
+    """
+    assert collection_path(object_type, namespace) == expected
+
+
+@pytest.mark.parametrize("selector, expected", [
+    ({"matchLabels": {"app": "api", "tier": "web"}}, "app=api,tier=web"),
+    (
+        {
+            "matchLabels": {"app": "api"},
+            "matchExpressions": [
+                {"key": "tier", "operator": "In", "values": ["web", "worker"]},
+                {"key": "env", "operator": "NotIn", "values": ["dev"]},
+                {"key": "team", "operator": "Exists"},
+                {"key": "canary", "operator": "DoesNotExist"},
+            ],
+        },
+        "app=api,tier in (web,worker),env notin (dev),team,!canary",
+    ),
+    ({}, ""),
+])
+def test_format_label_selector(selector, expected):
+    """
+
+    test format_label_selector translates matchLabels and matchExpressions
+    """
+    assert format_label_selector(selector) == expected
+
+
+def test_backend_abstract():
+    """
+
+    test Backend is an interface, only its implementations are built
+    """
+    with pytest.raises(TypeError):
+        Backend()  # pylint: disable=abstract-class-instantiated
+
+
+def _deployment_json(name="test"):
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": name, "namespace": "waa", "resourceVersion": "3"},
+        "spec": {
+            "selector": {"matchLabels": {"app": name}},
+            "template": {
+                "spec": {
+                    "containers": [
+                        {"name": "app", "image": "app:1", "args": ["--test"]},
+                    ]
+                }
+            },
+        },
+    }
+
+
+def test_workload_from_dict():
+    """
+
+    test only used fields are parsed, raw json is kept
+    """
+    _data = _deployment_json()
+    _workload = Workload.from_dict(_data)
+    assert _workload.metadata.name == "test"
+    assert _workload.metadata.resource_version == "3"
+    assert _workload.spec.template.spec.containers[0].args == ["--test"]
+    assert _workload.spec.selector == {"matchLabels": {"app": "test"}}
+    assert _workload.raw is _data
+
+
+def _raw_backend(status=200, data=None):
+    _backend = RawBackend()
+    _configuration = client.Configuration()
+    _configuration.host = "https://k8s"
+    _configuration.api_key = {"authorization": "token"}
+    _configuration.api_key_prefix = {"authorization": "Bearer"}
+    _backend._configuration = _configuration
+    _backend._pool = MagicMock()
+    _response = _backend._pool.request.return_value
+    _response.status = status
+    _response.data = json.dumps(data).encode()
+    return _backend
+
+
+def test_raw_backend_read():
+    """
+
+    test read sends raw request with token
+    """
+    _backend = _raw_backend(data=_deployment_json())
+    _workload = _backend.read("deployment", "test", "waa")
+    assert _workload.spec.template.spec.containers[0].name == "app"
+    _args, _kwargs = _backend._pool.request.call_args
+    assert _args == ("GET", "https://k8s/apis/apps/v1/namespaces/waa/deployments/test")
+    assert _kwargs["headers"]["Authorization"] == "Bearer token"
+
+
+def test_raw_backend_patch():
+    """
+
+    test patch content type depends on body
+    """
+    _backend = _raw_backend(data=_deployment_json())
+    _backend.patch("deployment", "test", "waa", {"spec": {}})
+    _headers = _backend._pool.request.call_args[1]["headers"]
+    assert _headers["Content-Type"] == "application/strategic-merge-patch+json"
+    _backend.patch("deployment", "test", "waa", [{"op": "test", "path": "/a", "value": 1}])
+    _headers = _backend._pool.request.call_args[1]["headers"]
+    assert _headers["Content-Type"] == "application/json-patch+json"
+
+
+def test_raw_backend_find():
+    """
+
+    test find with label selector across namespaces
+    """
+    _backend = _raw_backend(data={"items": [_deployment_json("a"), _deployment_json("b")]})
+    _items = _backend.find("deployment", label_selector="app=a")
+    assert [_item.metadata.name for _item in _items] == ["a", "b"]
+    assert (
+        _backend._pool.request.call_args[0][1]
+        == "https://k8s/apis/apps/v1/deployments?labelSelector=app%3Da"
+    )
+
+
+def test_raw_backend_error():
+    """
+
+    test error status raise ApiException
+    """
+    _backend = _raw_backend(status=404, data={"kind": "Status", "code": 404})
+    with pytest.raises(ApiException) as error:
+        _backend.read("deployment", "test", "waa")
+    assert error.value.status == 404
+
+
+@pytest.mark.parametrize("backend", [ClientBackend, RawBackend])
+@pytest.mark.parametrize("gzip", [True, False])
+def test_backend_connection(backend, gzip):
+    """
+
+    test calls share one kept alive connection, with compressed responses
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=1, workloads=3)
+        _backend = backend(
+            configuration=_fake.configuration(),
+            connection=ConnectionOptions(pool_maxsize=16, gzip=gzip),
+        )
+        assert len(_backend.find("deployment", "ns-0")) == 3
+        assert _backend.sanitize(_backend.read("deployment", "app-0", "ns-0"))
+        _backend.patch("deployment", "app-1", "ns-0", {"metadata": {"labels": {"a": "b"}}})
+        _pool_kw = _backend._pool_manager().connection_pool_kw
+        assert _pool_kw["maxsize"] == 16
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in _pool_kw["socket_options"]
+        assert _fake.connections == 1
+        assert _fake.compressed == (3 if gzip else 0)
+
+
+@pytest.mark.parametrize("backend", [ClientBackend, RawBackend])
+def test_backend_stream_gzip(backend):
+    """
+
+    test watches are not compressed when other calls are
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=1, workloads=2)
+        _backend = backend(
+            configuration=_fake.configuration(), connection=ConnectionOptions(gzip=True)
+        )
+        _lines = list(
+            _backend.stream("/apis/apps/v1/namespaces/ns-0/deployments", [("watch", "true")], {})
+        )
+        assert [json.loads(_line)["object"]["metadata"]["name"] for _line in _lines] == [
+            "app-0",
+            "app-1",
+        ]
+        assert _fake.compressed == 0
+        assert _backend.get("/apis/apps/v1/namespaces/ns-0/deployments", [], {})
+        assert _fake.compressed == 1
@@ -0,0 +1,71 @@
+"""
+
+test backup store
+"""
+import copy
+import os
+
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.backup_store import BackupStore
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer, workload
+
+
+def _object(resource_version: str, image: str = "api:1") -> dict:
+    _object = workload("Deployment", "api", "waa")
+    _object["metadata"]["resourceVersion"] = resource_version
+    _object["metadata"]["managedFields"] = [{"manager": "kubectl"}]
+    _object["spec"]["template"]["spec"]["containers"][0]["image"] = image
+    _object["status"] = {"observedGeneration": int(resource_version)}
+    return _object
+
+
+def test_backup_store_dedup(tmp_path):
+    """
+
+    test identical snapshots are stored once, and indexed by resourceVersion
+    """
+    _store = BackupStore("test", str(tmp_path))
+    _first = _store.put("waa", "deployment", _object("1"))
+    assert _store.put("waa", "deployment", _object("2")) == _first
+    _second = _store.put("waa", "deployment", _object("3", "api:2"))
+    assert _second != _first
+    _files = [
+        _name for _, _, _names in os.walk(tmp_path / "objects") for _name in _names
+    ]
+    assert len(_files) == 2
+    assert [_entry["resourceVersion"] for _entry in _store.entries()] == ["1", "2", "3"]
+    assert _store.latest("waa", "deployment", "api")["hash"] == _second
+    assert _store.latest("waa", "deployment", "other") is None
+    assert BackupStore("other", str(tmp_path)).latest("waa", "deployment", "api") is None
+
+
+def test_backup_store_get(tmp_path):
+    """
+
+    test stored snapshot has no volatile fields
+    """
+    _store = BackupStore("test", str(tmp_path))
+    _original = _object("1")
+    _snapshot = _store.get(_store.put("waa", "deployment", copy.deepcopy(_original)))
+    assert "status" not in _snapshot
+    assert "resourceVersion" not in _snapshot["metadata"]
+    assert "managedFields" not in _snapshot["metadata"]
+    assert _snapshot["spec"] == _original["spec"]
+
+
+def test_pod_debugger_store_backup(tmp_path):
+    """
+
+    test backed up object is not kept in the object cache
+    """
+    _store = BackupStore("test", str(tmp_path))
+    with FakeApiServer() as _fake:
+        _fake.add("deployments", workload("Deployment", "api", "waa"))
+        _pod_debugger = PodDebugger(
+            backend=RawBackend(configuration=_fake.configuration()), backup_store=_store
+        )
+        _hash = _pod_debugger.store_backup("api", "waa")
+        assert _store.latest("waa", "deployment", "api")["hash"] == _hash
+        assert _pod_debugger._cache.get(("deployment", "waa", "api")) is None
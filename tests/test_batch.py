@@ -0,0 +1,150 @@
+"""
+
+test batch patch
+"""
+import io
+from unittest.mock import MagicMock
+
+from kubernetes.client.exceptions import ApiException
+import pytest
+
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.batch import (
+    BatchPatcher,
+    Target,
+    read_plan,
+    retry_delay,
+    write_plan,
+)
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer
+
+
+@pytest.mark.parametrize("value, namespace, expected", [
+    ("ns/deployment/api", None, Target("ns", "deployment", "api")),
+    ("daemonset/agent", "default", Target("default", "daemonset", "agent")),
+])
+def test_target_parse(value, namespace, expected):
+    """
+
+    test Target.parse
+    """
+    assert Target.parse(value, namespace) == expected
+
+
+@pytest.mark.parametrize(
+    "value", ["deployment/api", "ns/replicaset/api", "a/b/c/d", "ns/job/migrate", "ns/pod/api-0"]
+)
+def test_target_parse_invalid(value):
+    """
+
+    test Target.parse with invalid values, immutable kinds included
+    """
+    with pytest.raises(ValueError):
+        Target.parse(value)
+
+
+def test_target_parse_ephemeral():
+    """
+
+    test Target.parse accepts immutable kinds for ephemeral containers
+    """
+    assert Target.parse("ns/pod/api-0", ephemeral=True) == Target("ns", "pod", "api-0")
+
+
+def test_retry_delay():
+    """
+
+    test retry_delay honor Retry-After
+    """
+    _error = ApiException(status=429)
+    _error.headers = {"Retry-After": "3"}
+    assert retry_delay(_error, 1, 0.5) == 3.0
+    assert retry_delay(ApiException(status=409), 3, 0.5) == 2.0
+
+
+def test_batch_patcher_patch():
+    """
+
+    test batch patch retry on conflict and report failures
+    """
+    _pod_debugger = MagicMock()
+    _targets = [Target("a", "deployment", "api"), Target("b", "daemonset", "agent")]
+
+    def _patch(name, namespace, **kwargs):
+        if name == "agent":
+            raise ApiException(status=403, reason="Forbidden")
+        if _pod_debugger.patch.call_count == 1:
+            raise ApiException(status=409, reason="Conflict")
+
+    _pod_debugger.patch.side_effect = _patch
+    _patcher = BatchPatcher(_pod_debugger, max_workers=1, backoff=0)
+    _results = _patcher.patch(
+        _targets, host="127.0.0.1", port=5999, entrypoint="main.py", container_name="app"
+    )
+    assert [_result.success for _result in _results] == [True, False]
+    assert _results[0].attempts == 2
+    assert _results[1].error == "403 Forbidden"
+    _pod_debugger.invalidate.assert_called_once_with("api", "a", "deployment")
+
+
+def test_batch_patcher_resolve():
+    """
+
+    test targets resolved from label selector
+    """
+    _pod_debugger = MagicMock()
+    _pod_debugger.find_objects.side_effect = lambda _type, *args: (
+        [("a", "api")] if _type == "deployment" else []
+    )
+    _patcher = BatchPatcher(_pod_debugger)
+    assert _patcher.resolve(None, "app=api") == [Target("a", "deployment", "api")]
+    assert {_call.args[0] for _call in _pod_debugger.find_objects.call_args_list} == {
+        "deployment", "daemonset", "statefulset", "cronjob"
+    }
+
+
+def test_batch_plan_apply():
+    """
+
+    test plan only reads objects, and apply sends planned patches
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=1, workloads=3)
+        _targets = [Target("ns-0", "deployment", f"app-{_index}") for _index in range(3)]
+        _targets.append(Target("ns-0", "deployment", "missing"))
+        _patch_args = {"host": "127.0.0.1", "port": 5999, "entrypoint": "main.py"}
+        _configuration = _fake.configuration()
+        _plan = io.StringIO()
+        write_plan(
+            BatchPatcher(PodDebugger(backend=RawBackend(configuration=_configuration))).plan(
+                _targets, **_patch_args
+            ),
+            _plan,
+        )
+        assert {_method for _method, _ in _fake.requests} == {"GET"}
+        _plan.seek(0)
+        _steps = read_plan(_plan)
+        assert _steps[0].container == "container-0"
+        assert _steps[0].body["spec"]["template"]["spec"]["containers"][0]["command"] == ["sh"]
+        assert _steps[3].error == "404 Not Found"
+        _fake.objects[("deployments", "ns-0", "app-2")]["metadata"]["generation"] += 1
+        _patcher = BatchPatcher(PodDebugger(backend=RawBackend(configuration=_configuration)))
+        _results = _patcher.apply(_steps)
+        assert [_result.success for _result in _results] == [True, True, False, False]
+        assert "changed since plan" in _results[2].error
+        _containers = [
+            _fake.objects[("deployments", "ns-0", f"app-{_index}")]["spec"]["template"]["spec"][
+                "containers"
+            ][0]
+            for _index in range(3)
+        ]
+        assert [_container.get("command") for _container in _containers] == [
+            ["sh"],
+            ["sh"],
+            None,
+        ]
+        _replan = _patcher.plan(_targets[:2], **_patch_args)
+        assert [_step.body for _step in _replan] == [None, None]
+        assert all(_result.attempts == 0 for _result in _patcher.apply(_replan))
@@ -52,3 +52,60 @@ def test_complete(data, expected_result, options):
     with patch("remote_pod_debugger.completer.readline.get_line_buffer", return_value=data):
         resp = _completer.complete(data, 0)
         assert resp == expected_result
+
+
+def test_complete_all_options():
+    """
+
+    test every option is returned when nothing typed
+    """
+    _completer = Completer(["b", "a", ""])
+    with patch("remote_pod_debugger.completer.readline.get_line_buffer", return_value=""):
+        assert [_completer.complete("", _state) for _state in range(3)] == ["a", "b", None]
+
+
+@pytest.mark.parametrize("data, expected_result", [
+    ("pmt", ["payment", "payment-gateway"]),
+    ("gtw", ["payment-gateway"]),
+    ("te", ["test1a"]),
+    ("zz", []),
+])
+def test_complete_fuzzy(data, expected_result):
+    """
+
+    test fuzzy matching used when no option starts with input
+    """
+    _completer = Completer(["payment-gateway", "payment", "test1a"], fuzzy=True)
+    with patch("remote_pod_debugger.completer.readline.get_line_buffer", return_value=data):
+        _results = []
+        _state = 0
+        while True:
+            _result = _completer.complete(data, _state)
+            if _result is None:
+                break
+            _results.append(_result)
+            _state += 1
+        assert _results == expected_result
+
+
+@pytest.mark.parametrize("line, begin, expected_result", [
+    ("pay-gtw", 4, ["gateway"]),
+    ("waa/apgw", 4, ["api-gateway"]),
+    ("waa/pmt", 4, []),
+])
+def test_complete_fuzzy_word(line, begin, expected_result):
+    """
+
+    test fuzzy matches keep the line before the completed word
+    """
+    _completer = Completer(["pay-gateway", "waa/api-gateway", "wab/payment"], fuzzy=True)
+    with patch(
+        "remote_pod_debugger.completer.readline.get_line_buffer", return_value=line
+    ), patch("remote_pod_debugger.completer.readline.get_begidx", return_value=begin):
+        _results = []
+        while True:
+            _result = _completer.complete(line[begin:], len(_results))
+            if _result is None:
+                break
+            _results.append(_result)
+        assert _results == expected_result
@@ -0,0 +1,148 @@
+"""
+
+test container index
+"""
+from unittest.mock import patch
+
+import pytest
+
+from remote_pod_debugger.backends import ClientBackend, RawBackend
+from remote_pod_debugger.batch import BatchPatcher
+from remote_pod_debugger.container_index import (
+    ContainerIndex,
+    ContainerRef,
+    image_repository,
+)
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer
+
+
+@pytest.mark.parametrize("image, expected", [
+    ("app:1", "app"),
+    ("registry:5000/team/app:1.2", "registry:5000/team/app"),
+    ("registry:5000/team/app", "registry:5000/team/app"),
+    ("app@sha256:abc", "app"),
+    ("app", "app"),
+])
+def test_image_repository(image, expected):
+    """
+
+    test image_repository
+    """
+    assert image_repository(image) == expected
+
+
+def test_container_index():
+    """
+
+    test lookups by object, image and command/args word
+    """
+    _api = ContainerRef("a", "deployment", "api", "app", "api:2", (), ("-m", "api.main"))
+    _worker = ContainerRef(
+        "a", "daemonset", "worker", "app", "api:3", ("sh",), ("-c", "python -m api.worker")
+    )
+    _index = ContainerIndex([_api, _worker])
+    assert len(_index) == 2
+    assert _index.containers("api", "a", "deployment") == [_api]
+    assert _index.by_image("api:2") == [_api]
+    assert _index.by_image("api") == [_api, _worker]
+    assert _index.by_token("api.worker") == [_worker]
+    assert _index.by_token("-m") == [_api, _worker]
+    assert _index.by_token("missing") == []
+    assert _index.search(image="api", token="api.worker") == [_worker]
+    assert _index.search(token="api.main") == [_api]
+    assert _index.search() == [_api, _worker]
+
+
+@pytest.mark.parametrize("backend", [ClientBackend, RawBackend])
+def test_pod_debugger_container_index(backend):
+    """
+
+    test index is built with one list call per patchable object type, and listed
+    objects are served from cache
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=2, workloads=3, containers=2)
+        _pod_debugger = PodDebugger(backend=backend(configuration=_fake.configuration()))
+        _index = _pod_debugger.container_index("ns-1")
+        assert len(_fake.requests) == 4
+        assert len(_index) == 2 * 3 * 2
+        assert {(_ref.object_type, _ref.name) for _ref in _index.by_image("app-2:1")} == {
+            ("deployment", "app-2"),
+            ("daemonset", "app-2"),
+        }
+        assert [_ref.container for _ref in _index.by_token("app_1.main")][:2] == [
+            "container-0",
+            "container-1",
+        ]
+        assert _pod_debugger.get_container_args(
+            "app-1", "ns-1", "deployment", "container-1"
+        ) == ["-m", "app_1.main"]
+        assert len(_fake.requests) == 4
+        _object = _pod_debugger._backend.sanitize(
+            _pod_debugger.read_object("app-1", "ns-1", "daemonset")
+        )
+        assert (_object["apiVersion"], _object["kind"]) == ("apps/v1", "DaemonSet")
+
+
+def test_container_ref_matches():
+    """
+
+    test ContainerRef.matches
+    """
+    _container = ContainerRef(
+        "a", "deployment", "api", "app", "reg/api:2", ("sh",), ("-c", "python -m api.main")
+    )
+    assert _container.matches()
+    assert _container.matches(image="reg/api")
+    assert _container.matches(image="reg/api:2", token="api.main")
+    assert not _container.matches(image="reg/api:3")
+    assert not _container.matches(token="api")
+
+
+@pytest.mark.parametrize("backend", [ClientBackend, RawBackend])
+def test_search_and_patch(backend, monkeypatch):
+    """
+
+    test matches of a paginated cluster wide search, then of a namespace,
+    are patched without reading them again
+    """
+    monkeypatch.setattr("remote_pod_debugger.listing.LIST_PAGE_SIZE", 2)
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=2, workloads=3)
+        _pod_debugger = PodDebugger(backend=backend(configuration=_fake.configuration()))
+        _matches = list(_pod_debugger.search(image="app-1", token="app_1.main"))
+        assert [(_ref.namespace, _ref.object_type, _ref.name) for _ref in _matches] == [
+            ("ns-0", "deployment", "app-1"),
+            ("ns-1", "deployment", "app-1"),
+            ("ns-0", "daemonset", "app-1"),
+            ("ns-1", "daemonset", "app-1"),
+        ]
+        assert _fake.requests.count(("GET", "/apis/apps/v1/deployments")) == 3
+        _requests = len(_fake.requests)
+        with patch("remote_pod_debugger.batch.info"):
+            _results = BatchPatcher(_pod_debugger).patch_matches(
+                _matches, host="127.0.0.1", port=5999, entrypoint="-m app_1.main"
+            )
+        assert all(_result.success for _result in _results)
+        # matches come from the cluster wide list, they are patched without GET
+        assert [_method for _method, _ in _fake.requests[_requests:]] == ["PATCH"] * 4
+        with patch("remote_pod_debugger.batch.info"):
+            _results = BatchPatcher(_pod_debugger).patch_matches(
+                _pod_debugger.search(image="app-1", namespace="ns-1"),
+                host="127.0.0.1",
+                port=5999,
+                entrypoint="-m app_1.main",
+            )
+        assert [str(_result.target) for _result in _results] == [
+            "ns-1/deployment/app-1",
+            "ns-1/daemonset/app-1",
+        ]
+        # the namespace is searched with the container index, matches are not read again
+        for _plural in ("deployments", "daemonsets"):
+            assert ("GET", f"/apis/apps/v1/namespaces/ns-1/{_plural}/app-1") not in _fake.requests
+        assert all(_result.success for _result in _results)
+        assert _fake.objects[("daemonsets", "ns-1", "app-1")]["spec"]["template"]["spec"][
+            "containers"
+        ][0]["command"] == ["sh"]
@@ -0,0 +1,76 @@
+"""
+
+test multi-context fan-out
+"""
+import argparse
+from unittest.mock import patch
+
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.contexts import match_contexts, run_contexts
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer
+
+
+def test_match_contexts():
+    """
+
+    test contexts are matched by name, glob and comma separated list
+    """
+    _contexts = ["prod-eu", "prod-us", "staging", "dev"]
+    assert match_contexts(["prod-*"], _contexts) == ["prod-eu", "prod-us"]
+    assert match_contexts(["dev,staging"], _contexts) == ["staging", "dev"]
+    assert match_contexts(["dev", "prod-u?"], _contexts) == ["prod-us", "dev"]
+    assert match_contexts(["qa-*"], _contexts) == []
+
+
+def _args(**kwargs) -> argparse.Namespace:
+    _defaults = {
+        "namespace": "ns-0",
+        "host": "127.0.0.1",
+        "port": 5999,
+        "entrypoint": "main.py",
+        "container": None,
+        "image_name": None,
+        "pdb_command": [],
+        "backup": False,
+        "restore": False,
+        "target": [],
+        "selector": None,
+        "field_selector": None,
+        "deployment": None,
+        "daemonset": None,
+        "kind": None,
+        "name": None,
+        "workers": None,
+    }
+    _defaults.update(kwargs)
+    return argparse.Namespace(**_defaults)
+
+
+def test_run_contexts():
+    """
+
+    test the same target is patched in every context, results side by side
+    """
+    with FakeApiServer() as _eu, FakeApiServer() as _us:
+        _eu.populate(namespaces=1, workloads=2)
+        _us.populate(namespaces=1, workloads=1)
+        _pod_debuggers = {
+            _context: PodDebugger(backend=RawBackend(configuration=_fake.configuration()))
+            for _context, _fake in (("prod-eu", _eu), ("prod-us", _us))
+        }
+        with patch("remote_pod_debugger.contexts.info") as _info, patch(
+            "remote_pod_debugger.contexts.warning"
+        ) as _warning:
+            run_contexts(_pod_debuggers, _args(deployment="app-1"))
+        _lines = [_call[0][0] for _call in _info.call_args_list]
+        assert _lines[1].split() == ["TARGET", "prod-eu", "prod-us"]
+        _row = _lines[2].split()
+        assert _row[0] == "ns-0/deployment/app-1" and _row[2] == "FAILED"
+        assert _lines[-1] == "Patched 1/2 objects in 2 contexts"
+        assert "prod-us ns-0/deployment/app-1" in _warning.call_args[0][0]
+        _container = _eu.objects[("deployments", "ns-0", "app-1")]["spec"]["template"][
+            "spec"
+        ]["containers"][0]
+        assert _container["command"] == ["sh"]
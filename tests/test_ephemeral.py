@@ -0,0 +1,86 @@
+"""
+
+test ephemeral container mode
+"""
+import json
+from unittest.mock import MagicMock
+
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer, pod, workload
+
+
+def _server() -> FakeApiServer:
+    _server = FakeApiServer()
+    _server.add("deployments", workload("Deployment", "api", "waa"))
+    for _index in range(3):
+        _pod = pod(f"api-{_index}", "waa", "api")
+        _pod["spec"]["containers"][0]["env"] = [{"name": "MODE", "value": "prod"}]
+        _server.add("pods", _pod)
+    _server.add("pods", pod("api-pending", "waa", "api", phase="Pending"))
+    _server.add("pods", pod("other-0", "waa", "other"))
+    return _server
+
+
+def test_pod_debugger_running_pods():
+    """
+
+    test running pods of deployment are listed with its selector
+    """
+    with _server() as _fake:
+        _pod_debugger = PodDebugger(backend=RawBackend(configuration=_fake.configuration()))
+        assert list(_pod_debugger.running_pods("api", "waa", "deployment")) == [
+            "api-0",
+            "api-1",
+            "api-2",
+        ]
+
+
+def test_pod_debugger_running_pods_expressions():
+    """
+
+    test running pods are listed with selector matchExpressions
+    """
+    _backend = MagicMock()
+    _backend.sanitize.return_value = {
+        "spec": {
+            "selector": {"matchExpressions": [{"key": "app", "operator": "In", "values": ["api"]}]}
+        }
+    }
+    _backend.get.return_value = json.dumps({"items": []})
+    assert PodDebugger(backend=_backend).running_pods("api", "waa", "deployment") == {}
+    _path, _query, _ = _backend.get.call_args[0]
+    assert _path == "/api/v1/namespaces/waa/pods"
+    assert _query == [("labelSelector", "app in (api)")]
+
+
+def test_pod_debugger_debug_ephemeral():
+    """
+
+    test ephemeral container is attached to one pod only, without patching deployment
+    """
+    with _server() as _fake:
+        _pod_debugger = PodDebugger(backend=RawBackend(configuration=_fake.configuration()))
+        _, _container = _pod_debugger.debug_ephemeral(
+            "api-1", "waa", "127.0.0.1", 5999, "main.py", "container-0"
+        )
+        assert ("PATCH", "/api/v1/namespaces/waa/pods/api-1/ephemeralcontainers") in (
+            _fake.requests
+        )
+        assert not any(
+            _method == "PATCH" and "deployments" in _path
+            for _method, _path in _fake.requests
+        )
+        _ephemeral = _fake.objects[("pods", "waa", "api-1")]["spec"]["ephemeralContainers"]
+        assert _ephemeral == [_container]
+        assert _container["targetContainerName"] == "container-0"
+        assert _container["image"] == "api:1"
+        assert _container["env"] == [{"name": "MODE", "value": "prod"}]
+        assert "remote_pdb" in _container["args"][1]
+        for _name in ("api-0", "api-2"):
+            assert "ephemeralContainers" not in _fake.objects[("pods", "waa", _name)]["spec"]
+        _, _other = _pod_debugger.debug_ephemeral(
+            "api-1", "waa", "127.0.0.1", 5999, "main.py", "container-0"
+        )
+        assert _other["name"] != _container["name"]
@@ -0,0 +1,70 @@
+"""
+
+test API call instrumentation
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from remote_pod_debugger.backends import ClientBackend, RawBackend
+from remote_pod_debugger.instrumentation import CallRecorder, resource
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer
+
+
+def test_resource():
+    """
+
+    test verb and resource of request urls
+    """
+    assert resource("GET", "http://h/api/v1/namespaces?limit=500") == ("LIST", "namespaces")
+    assert resource("GET", "http://h/api/v1/namespaces/waa/pods?watch=true") == (
+        "WATCH",
+        "pods",
+    )
+    assert resource("GET", "http://h/apis/apps/v1/namespaces/waa/deployments/api") == (
+        "GET",
+        "deployments",
+    )
+    assert resource(
+        "PATCH", "http://h/api/v1/namespaces/waa/pods/api-0/ephemeralcontainers"
+    ) == (
+        "PATCH",
+        "pods/ephemeralcontainers",
+    )
+
+
+@pytest.mark.parametrize("backend", [ClientBackend, RawBackend])
+def test_call_recorder(backend, tmp_path):
+    """
+
+    test every call of PodDebugger is recorded, with size of response
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=2, workloads=2)
+        _recorder = CallRecorder()
+        _pod_debugger = PodDebugger(
+            backend=backend(configuration=_fake.configuration(), recorder=_recorder)
+        )
+        with patch("builtins.input", lambda *args: "app-0"), patch("builtins.print"):
+            _pod_debugger.select_deployment("ns-0")
+        _pod_debugger.patch("app-0", "ns-0", "127.0.0.1", 5999, "main.py", "container-0")
+        assert len(list(_pod_debugger.watch_names("deployment", "ns-0", "1"))) == 2
+        assert [(_call.verb, _call.resource) for _call in _recorder.calls] == [
+            ("LIST", "deployments"),
+            ("GET", "deployments"),
+            ("PATCH", "deployments"),
+            ("WATCH", "deployments"),
+        ]
+        assert "limit=500" in _recorder.calls[0].url
+        assert "resourceVersion=1" in _recorder.calls[-1].url
+        _rows = {(_row["verb"], _row["resource"]): _row for _row in _recorder.summary()}
+        assert _rows[("LIST", "deployments")]["bytes"] > 0
+        assert _rows[("PATCH", "deployments")]["calls"] == 1
+        _recorder.write_trace(str(tmp_path / "trace.json"))
+        with open(tmp_path / "trace.json", encoding="utf-8") as _file:
+            _trace = json.load(_file)
+        assert [_call["status"] for _call in _trace] == [200, 200, 200, 200]
+        assert all(_call["bytes"] for _call in _trace)
@@ -0,0 +1,94 @@
+"""
+
+test kind registry
+"""
+from unittest.mock import patch
+
+import pytest
+
+from remote_pod_debugger.backends import ClientBackend, RawBackend, collection_path
+from remote_pod_debugger.kinds import KINDS, WORKLOAD_KINDS, get_kind
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer, workload
+
+
+def _cronjob(name: str, namespace: str) -> dict:
+    _workload = workload("CronJob", name, namespace)
+    _workload["apiVersion"] = "batch/v1"
+    _workload["spec"] = {
+        "schedule": "*/5 * * * *",
+        "jobTemplate": {"spec": {"template": _workload["spec"]["template"]}},
+    }
+    return _workload
+
+
+def test_kind_registry():
+    """
+
+    test workload kinds and pod spec paths
+    """
+    assert WORKLOAD_KINDS == ["deployment", "daemonset", "statefulset", "job", "cronjob", "pod"]
+    assert KINDS["cronjob"].pod_spec_attributes == (
+        "spec",
+        "job_template",
+        "spec",
+        "template",
+        "spec",
+    )
+    assert KINDS["cronjob"].pod_spec_pointer == "/spec/jobTemplate/spec/template/spec"
+    assert KINDS["pod"].patch_body({"containers": []}) == {"spec": {"containers": []}}
+    assert collection_path("statefulset", "waa") == "/apis/apps/v1/namespaces/waa/statefulsets"
+    assert collection_path("cronjob") == "/apis/batch/v1/cronjobs"
+    with pytest.raises(Exception, match="Unknown object type replicaset"):
+        get_kind("replicaset")
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.BatchV1Api.read_namespaced_cron_job")
+def test_client_backend_dispatch(read_namespaced_cron_job, load_kube_config):
+    """
+
+    test generated client function is looked up from the registry
+    """
+    ClientBackend().read("cronjob", "backup", "waa")
+    read_namespaced_cron_job.assert_called_once_with("backup", "waa")
+
+
+def test_pod_debugger_patch_cronjob():
+    """
+
+    test cronjob job template is patched, and containers are read through the registry
+    """
+    with FakeApiServer() as _fake:
+        _fake.add("cronjobs", _cronjob("backup", "waa"))
+        _pod_debugger = PodDebugger(backend=RawBackend(configuration=_fake.configuration()))
+        assert _pod_debugger.get_container_names("backup", "waa", "cronjob") == ["container-0"]
+        _pod_debugger.patch(
+            "backup",
+            "waa",
+            "127.0.0.1",
+            5999,
+            "main.py",
+            "container-0",
+            "backup:1",
+            object_name="cronjob",
+        )
+        _container = _fake.objects[("cronjobs", "waa", "backup")]["spec"]["jobTemplate"][
+            "spec"
+        ]["template"]["spec"]["containers"][0]
+        assert _container["command"] == ["sh"]
+        assert _pod_debugger.get_container_args("backup", "waa", "cronjob", "container-0") == (
+            _container["args"]
+        )
+
+
+def test_pod_debugger_patch_immutable():
+    """
+
+    test job and pod containers are not patched
+    """
+    with pytest.raises(Exception, match="ephemeral container"):
+        PodDebugger().patch(
+            "api-0", "waa", "127.0.0.1", 5999, "main.py", "app", object_name="pod"
+        )
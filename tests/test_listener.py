@@ -0,0 +1,95 @@
+"""
+
+test remote_pdb session listener
+"""
+import asyncio
+import os
+import socket
+import sys
+
+from remote_pod_debugger.listener import Session, SessionServer, serve
+
+
+async def _wait_for(predicate, timeout=2.0):
+    _loop = asyncio.get_event_loop()
+    _deadline = _loop.time() + timeout
+    while not predicate():
+        assert _loop.time() < _deadline
+        await asyncio.sleep(0.01)
+
+
+def test_session_server():
+    """
+
+    test sessions from fake clients are buffered and one can be attached
+    """
+
+    async def _scenario():
+        _server = SessionServer("127.0.0.1", 0, notify=lambda msg: None)
+        await _server.start()
+        _clients = [
+            await asyncio.open_connection("127.0.0.1", _server.port) for _ in range(2)
+        ]
+        await _wait_for(lambda: len(_server.sessions) == 2)
+        _clients[0][1].write(b"(Pdb) one\n")
+        _clients[1][1].write(b"(Pdb) two\n")
+        await _wait_for(lambda: all(_s.buffered for _s in _server.sessions.values()))
+
+        _stdin = asyncio.StreamReader()
+        _output = []
+        _console = asyncio.ensure_future(_server.console(_stdin, _output.append))
+        _stdin.feed_data(b":attach 2\n")
+        await _wait_for(lambda: b"(Pdb) two\n" in _output)
+        _stdin.feed_data(b"next\n")
+        assert await _clients[1][0].readline() == b"next\n"
+
+        _clients[0][1].write(b"still buffered\n")
+        await _wait_for(lambda: _server.sessions[1].buffered.endswith(b"still buffered\n"))
+        assert b"still buffered\n" not in b"".join(_output)
+
+        _clients[1][1].close()
+        await _wait_for(lambda: b"session closed\n" in _output)
+        _stdin.feed_data(b":quit\n")
+        await _console
+        await _server.close()
+
+    asyncio.run(_scenario())
+
+
+def test_session_buffer_bounded():
+    """
+
+    test detached session only keeps most recent output
+    """
+
+    class FakeWriter:
+        def get_extra_info(self, name):
+            return ("127.0.0.1", 1234)
+
+    _session = Session(1, None, FakeWriter(), buffer_size=4)
+    _session.feed(b"abc")
+    _session.feed(b"def")
+    assert _session.buffered == b"cdef"
+
+
+def test_serve_listens_during_run(monkeypatch):
+    """
+
+    test sessions are accepted while the patch runs, before the console
+    """
+    with socket.socket() as _socket:
+        _socket.bind(("127.0.0.1", 0))
+        _port = _socket.getsockname()[1]
+    _read, _write = os.pipe()
+    os.close(_write)
+    _clients = []
+    with open(_read, encoding="utf-8") as _stdin:
+        monkeypatch.setattr(sys, "stdin", _stdin)
+        serve(
+            "127.0.0.1",
+            _port,
+            lambda: _clients.append(socket.create_connection(("127.0.0.1", _port))),
+        )
+    with _clients[0] as _client:
+        _client.settimeout(2)
+        assert _client.recv(1) == b""
@@ -0,0 +1,41 @@
+"""
+
+test NameCache
+"""
+from remote_pod_debugger.name_cache import NameCache
+
+
+def test_name_cache_put_get(tmp_path):
+    """
+
+    test names are persisted per context
+    """
+    _path = str(tmp_path / "names.json")
+    _key = NameCache.key("deployment", "waa")
+    NameCache("ctx1", _path).put(_key, ["test1", "test2"], "42")
+    assert NameCache("ctx1", _path).get(_key) == (["test1", "test2"], "42")
+    assert NameCache("ctx2", _path).get(_key) is None
+
+
+def test_name_cache_corrupted_file(tmp_path):
+    """
+
+    test corrupted cache file is ignored
+    """
+    _path = tmp_path / "names.json"
+    _path.write_text("{not json")
+    assert NameCache("ctx1", str(_path)).get(NameCache.key("namespace")) is None
+
+
+def test_name_cache_flush(tmp_path):
+    """
+
+    test names stored without persist are written by flush
+    """
+    _path = str(tmp_path / "names.json")
+    _key = NameCache.key("deployment", "waa")
+    _name_cache = NameCache("ctx1", _path)
+    _name_cache.put(_key, ["test1"], "42", persist=False)
+    assert NameCache("ctx1", _path).get(_key) is None
+    _name_cache.flush()
+    assert NameCache("ctx1", _path).get(_key) == (["test1"], "42")
@@ -4,15 +4,24 @@ test PodDebugger
 """
 from unittest.mock import patch, MagicMock
 import io
+import json
 
 import pytest
+from urllib3.exceptions import ProtocolError
 
+from remote_pod_debugger.backends import ClientBackend, RawBackend
+from remote_pod_debugger.name_cache import NameCache
 from remote_pod_debugger.pod_debugger import PodDebugger
 
+from fake_apiserver import FakeApiServer, workload
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.patch_namespaced_deployment")
-def test_pod_debugger_patch_deployment(patch_namespaced_deployment, load_kube_config):
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.patch_namespaced_deployment")
+def test_pod_debugger_patch_deployment(
+    patch_namespaced_deployment, read_namespaced_deployment, load_kube_config
+):
     """
 
     test patch deployment
@@ -22,7 +31,10 @@ def test_pod_debugger_patch_deployment(patch_namespaced_deployment, load_kube_co
     _host = "127.0.0.1"
     _port = 5999
     _entrypoint = "main.py"
-    _container_name = "debugger"
+    _container_name = "container-0"
+    read_namespaced_deployment.return_value = workload(
+        "Deployment", _deployment_name, _namespace
+    )
     _image_name = "localhost:5001/b4nks/debugger-app"
     _pdb_commands = []
     _pod_debugger = PodDebugger(_debug=True)
@@ -39,9 +51,12 @@ def test_pod_debugger_patch_deployment(patch_namespaced_deployment, load_kube_co
     assert patch_namespaced_deployment.called
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.patch_namespaced_daemon_set")
-def test_pod_debugger_patch_daemonset(patch_namespaced_daemon_set, load_kube_config):
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_daemon_set")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.patch_namespaced_daemon_set")
+def test_pod_debugger_patch_daemonset(
+    patch_namespaced_daemon_set, read_namespaced_daemon_set, load_kube_config
+):
     """
 
     test patch daemonset
@@ -51,7 +66,10 @@ def test_pod_debugger_patch_daemonset(patch_namespaced_daemon_set, load_kube_con
     _host = "127.0.0.1"
     _port = 5999
     _entrypoint = "main.py"
-    _container_name = "debugger"
+    _container_name = "container-0"
+    read_namespaced_daemon_set.return_value = workload(
+        "DaemonSet", _deployment_name, _namespace
+    )
     _image_name = "localhost:5001/b4nks/debugger-app"
     _pdb_commands = []
     _pod_debugger = PodDebugger(_debug=True)
@@ -69,8 +87,8 @@ def test_pod_debugger_patch_daemonset(patch_namespaced_daemon_set, load_kube_con
     assert patch_namespaced_daemon_set.called
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.read_namespaced_deployment")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
 def test_pod_debugger_backup_deployment(
     read_namespaced_deployment, load_kube_config, deployment
 ):
@@ -91,8 +109,8 @@ def test_pod_debugger_backup_deployment(
     )
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.read_namespaced_daemon_set")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_daemon_set")
 def test_pod_debugger_backup_daemonset(
     read_namespaced_daemon_set, load_kube_config, daemonset
 ):
@@ -113,91 +131,72 @@ def test_pod_debugger_backup_daemonset(
     )
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.CoreV1Api.list_namespace")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
 @patch("builtins.input", lambda *args: "test1")
-def test_pod_debugger_select_namespace(list_namespace, load_kube_config):
+def test_pod_debugger_select_namespace(call_api, load_kube_config, metadata_pages):
     """
 
     test select_namespace
     """
-
-    class fakeMetadata:
-        def __init__(self, value):
-            self.name = value
-
-    class fakeNamespace:
-        def __init__(self, value):
-            self.metadata = fakeMetadata(value)
-
-    class fakeListNamespace:
-        def __init__(self, value):
-            self.items = [fakeNamespace(item) for item in value]
-
     namespace_selected = "test1"
-    list_namespace.return_value = fakeListNamespace(["test1", "test2"])
+    call_api.side_effect = metadata_pages(["test1", "test2"])
     _pod_debugger = PodDebugger(_debug=True)
     result = _pod_debugger.select_namespace()
     assert result == namespace_selected
+    assert call_api.call_args[0][0] == "/api/v1/namespaces"
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.list_namespaced_deployment")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
 @patch("builtins.input", lambda *args: "test1")
-def test_pod_debugger_select_deployment(list_namespace, load_kube_config):
+def test_pod_debugger_select_deployment(call_api, load_kube_config, metadata_pages):
     """
 
     test select_deployment
     """
-
-    class fakeMetadata:
-        def __init__(self, value):
-            self.name = value
-
-    class fakeDeployment:
-        def __init__(self, value):
-            self.metadata = fakeMetadata(value)
-
-    class fakeListDeployment:
-        def __init__(self, value):
-            self.items = [fakeDeployment(item) for item in value]
-
     namespace_selected = "test1"
-    list_namespace.return_value = fakeListDeployment(["test1", "test2"])
+    call_api.side_effect = metadata_pages(["test1", "test2"])
     _pod_debugger = PodDebugger(_debug=True)
     result = _pod_debugger.select_deployment("waa")
     assert result == namespace_selected
+    assert call_api.call_args[0][0] == "/apis/apps/v1/namespaces/waa/deployments"
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.list_namespaced_daemon_set")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
 @patch("builtins.input", lambda *args: "test1")
-def test_pod_debugger_select_daemon_set(list_namespace, load_kube_config):
+def test_pod_debugger_select_daemon_set(call_api, load_kube_config, metadata_pages):
     """
 
     test select_daemonset
     """
-
-    class fakeMetadata:
-        def __init__(self, value):
-            self.name = value
-
-    class fakeDeployment:
-        def __init__(self, value):
-            self.metadata = fakeMetadata(value)
-
-    class fakeListDeployment:
-        def __init__(self, value):
-            self.items = [fakeDeployment(item) for item in value]
-
     namespace_selected = "test1"
-    list_namespace.return_value = fakeListDeployment(["test1", "test2"])
+    call_api.side_effect = metadata_pages(["test1", "test2"])
     _pod_debugger = PodDebugger(_debug=True)
     result = _pod_debugger.select_daemonset("waa")
     assert result == namespace_selected
+    assert call_api.call_args[0][0] == "/apis/apps/v1/namespaces/waa/daemonsets"
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+def test_pod_debugger_iter_names_paginated(call_api, load_kube_config, metadata_pages):
+    """
+
+    test names are streamed page by page with metadata only requests
+    """
+    call_api.side_effect = metadata_pages(["test1", "test2"], ["test3"])
+    _pod_debugger = PodDebugger()
+    assert list(_pod_debugger.iter_names("namespace")) == ["test1", "test2", "test3"]
+    assert call_api.call_count == 2
+    _first, _second = call_api.call_args_list
+    assert "PartialObjectMetadataList" in _first[1]["header_params"]["Accept"]
+    assert ("continue", "page-1") not in _first[1]["query_params"]
+    assert ("continue", "page-1") in _second[1]["query_params"]
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
 def test_pod_debugger_before_script(load_kube_config):
     """
 
@@ -210,9 +209,9 @@ def test_pod_debugger_before_script(load_kube_config):
     )
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
 @patch("builtins.input", lambda *args: "test1")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.read_namespaced_deployment")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
 def test_pod_debugger_select_container_for_deployment(
     read_namespaced_deployment, load_kube_config
 ):
@@ -235,9 +234,9 @@ def test_pod_debugger_select_container_for_deployment(
     assert result == _container_name
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
 @patch("builtins.input", lambda *args: "test1")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.read_namespaced_daemon_set")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_daemon_set")
 def test_pod_debugger_select_container_for_daemon_set(
     read_namespaced_daemon_set, load_kube_config
 ):
@@ -267,7 +266,7 @@ def test_pod_debugger_select_container_for_daemon_set(
         ("deployment"),
     ],
 )
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
+@patch("remote_pod_debugger.backends.config.load_kube_config")
 @patch("builtins.input")
 def test_pod_debugger_select_object_type(input, load_kube_config, object_type):
     input.return_value = object_type
@@ -276,8 +275,22 @@ def test_pod_debugger_select_object_type(input, load_kube_config, object_type):
     assert result == object_type
 
 
-@patch("remote_pod_debugger.pod_debugger.config.load_kube_config")
-@patch("remote_pod_debugger.pod_debugger.client.AppsV1Api.read_namespaced_deployment")
+@pytest.mark.parametrize("ephemeral", [False, True])
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("builtins.input")
+def test_pod_debugger_select_object_type_ephemeral(input, load_kube_config, ephemeral):
+    """
+
+    test job is offered only with ephemeral containers
+    """
+    input.side_effect = ["job", "deployment"]
+    _pod_debugger = PodDebugger()
+    result = _pod_debugger.select_object_type(ephemeral)
+    assert result == ("job" if ephemeral else "deployment")
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
 def test_pod_debugger_get_container_args(read_namespaced_deployment, load_kube_config):
     """
 
@@ -302,3 +315,274 @@ def test_pod_debugger_get_container_args(read_namespaced_deployment, load_kube_c
         "test", "waa", "deployment", _container_name
     )
     assert _args == _args
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
+def test_pod_debugger_read_object_cached(read_namespaced_deployment, load_kube_config):
+    """
+
+    test object is read once and shared by backup, select_container and get_container_args
+    """
+
+    class container:
+        def __init__(self, name: str, args: list):
+            self.name = name
+            self.args = args
+
+    returner = MagicMock()
+    returner.metadata.resource_version = "1"
+    returner.spec.template.spec.containers = [container("test1", ["--test"])]
+    read_namespaced_deployment.return_value = returner
+    _pod_debugger = PodDebugger()
+    with patch("remote_pod_debugger.pod_debugger.yaml.dump"):
+        _pod_debugger.backup("test", "waa", io.StringIO())
+    with patch("builtins.input", lambda *args: "test1"):
+        _pod_debugger.select_container("test", "waa")
+    assert _pod_debugger.get_container_args("test", "waa", "deployment", "test1") == [
+        "--test"
+    ]
+    assert read_namespaced_deployment.call_count == 1
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
+@patch("builtins.input", lambda *args: "test")
+def test_pod_debugger_read_object_stale(
+    read_namespaced_deployment, call_api, load_kube_config, metadata_pages
+):
+    """
+
+    test object is read again once a newer resourceVersion is listed
+    """
+    _old = MagicMock()
+    _old.metadata.resource_version = "1"
+    _new = MagicMock()
+    _new.metadata.resource_version = "2"
+    read_namespaced_deployment.side_effect = [_old, _new]
+    call_api.side_effect = metadata_pages(["test"], resource_version="2")
+    _pod_debugger = PodDebugger()
+    assert _pod_debugger.read_object("test", "waa") is _old
+    _pod_debugger.select_deployment("waa")
+    assert _pod_debugger.read_object("test", "waa") is _new
+    assert _pod_debugger.read_object("test", "waa") is _new
+    assert read_namespaced_deployment.call_count == 2
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch(
+    "remote_pod_debugger.backends.client.AppsV1Api.list_deployment_for_all_namespaces"
+)
+def test_pod_debugger_find_objects(list_deployment_for_all_namespaces, load_kube_config):
+    """
+
+    test find_objects across all namespaces
+    """
+    _item = MagicMock()
+    _item.metadata.namespace = "waa"
+    _item.metadata.name = "test"
+    list_deployment_for_all_namespaces.return_value.items = [_item]
+    _pod_debugger = PodDebugger()
+    assert _pod_debugger.find_objects("deployment", label_selector="app=test") == [
+        ("waa", "test")
+    ]
+    list_deployment_for_all_namespaces.assert_called_once_with(label_selector="app=test")
+
+
+class FakeWatchResponse:
+    """
+
+    fake streamed watch response
+    """
+
+    def __init__(self, events: list):
+        self._events = events
+
+    def stream(self, amt=None, decode_content=False):
+        for _event in self._events:
+            if isinstance(_event, Exception):
+                raise _event
+            yield (json.dumps(_event) + "\n").encode()
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+def test_pod_debugger_names_cached(call_api, load_kube_config, metadata_pages, tmp_path):
+    """
+
+    test names are cached, then refreshed from a watch
+    """
+    _name_cache = NameCache("ctx", str(tmp_path / "names.json"))
+    call_api.side_effect = metadata_pages(["test1", "test2"], resource_version="5")
+    _pod_debugger = PodDebugger(name_cache=_name_cache)
+    assert list(_pod_debugger._names("deployment", "waa")) == ["test1", "test2"]
+    _key = NameCache.key("deployment", "waa")
+    assert _name_cache.get(_key) == (["test1", "test2"], None)
+
+    _name_cache.put(_key, ["test1", "test2"], "5")
+    call_api.side_effect = [
+        FakeWatchResponse(
+            [
+                {"type": "ADDED", "object": {"metadata": {"name": "test3", "resourceVersion": "6"}}},
+                {"type": "DELETED", "object": {"metadata": {"name": "test1", "resourceVersion": "7"}}},
+            ]
+        )
+    ]
+    _names = ["test1", "test2"]
+    _pod_debugger._refresh_names("deployment", "waa", _names, "5")
+    assert _names == ["test2", "test3"]
+    assert _name_cache.get(_key) == (["test2", "test3"], "7")
+    assert ("resourceVersion", "5") in call_api.call_args[1]["query_params"]
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+def test_pod_debugger_names_watch_expired(
+    call_api, load_kube_config, metadata_pages, tmp_path
+):
+    """
+
+    test names are listed again when watch resource version expired
+    """
+    _name_cache = NameCache("ctx", str(tmp_path / "names.json"))
+    call_api.side_effect = [
+        FakeWatchResponse([{"type": "ERROR", "object": {"code": 410, "reason": "Gone"}}])
+    ] + metadata_pages(["test4"])
+    _names = ["test1"]
+    PodDebugger(name_cache=_name_cache)._refresh_names("namespace", None, _names, "5")
+    assert _names == ["test4"]
+
+
+@pytest.mark.parametrize("failure", [
+    {"type": "ERROR", "object": {"code": 500, "reason": "InternalError"}},
+    ProtocolError("Connection broken"),
+])
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.ApiClient.call_api")
+def test_pod_debugger_names_watch_failed(call_api, load_kube_config, tmp_path, failure):
+    """
+
+    test events received before a watch failure are persisted, and the
+    failure is not raised in the background thread
+    """
+    _path = str(tmp_path / "names.json")
+    call_api.side_effect = [
+        FakeWatchResponse(
+            [
+                {"type": "ADDED", "object": {"metadata": {"name": "test2", "resourceVersion": "6"}}},
+                failure,
+            ]
+        )
+    ]
+    _names = ["test1"]
+    PodDebugger(name_cache=NameCache("ctx", _path))._refresh_names(
+        "namespace", None, _names, "5"
+    )
+    _key = NameCache.key("namespace", None)
+    assert NameCache("ctx", _path).get(_key) == (["test1", "test2"], "6")
+
+
+@patch("remote_pod_debugger.backends.config.load_kube_config")
+@patch("remote_pod_debugger.backends.client.CoreV1Api.create_namespaced_config_map")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.read_namespaced_deployment")
+@patch("remote_pod_debugger.backends.client.AppsV1Api.patch_namespaced_deployment")
+def test_pod_debugger_patch_with_wheel(
+    patch_namespaced_deployment,
+    read_namespaced_deployment,
+    create_namespaced_config_map,
+    load_kube_config,
+    tmp_path,
+):
+    """
+
+    test wheel ConfigMap is uploaded once and mounted in patched container
+    """
+    read_namespaced_deployment.return_value = workload("Deployment", "test", "waa")
+    patch_namespaced_deployment.return_value = read_namespaced_deployment.return_value
+    _wheel = tmp_path / "remote_pdb.whl"
+    _wheel.write_bytes(b"wheel")
+    _pod_debugger = PodDebugger(remote_pdb_wheel=str(_wheel))
+    assert "pip install" not in _pod_debugger.before_script
+    for _ in range(2):
+        _pod_debugger.patch("test", "waa", "127.0.0.1", 5999, "main.py", "container-0")
+    assert create_namespaced_config_map.call_count == 1
+    _body = patch_namespaced_deployment.call_args[0][2]
+    _pod_spec = _body["spec"]["template"]["spec"]
+    assert _pod_spec["volumes"][0]["configMap"]["name"].startswith("remote-pdb-wheel-")
+    assert _pod_spec["containers"][0]["volumeMounts"][0]["mountPath"] == "/opt/remote-pdb"
+    assert "/opt/remote-pdb/remote_pdb.whl" in _pod_spec["containers"][0]["args"][1]
+
+
+def test_pod_debugger_select_deployment_filtered():
+    """
+
+    test selectors are applied server side
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=2, workloads=3)
+        _pod_debugger = PodDebugger(backend=RawBackend(configuration=_fake.configuration()))
+        with patch("builtins.input", lambda *args: "app-1"), patch("builtins.print") as _print:
+            assert (
+                _pod_debugger.select_deployment("ns-0", label_selector="app=app-1") == "app-1"
+            )
+        assert [_call[0][0] for _call in _print.call_args_list][1:] == ["app-1"]
+        assert _fake.requests == [("GET", "/apis/apps/v1/namespaces/ns-0/deployments")]
+
+
+def test_pod_debugger_select_object_all_namespaces():
+    """
+
+    test objects of all namespaces are listed with a single request
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=3, workloads=2)
+        _pod_debugger = PodDebugger(backend=RawBackend(configuration=_fake.configuration()))
+        with patch("builtins.input", lambda *args: "ns-2/app-1"), patch("builtins.print"):
+            assert _pod_debugger.select_object(
+                "daemonset", field_selector="metadata.name=app-1"
+            ) == ("ns-2", "app-1")
+        assert _fake.requests == [("GET", "/apis/apps/v1/daemonsets")]
+
+
+@pytest.mark.parametrize("backend", [ClientBackend, RawBackend])
+def test_pod_debugger_patch_unchanged(backend):
+    """
+
+    test only changed fields are patched, and nothing is sent once patched
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=1, workloads=1)
+        _pod_debugger = PodDebugger(backend=backend(configuration=_fake.configuration()))
+        for _ in range(2):
+            _pod_debugger.patch("app-0", "ns-0", "127.0.0.1", 5999, "main.py", "container-0")
+        assert _fake.requests == [
+            ("GET", "/apis/apps/v1/namespaces/ns-0/deployments/app-0"),
+            ("PATCH", "/apis/apps/v1/namespaces/ns-0/deployments/app-0"),
+        ]
+        _container = _fake.objects[("deployments", "ns-0", "app-0")]["spec"]["template"][
+            "spec"
+        ]["containers"][0]
+        assert _container["image"] == "app-0:1"
+        assert _container["command"] == ["sh"]
+
+
+def test_pod_debugger_concurrent_reads(tmp_path):
+    """
+
+    test container names refreshed in background and container args share
+    one read of the object
+    """
+    with FakeApiServer(latency=0.1) as _fake:
+        _fake.add("deployments", workload("Deployment", "api", "waa"))
+        _name_cache = NameCache("ctx", str(tmp_path / "names.json"))
+        _name_cache.put(NameCache.key("container", "deployment", "waa", "api"), ["container-0"])
+        _pod_debugger = PodDebugger(
+            name_cache=_name_cache, backend=RawBackend(configuration=_fake.configuration())
+        )
+        assert _pod_debugger._container_names("api", "waa", "deployment") == ["container-0"]
+        assert _pod_debugger.get_container_args("api", "waa", "deployment", "container-0") == [
+            "-m",
+            "api.main",
+        ]
+        assert _fake.requests == [("GET", "/apis/apps/v1/namespaces/waa/deployments/api")]
@@ -0,0 +1,201 @@
+"""
+
+test restore
+"""
+import copy
+
+from kubernetes.client.exceptions import ApiException
+import pytest
+
+from remote_pod_debugger import restore
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.backup_store import BackupStore
+from remote_pod_debugger.batch import BatchPatcher, Target
+from remote_pod_debugger.pod_debugger import PodDebugger
+
+from fake_apiserver import FakeApiServer, workload
+
+
+@pytest.fixture(name="backup_store")
+def fixture_backup_store(tmp_path):
+    """
+
+    backup store writing restore points in tmp_path
+    """
+    return BackupStore("test", str(tmp_path / "backups"))
+
+
+def test_restore_body():
+    """
+
+    test JSON patch restores recorded fields, removes missing ones
+    """
+    _object = workload("Deployment", "api", "waa", containers=2)
+    _point = restore.restore_point(_object, "deployment", "container-1")
+    assert _point["containers"]["container-1"]["path"] == "/spec/template/spec/containers/1"
+    assert _point["containers"]["container-1"]["command"] is None
+    assert restore.restore_body(_point) == [
+        {"op": "test", "path": "/metadata/generation", "value": 1},
+        {"op": "test", "path": "/spec/template/spec/containers/1/name", "value": "container-1"},
+        {"op": "remove", "path": "/spec/template/spec/containers/1/command"},
+        {
+            "op": "add",
+            "path": "/spec/template/spec/containers/1/args",
+            "value": ["-m", "api.main"],
+        },
+        {"op": "add", "path": "/spec/template/spec/containers/1/image", "value": "api:1"},
+    ]
+
+
+def test_restore_point_keeps_first_values():
+    """
+
+    test a second debug patch keeps recorded values and adds other containers
+    """
+    _object = workload("Deployment", "api", "waa", containers=2)
+    _point = restore.restore_point(_object, "deployment", "container-0")
+    _patched = copy.deepcopy(_object)
+    _patched["spec"]["template"]["spec"]["containers"][0]["args"] = ["-c", "debug"]
+    _patched["metadata"]["generation"] = 2
+    _point = restore.restore_point(_patched, "deployment", "container-0", point=_point)
+    _point = restore.restore_point(_patched, "deployment", "container-1", point=_point)
+    assert _point["generation"] == 2
+    assert _point["containers"]["container-0"]["args"] == ["-m", "api.main"]
+    assert list(_point["containers"]) == ["container-0", "container-1"]
+
+
+def test_restore_body_wheel():
+    """
+
+    test wheel volume and mount added by the debug patch are removed
+    """
+    _object = workload("Deployment", "api", "waa")
+    _body = {
+        "spec": {
+            "template": {
+                "spec": {
+                    "volumes": [{"name": "remote-pdb-wheel"}],
+                    "containers": [
+                        {"name": "container-0", "volumeMounts": [{"name": "remote-pdb-wheel"}]}
+                    ],
+                }
+            }
+        }
+    }
+    _point = restore.restore_point(_object, "deployment", "container-0", _body)
+    assert restore.restore_body(_point)[-2:] == [
+        {"op": "remove", "path": "/spec/template/spec/containers/0/volumeMounts"},
+        {"op": "remove", "path": "/spec/template/spec/volumes"},
+    ]
+
+
+def test_pod_debugger_restore(backup_store):
+    """
+
+    test patched container is restored with one JSON patch
+    """
+    with FakeApiServer() as _fake:
+        _fake.add("deployments", workload("Deployment", "api", "waa"))
+        _original = copy.deepcopy(_fake.objects[("deployments", "waa", "api")]["spec"])
+        _pod_debugger = PodDebugger(
+            backend=RawBackend(configuration=_fake.configuration()), backup_store=backup_store
+        )
+        _pod_debugger.patch(
+            "api", "waa", "127.0.0.1", 5999, "main.py", "container-0", save_restore=True
+        )
+        assert _fake.objects[("deployments", "waa", "api")]["spec"] != _original
+        _requests = len(_fake.requests)
+        _pod_debugger.restore("api", "waa")
+        assert _fake.requests[_requests:] == [
+            ("PATCH", "/apis/apps/v1/namespaces/waa/deployments/api")
+        ]
+        assert _fake.objects[("deployments", "waa", "api")]["spec"] == _original
+        with pytest.raises(Exception, match="Can't find restore point"):
+            _pod_debugger.restore("api", "waa")
+
+
+def test_pod_debugger_restore_patched_twice(tmp_path, backup_store):
+    """
+
+    test two containers patched twice, with the wheel, are restored to the
+    spec before the first patch
+    """
+    _wheel = tmp_path / "remote_pdb-2.1.0-py2.py3-none-any.whl"
+    _wheel.write_bytes(b"wheel")
+    with FakeApiServer() as _fake:
+        _fake.add("deployments", workload("Deployment", "api", "waa", containers=2))
+        _original = copy.deepcopy(_fake.objects[("deployments", "waa", "api")]["spec"])
+        _pod_debugger = PodDebugger(
+            backend=RawBackend(configuration=_fake.configuration()),
+            remote_pdb_wheel=str(_wheel),
+            backup_store=backup_store,
+        )
+        for _port, _container in [
+            (5999, "container-0"),
+            (6000, "container-0"),
+            (6001, "container-1"),
+        ]:
+            _pod_debugger.patch(
+                "api", "waa", "127.0.0.1", _port, "main.py", _container, save_restore=True
+            )
+        _pod_debugger.restore("api", "waa")
+        assert _fake.objects[("deployments", "waa", "api")]["spec"] == _original
+
+
+def test_pod_debugger_restore_changed(backup_store):
+    """
+
+    test restore is refused once the spec changed after the debug patch
+    """
+    with FakeApiServer() as _fake:
+        _fake.add("deployments", workload("Deployment", "api", "waa"))
+        _pod_debugger = PodDebugger(
+            backend=RawBackend(configuration=_fake.configuration()), backup_store=backup_store
+        )
+        _pod_debugger.patch(
+            "api", "waa", "127.0.0.1", 5999, "main.py", "container-0", save_restore=True
+        )
+        _fake.objects[("deployments", "waa", "api")]["metadata"]["generation"] += 1
+        with pytest.raises(ApiException) as error:
+            _pod_debugger.restore("api", "waa")
+        assert error.value.status == 422
+
+
+def test_batch_restore(backup_store):
+    """
+
+    test batch restore of several workloads
+    """
+    with FakeApiServer() as _fake:
+        for _index in range(4):
+            _fake.add("deployments", workload("Deployment", f"api-{_index}", "waa"))
+        _original = copy.deepcopy(_fake.objects)
+        _patcher = BatchPatcher(
+            PodDebugger(
+                backend=RawBackend(configuration=_fake.configuration()),
+                backup_store=backup_store,
+            )
+        )
+        _targets = [Target("waa", "deployment", f"api-{_index}") for _index in range(4)]
+        _results = _patcher.patch(
+            _targets, host="127.0.0.1", port=5999, entrypoint="main.py", backup=True
+        )
+        assert all(_result.success for _result in _results)
+        assert all(_result.success for _result in _patcher.restore(_targets))
+        for _key, _object in _fake.objects.items():
+            assert _object["spec"] == _original[_key]["spec"]
+
+
+def test_restore_point_per_context(tmp_path):
+    """
+
+    test restore points of the same object in two contexts are kept apart
+    """
+    _object = workload("Deployment", "api", "waa")
+    _point = restore.restore_point(_object, "deployment", "container-0")
+    _stores = [BackupStore(_context, str(tmp_path)) for _context in ["prod", "arn:aws:eks/dev"]]
+    _stores[0].save_restore_point(_point)
+    assert _stores[1].load_restore_point("waa", "deployment", "api") is None
+    _stores[1].save_restore_point(_point)
+    _stores[1].remove_restore_point("waa", "deployment", "api")
+    assert _stores[0].load_restore_point("waa", "deployment", "api") == _point
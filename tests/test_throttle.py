@@ -0,0 +1,83 @@
+"""
+
+test client side throttling
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.throttle import AdaptiveLimiter, TokenBucket
+
+from fake_apiserver import FakeApiServer
+
+
+def test_token_bucket():
+    """
+
+    test tokens above burst are spread at rate
+    """
+    _bucket = TokenBucket(rate=100, burst=2)
+    _start = time.monotonic()
+    for _ in range(6):
+        _bucket.acquire()
+    assert time.monotonic() - _start >= 0.035
+
+
+def test_adaptive_limiter_aimd():
+    """
+
+    test in-flight limit is halved on 429 and grows back on success
+    """
+    _limiter = AdaptiveLimiter(qps=1000, max_inflight=8)
+    _limiter.acquire()
+    _limiter.acquire()
+    _limiter.release(True, 0.0)
+    _limiter.release(True, 0.0)
+    assert _limiter.limit == 2
+    for _ in range(4):
+        _limiter.acquire()
+        _limiter.release()
+    assert _limiter.limit == 3
+
+
+def test_adaptive_limiter_inflight():
+    """
+
+    test concurrent calls never exceed in-flight limit
+    """
+    _limiter = AdaptiveLimiter(qps=1000, max_inflight=3)
+    _lock = threading.Lock()
+    _inflight = [0, 0]
+
+    def _call(_):
+        _limiter.acquire()
+        with _lock:
+            _inflight[0] += 1
+            _inflight[1] = max(_inflight)
+        time.sleep(0.01)
+        with _lock:
+            _inflight[0] -= 1
+        _limiter.release()
+
+    with ThreadPoolExecutor(max_workers=10) as _executor:
+        list(_executor.map(_call, range(20)))
+    assert _inflight[1] == 3
+
+
+def test_backend_throttled():
+    """
+
+    test throttled requests wait for Retry-After and are retried
+    """
+    with FakeApiServer() as _fake:
+        _fake.populate(namespaces=1, workloads=1)
+        _fake.throttle = 2
+        _fake.retry_after = 0.05
+        _limiter = AdaptiveLimiter(max_inflight=16)
+        _backend = RawBackend(configuration=_fake.configuration(), limiter=_limiter)
+        _start = time.monotonic()
+        assert _backend.read("deployment", "app-0", "ns-0").metadata.name == "app-0"
+        assert time.monotonic() - _start >= 0.1
+        assert len(_fake.requests) == 3
+        assert _limiter.limit == 4
@@ -0,0 +1,90 @@
+"""
+
+test wait for patched pods
+"""
+import json
+from unittest.mock import MagicMock
+
+from remote_pod_debugger.wait import pod_state, wait_for_debug_pod
+
+ARGS = ["-c", "pip install remote_pdb && python -m remote_pdb"]
+SELECTOR = {
+    "matchLabels": {"app": "test"},
+    "matchExpressions": [{"key": "canary", "operator": "DoesNotExist"}],
+}
+
+
+def _pod(name, args, state=None, phase="Pending"):
+    _status = {"phase": phase}
+    if state:
+        _status["containerStatuses"] = [{"name": "app", "state": state}]
+    return {
+        "metadata": {"name": name},
+        "spec": {"containers": [{"name": "app", "args": args}]},
+        "status": _status,
+    }
+
+
+def test_pod_state():
+    """
+
+    test pod_state
+    """
+    assert pod_state(_pod("a", ARGS), "app") == "Pending"
+    assert pod_state(
+        _pod("a", ARGS, {"waiting": {"reason": "ContainerCreating"}}), "app"
+    ) == "ContainerCreating"
+    assert pod_state(_pod("a", ARGS, {"running": {}}, "Running"), "app") == "Running"
+
+
+def test_wait_for_debug_pod():
+    """
+
+    test wait returns first patched running pod, ignoring old pods
+    """
+    _events = [
+        {"type": "ADDED", "object": _pod("old", ["--old"], {"running": {}}, "Running")},
+        {"type": "ADDED", "object": _pod("new", ARGS)},
+        {"type": "MODIFIED", "object": _pod("new", ARGS, {"running": {}}, "Running")},
+        {"type": "MODIFIED", "object": _pod("other", ARGS, {"running": {}}, "Running")},
+    ]
+    _backend = MagicMock()
+    _backend.stream.return_value = iter(json.dumps(_event) for _event in _events)
+    assert wait_for_debug_pod(_backend, "waa", SELECTOR, "app", ARGS, 10) == "new"
+    _path, _query, _ = _backend.stream.call_args[0]
+    assert _path == "/api/v1/namespaces/waa/pods"
+    assert ("labelSelector", "app=test,!canary") in _query
+
+
+def test_wait_for_debug_pod_timeout():
+    """
+
+    test wait returns None when watch ends
+    """
+    _backend = MagicMock()
+    _backend.stream.return_value = iter([json.dumps({"type": "ADDED", "object": _pod("new", ARGS)})])
+    assert wait_for_debug_pod(_backend, "waa", SELECTOR, "app", ARGS, 10) is None
+
+
+def test_wait_for_ephemeral_container():
+    """
+
+    test wait on ephemeral container of one pod
+    """
+    _pod_json = {
+        "metadata": {"name": "api-1"},
+        "spec": {
+            "containers": [{"name": "app", "args": ["--old"]}],
+            "ephemeralContainers": [{"name": "remote-pdb-1", "args": ARGS}],
+        },
+        "status": {
+            "phase": "Running",
+            "ephemeralContainerStatuses": [{"name": "remote-pdb-1", "state": {"running": {}}}],
+        },
+    }
+    _backend = MagicMock()
+    _backend.stream.return_value = iter([json.dumps({"type": "MODIFIED", "object": _pod_json})])
+    assert wait_for_debug_pod(
+        _backend, "waa", {}, "remote-pdb-1", ARGS, 10, field_selector="metadata.name=api-1"
+    ) == "api-1"
+    assert ("fieldSelector", "metadata.name=api-1") in _backend.stream.call_args[0][1]
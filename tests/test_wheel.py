@@ -0,0 +1,74 @@
+"""
+
+test remote_pdb wheel delivery
+"""
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from remote_pod_debugger import wheel
+from remote_pod_debugger.backends import RawBackend
+from remote_pod_debugger.pod_debugger import PodDebugger
+from remote_pod_debugger.wheel import wheel_config_map, wheel_pythonpath
+
+from fake_apiserver import FakeApiServer
+
+
+def test_wheel_config_map(tmp_path):
+    """
+
+    test ConfigMap is named after wheel content
+    """
+    _path = tmp_path / "remote_pdb-2.1.0-py2.py3-none-any.whl"
+    _path.write_bytes(b"wheel content")
+    _name, _body = wheel_config_map(str(_path))
+    assert _name.startswith("remote-pdb-wheel-")
+    assert _body["metadata"]["name"] == _name
+    assert base64.b64decode(_body["binaryData"][_path.name]) == b"wheel content"
+    _path.write_bytes(b"other content")
+    assert wheel_config_map(str(_path))[0] != _name
+
+
+def test_wheel_config_map_too_large(tmp_path, monkeypatch):
+    """
+
+    test wheel larger than a ConfigMap is rejected
+    """
+    monkeypatch.setattr(wheel, "MAX_CONFIG_MAP_SIZE", 8)
+    _path = tmp_path / "remote_pdb.whl"
+    _path.write_bytes(b"wheel content")
+    with pytest.raises(Exception):
+        wheel_config_map(str(_path))
+
+
+def test_wheel_pythonpath():
+    """
+
+    test wheel is prepended to PYTHONPATH
+    """
+    assert (
+        wheel_pythonpath("/tmp/remote_pdb.whl")
+        == "export PYTHONPATH=/opt/remote-pdb/remote_pdb.whl${PYTHONPATH:+:$PYTHONPATH}"
+    )
+
+
+def test_pod_debugger_ensure_wheel(tmp_path):
+    """
+
+    test concurrent patches upload the wheel once per namespace
+    """
+    _path = tmp_path / "remote_pdb-2.1.0-py2.py3-none-any.whl"
+    _path.write_bytes(b"wheel")
+    _namespaces = ["waa", "waa", "wee", "waa", "wee"]
+    with FakeApiServer(latency=0.1) as _fake:
+        _pod_debugger = PodDebugger(
+            backend=RawBackend(configuration=_fake.configuration()), remote_pdb_wheel=str(_path)
+        )
+        with ThreadPoolExecutor(max_workers=len(_namespaces)) as _executor:
+            _names = list(_executor.map(_pod_debugger.ensure_wheel, _namespaces))
+        assert len(set(_names)) == 1
+        assert sorted(_url for _method, _url in _fake.requests if _method == "POST") == [
+            "/api/v1/namespaces/waa/configmaps",
+            "/api/v1/namespaces/wee/configmaps",
+        ]